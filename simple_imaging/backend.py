@@ -0,0 +1,296 @@
+"""Optional NumPy execution backend
+
+When NumPy is installed, the Image operations run as vectorized array
+expressions over a zero-copy view of the pixel buffer. Every function here
+mirrors the pure-Python implementation in `Image`, including the rounding
+and clamping rules, so both paths produce the same samples.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Any
+from typing import Sequence
+
+from .border import padded_indices
+from .buffer import PixelBuffer
+from .kernels import Kernel
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+_DTYPES = {"B": "uint8", "H": "uint16"}
+_use_numpy = np is not None
+# samples stacked at once by window_median
+MEDIAN_BAND_SAMPLES = 1 << 24
+
+
+def numpy_available() -> bool:
+    """True when NumPy could be imported"""
+    return np is not None
+
+
+def numpy_enabled() -> bool:
+    """True when the Image operations should use the NumPy backend"""
+    return _use_numpy
+
+
+def use_numpy(enabled: bool = True) -> None:
+    """Selects the execution backend for the Image operations
+
+    Args:
+        - enabled (bool, optional): True for NumPy, False for pure Python. Defaults to True.
+
+    Raises:
+        ImportError: If the NumPy backend is requested but NumPy is not installed
+    """
+    global _use_numpy
+    if enabled and np is None:
+        raise ImportError("The NumPy backend requires numpy to be installed")
+    _use_numpy = enabled
+
+
+def as_ndarray(buffer: PixelBuffer) -> Any:
+    """Zero-copy ndarray view over the buffer samples
+
+    Args:
+        - buffer (PixelBuffer): the pixel buffer
+
+    Returns:
+        numpy.ndarray: `(height, width)` for grayscale, `(height, width, channels)`
+        for interleaved and `(channels, height, width)` for planar color buffers
+    """
+    if np is None:
+        raise ImportError("Converting to an ndarray requires numpy to be installed")
+    flat = np.frombuffer(buffer.data, dtype=_DTYPES[buffer.typecode])
+    if buffer.channels == 1:
+        return flat.reshape(buffer.height, buffer.width)
+    if buffer.layout == "planar":
+        return flat.reshape(buffer.channels, buffer.height, buffer.width)
+    return flat.reshape(buffer.height, buffer.width, buffer.channels)
+
+
+def to_array(values: Any, typecode: str) -> array[int]:
+    """Copies an ndarray into a new `array` with the given typecode"""
+    result = array(typecode)
+    result.frombytes(np.ascontiguousarray(values, dtype=_DTYPES[typecode]).tobytes())
+    return result
+
+
+def _samples(buffer: PixelBuffer) -> Any:
+    # signed copy of the samples, so intermediate results cannot wrap around
+    return np.frombuffer(buffer.data, dtype=_DTYPES[buffer.typecode]).astype(np.int64)
+
+
+def _plane(buffer: PixelBuffer, channel: int) -> Any:
+    plane = np.frombuffer(buffer.plane(channel), dtype=_DTYPES[buffer.typecode])
+    return plane.reshape(buffer.height, buffer.width).astype(np.int64)
+
+
+def add(buffer: PixelBuffer, other: PixelBuffer, ceiling: int) -> array[int]:
+    result = np.minimum(_samples(buffer) + _samples(other), ceiling)
+    return to_array(result, buffer.typecode)
+
+
+def subtract(buffer: PixelBuffer, other: PixelBuffer) -> array[int]:
+    result = np.maximum(_samples(buffer) - _samples(other), 0)
+    return to_array(result, buffer.typecode)
+
+
+def apply_table(
+    samples: Sequence[int], typecode: str, table: Sequence[int]
+) -> array[int]:
+    """Maps samples through a lookup table (see `lut`) by fancy indexing"""
+    lookup = np.asarray(table, dtype=_DTYPES[typecode])
+    return to_array(lookup[np.asarray(samples, dtype=_DTYPES[typecode])], typecode)
+
+
+def count_levels(samples: Sequence[int], typecode: str, levels: int) -> array[int]:
+    """Occurrences of each value below `levels`, as an `array` of `Q`"""
+    counts = np.bincount(np.asarray(samples, dtype=_DTYPES[typecode]), minlength=levels)
+    result = array("Q")
+    result.frombytes(counts[:levels].astype(np.uint64).tobytes())
+    return result
+
+
+def _index_maps(size: int, length: int) -> list[Any]:
+    # `extend` border mode, one index array per shift
+    offset = size // 2
+    coords = np.arange(length)
+    maps = []
+    for shift in range(-offset, offset + 1):
+        shifted = coords + shift
+        maps.append(np.where((shifted >= 0) & (shifted < length), shifted, coords))
+    return maps
+
+
+def _padded(plane: Any, radius: int, mode: str) -> Any:
+    """Pads a plane as `border.pad_plane` does"""
+    height, width = plane.shape
+    # one extra zero row and column, read for constant padding
+    extended = np.pad(plane, ((0, 1), (0, 1)))
+    rows = np.array(padded_indices(height, radius, mode))
+    cols = np.array(padded_indices(width, radius, mode))
+    rows[rows == -1], cols[cols == -1] = height, width
+    return extended[np.ix_(rows, cols)]
+
+
+def _window_maps(plane: Any, size: int, mode: str) -> tuple[Any, list[Any], list[Any]]:
+    """Source plane and index arrays of each window row and column shift"""
+    height, width = plane.shape
+    if mode == "extend":
+        return plane, _index_maps(size, height), _index_maps(size, width)
+    offset = size // 2
+    shifts = range(2 * offset + 1)
+    row_maps = [np.arange(height) + a for a in shifts]
+    col_maps = [np.arange(width) + b for b in shifts]
+    return _padded(plane, offset, mode), row_maps, col_maps
+
+
+def _bounds(size: int, length: int) -> tuple[Any, Any, Any]:
+    # in-range window bounds and number of missing coordinates, per pivot
+    offset = size // 2
+    coords = np.arange(length)
+    low = np.maximum(coords - offset, 0)
+    high = np.minimum(coords + offset + 1, length)
+    return low, high, 2 * offset + 1 - (high - low)
+
+
+def _integral_image(plane: Any) -> Any:
+    height, width = plane.shape
+    table = np.zeros((height + 1, width + 1), dtype=np.int64)
+    table[1:, 1:] = plane.cumsum(axis=0).cumsum(axis=1)
+    return table
+
+
+def _box_sums(plane: Any, size: int, mode: str) -> Any:
+    """Window sums from an integral image, see `image._box_sums`"""
+    height, width = plane.shape
+    if mode != "extend":
+        span = 2 * (size // 2) + 1
+        table = _integral_image(_padded(plane, size // 2, mode))
+        return (
+            table[span:, span:]
+            - table[:height, span:]
+            - table[span:, :width]
+            + table[:height, :width]
+        )
+    table = _integral_image(plane)
+    top, bottom, missing_rows = _bounds(size, height)
+    left, right, missing_cols = _bounds(size, width)
+    rows, cols = np.arange(height), np.arange(width)
+
+    t_rows, b_rows = table[top], table[bottom]
+    total = b_rows[:, right] - t_rows[:, right] - b_rows[:, left] + t_rows[:, left]
+    column = (
+        b_rows[:, cols + 1] - t_rows[:, cols + 1] - b_rows[:, cols] + t_rows[:, cols]
+    )
+    p_top, p_bottom = table[rows], table[rows + 1]
+    row = p_bottom[:, right] - p_top[:, right] - p_bottom[:, left] + p_top[:, left]
+    missing_rows = missing_rows[:, None]
+    total += missing_cols * column + missing_rows * row
+    total += missing_rows * missing_cols * plane
+    return total
+
+
+def window_average(
+    buffer: PixelBuffer, size: int, ceiling: int, mode: str = "extend"
+) -> list[array[int]]:
+    span = 2 * (size // 2) + 1
+    area = span * span
+    planes = []
+    for c in range(buffer.channels):
+        total = _box_sums(_plane(buffer, c), size, mode)
+        result = np.clip(np.rint(total / area), 0, ceiling)
+        planes.append(to_array(result, buffer.typecode))
+    return planes
+
+
+def _medians(plane: Any, size: int, mode: str) -> Any:
+    height, width = plane.shape
+    span = 2 * (size // 2) + 1
+    area = span * span
+    # lower median, as in the pure-Python implementation
+    rank = area // 2 if area % 2 != 0 else area // 2 - 1
+    # every window is stacked, so the rows are processed in bands to bound memory
+    band = max(1, MEDIAN_BAND_SAMPLES // (area * width))
+    source, row_maps, col_maps = _window_maps(plane, size, mode)
+    result = np.empty((height, width), dtype=np.int64)
+    for start in range(0, height, band):
+        stacked = np.stack(
+            [
+                source[rows[start : start + band]][:, cols]
+                for rows in row_maps
+                for cols in col_maps
+            ]
+        )
+        result[start : start + band] = np.partition(stacked, rank, axis=0)[rank]
+    return result
+
+
+def window_median(
+    buffer: PixelBuffer, size: int, mode: str = "extend"
+) -> list[array[int]]:
+    return [
+        to_array(_medians(_plane(buffer, c), size, mode), buffer.typecode)
+        for c in range(buffer.channels)
+    ]
+
+
+def _convolution_sums(plane: Any, kernel: Kernel, mode: str) -> Any:
+    """Fixed-point sums, the same integers as `kernels.convolve_plane`"""
+    source, row_maps, col_maps = _window_maps(plane, kernel.size, mode)
+    total = np.zeros(plane.shape, dtype=np.int64)
+    if kernel.separable:
+        horizontal = np.zeros((source.shape[0], plane.shape[1]), dtype=np.int64)
+        for coef, cols in zip(kernel.fixed_row, col_maps):
+            if coef:
+                horizontal += coef * source[:, cols]
+        for coef, rows in zip(kernel.fixed_column, row_maps):
+            if coef:
+                total += coef * horizontal[rows]
+    else:
+        for coefficients, rows in zip(kernel.fixed, row_maps):
+            shifted_rows = source[rows]
+            for coef, cols in zip(coefficients, col_maps):
+                if coef:
+                    total += coef * shifted_rows[:, cols]
+    return total
+
+
+def convolve(
+    buffer: PixelBuffer, kernel: Kernel, ceiling: int, mode: str = "extend"
+) -> list[array[int]]:
+    planes = []
+    for c in range(buffer.channels):
+        total = _convolution_sums(_plane(buffer, c), kernel, mode)
+        result = np.clip(np.rint(total / kernel.scale), 0, ceiling)
+        planes.append(to_array(result, buffer.typecode))
+    return planes
+
+
+def high_boost(
+    buffer: PixelBuffer,
+    k: int | float,
+    blur: str,
+    size: int,
+    ceiling: int,
+    mode: str = "extend",
+) -> list[array[int]]:
+    """`v + k * (v - blurred)`, see `image._blurred_sums` for the blurs"""
+    planes = []
+    for c in range(buffer.channels):
+        plane = _plane(buffer, c)
+        if blur == "median":
+            total, divisor = _medians(plane, size, mode), 1
+        elif blur == "box":
+            span = 2 * (size // 2) + 1
+            total, divisor = _box_sums(plane, size, mode), span * span
+        else:
+            kernel = Kernel.gaussian(size // 2)
+            total, divisor = _convolution_sums(plane, kernel, mode), kernel.scale
+        result = np.clip(np.rint(plane + k * (plane - total / divisor)), 0, ceiling)
+        planes.append(to_array(result, buffer.typecode))
+    return planes
@@ -0,0 +1,159 @@
+"""Border handling for the sliding window operations
+
+Windows centred near the image border reach coordinates outside of it. The
+modes below decide which samples are read there, for an image row
+`a b c d e` and a window radius of 2:
+
+    - extend: each out-of-range coordinate is replaced by the pivot one (the
+      historical sliding window policy, the default)
+    - replicate: the border sample is repeated, `a a | a b c d e | e e`
+    - reflect: mirrored without repeating the border, `c b | a b c d e | d c`
+    - wrap: the image tiles the plane, `d e | a b c d e | a b`
+    - constant: zeros, `0 0 | a b c d e | 0 0`
+
+Apart from `extend`, whose samples depend on the pivot position, the plane
+is padded once by the window radius on every side, so every window is then
+read from the padded plane without any bound check.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Iterator
+from typing import Sequence
+
+from .buffer import PixelBuffer
+from .buffer import Sample
+from .errors import ValidationError
+
+BORDER_MODES = ("extend", "replicate", "reflect", "wrap", "constant")
+
+
+def validate_mode(mode: str) -> None:
+    """Raises a ValidationError for unknown border modes"""
+    if mode not in BORDER_MODES:
+        raise ValidationError(f"Unknown border mode {mode}, options are {BORDER_MODES}")
+
+
+def border_index(coord: int, length: int, mode: str) -> int:
+    """Position read for a (possibly out-of-range) coordinate
+
+    Args:
+        - coord (int): the coordinate, may be negative or past the end
+        - length (int): number of samples along the axis
+        - mode (str): one of replicate, reflect, wrap or constant
+
+    Returns:
+        int: the in-range position to read, -1 for constant padding
+    """
+    if 0 <= coord < length:
+        return coord
+    if mode == "replicate":
+        return 0 if coord < 0 else length - 1
+    if mode == "wrap":
+        return coord % length
+    if mode == "reflect":
+        if length == 1:
+            return 0
+        period = 2 * (length - 1)
+        coord %= period
+        return coord if coord < length else period - coord
+    return -1
+
+
+def padded_indices(length: int, radius: int, mode: str) -> list[int]:
+    """Source position of each coordinate of a padded axis, -1 for constant"""
+    return [border_index(c, length, mode) for c in range(-radius, length + radius)]
+
+
+def pad_plane(
+    plane: array[int] | memoryview, width: int, height: int, radius: int, mode: str
+) -> array[int]:
+    """Pads a plane by `radius` samples on every side
+
+    Args:
+        - plane (array | memoryview): samples of one channel, row after row
+        - width (int): plane width
+        - height (int): plane height
+        - radius (int): padding added to each side
+        - mode (str): one of replicate, reflect, wrap or constant
+
+    Returns:
+        array: `(height + 2 * radius)` rows of `(width + 2 * radius)` samples
+    """
+    typecode = plane.typecode if isinstance(plane, array) else plane.format
+    cols = padded_indices(width, radius, mode)
+    blank = array(typecode, [0]) * len(cols)
+    padded = array(typecode)
+    for r in padded_indices(height, radius, mode):
+        if r == -1:
+            padded.extend(blank)
+            continue
+        row = plane[r * width : (r + 1) * width]
+        padded.extend(array(typecode, [row[c] if c != -1 else 0 for c in cols]))
+    return padded
+
+
+class PaddedView:
+    def __init__(self, base: PixelBuffer, radius: int, mode: str = "constant"):
+        """Virtual border around a PixelBuffer
+
+        Reads outside of the base buffer are resolved with `border_index`, so
+        the padded samples are only produced when read, or by `materialize`.
+
+        Args:
+            - base (PixelBuffer): the buffer holding the samples
+            - radius (int): border size on every side
+            - mode (str, optional): one of replicate, reflect, wrap or constant. Defaults to "constant".
+
+        Raises:
+            ValidationError: If the mode is unknown or `extend`, whose samples depend on a pivot
+        """
+        validate_mode(mode)
+        if mode == "extend":
+            raise ValidationError("The extend border mode cannot pad an image")
+        self.base = base
+        self.radius = radius
+        self.mode = mode
+        self.rows = padded_indices(base.height, radius, mode)
+        self.cols = padded_indices(base.width, radius, mode)
+        self.width = len(self.cols)
+        self.height = len(self.rows)
+
+    def with_base(self, base: PixelBuffer) -> PaddedView:
+        return PaddedView(base, self.radius, self.mode)
+
+    def get(self, row: int, col: int) -> Sample:
+        """Reads the sample(s) of one pixel of the view, see `PixelBuffer.get`"""
+        r, c = self.rows[row], self.cols[col]
+        if r == -1 or c == -1:
+            return 0 if self.base.channels == 1 else (0,) * self.base.channels
+        return self.base.get(r, c)
+
+    def iter_rows(self) -> Iterator[array[int]]:
+        """Yields the samples of each row of the view, channels interleaved"""
+        base = self.base
+        planes = base.planes()
+        blank = array(base.typecode, [0]) * (self.width * base.channels)
+        for r in self.rows:
+            if r == -1:
+                yield blank
+                continue
+            samples = array(base.typecode, blank)
+            for ch, plane in enumerate(planes):
+                row = plane[r * base.width : (r + 1) * base.width]
+                samples[ch :: base.channels] = array(
+                    base.typecode, [row[c] if c != -1 else 0 for c in self.cols]
+                )
+            yield samples
+
+    def materialize(self) -> PixelBuffer:
+        """Contiguous buffer holding the padded samples"""
+        base = self.base
+        result = PixelBuffer(
+            self.width, self.height, base.channels, base.typecode, layout=base.layout
+        )
+        for ch, plane in enumerate(base.planes()):
+            padded = pad_plane(plane, base.width, base.height, self.radius, self.mode)
+            result.set_plane(ch, padded)
+        return result
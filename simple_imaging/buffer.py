@@ -0,0 +1,641 @@
+from __future__ import annotations
+
+from array import array
+from typing import Any
+from typing import cast
+from typing import Iterable
+from typing import Iterator
+from typing import overload
+from typing import Sequence
+from typing import Tuple
+from typing import TYPE_CHECKING
+from typing import Union
+
+from .errors import ValidationError
+from .types import GrayPixel
+from .types import Pixel
+from .types import RGBPixel
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .shared import SharedSegment
+
+LAYOUTS = ("interleaved", "planar")
+
+Sample = Union[int, Tuple[int, ...]]
+
+
+def typecode_for(max_level: int) -> str:
+    """Picks the smallest unsigned array typecode able to hold `max_level`
+
+    Args:
+        - max_level (int): maximum sample value of the image
+
+    Returns:
+        str: `B` (8 bits) for levels up to 255, `H` (16 bits) otherwise
+    """
+    return "B" if max_level <= 255 else "H"
+
+
+def channels_for(header: str) -> int:
+    """Number of samples per pixel for a given Netpbm header
+
+    Args:
+        - header (str): the image header
+
+    Returns:
+        int: 3 for color images, 1 otherwise
+    """
+    return 3 if header in ("P3", "P6") else 1
+
+
+class PixelBuffer:
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        channels: int = 1,
+        typecode: str = "B",
+        data: array[int] | memoryview | None = None,
+        layout: str = "interleaved",
+    ):
+        """Contiguous typed storage for the samples of an image
+
+        All samples live in a single `array`. Grayscale images store one sample
+        per pixel, row after row. Color images either interleave the channels
+        (`RGBRGB...`) or store each channel as a full plane (`RR...GG...BB...`).
+
+        The storage can also be a read-only `memoryview` (e.g. over a memory
+        mapped file or a shared memory `segment`), or shared with other
+        buffers (see `share`). It is then copied into an `array` of its own on
+        the first write.
+
+        Args:
+            - width (int): number of columns
+            - height (int): number of rows
+            - channels (int, optional): samples per pixel. Defaults to 1.
+            - typecode (str, optional): `array` typecode for the samples. Defaults to "B".
+            - data (array | memoryview, optional): samples to use as storage. Defaults to None (all zeros).
+            - layout (str, optional): `interleaved` or `planar`. Defaults to "interleaved".
+
+        Raises:
+            ValidationError: If the layout is unknown or the data does not match the dimensions
+        """
+        if layout not in LAYOUTS:
+            raise ValidationError(f"Unknown layout {layout}, options are {LAYOUTS}")
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.typecode = typecode
+        self.layout = layout
+        size = width * height * channels
+        if data is None:
+            data = array(typecode, bytes(size * array(typecode).itemsize))
+        if len(data) != size:
+            raise ValidationError(
+                f"Buffer should hold {size} samples, found {len(data)}"
+            )
+        self.data = data
+        # incremented on every write, lets readers cache results per version
+        self.version = 0
+        # number of buffers over `data`, a list shared by all of them
+        self._shares = [1]
+        # shared memory segment holding `data`, see `shared.share_buffer`
+        self.segment: SharedSegment | None = None
+
+    @property
+    def pixel_count(self) -> int:
+        return self.width * self.height
+
+    @property
+    def readonly(self) -> bool:
+        return not isinstance(self.data, array)
+
+    @property
+    def shared(self) -> bool:
+        return self._shares[0] > 1
+
+    def share(self) -> PixelBuffer:
+        """A buffer over the same storage, copied by whichever side writes first
+
+        Returns:
+            PixelBuffer: a new buffer with the same geometry and samples
+        """
+        other = PixelBuffer(
+            self.width,
+            self.height,
+            self.channels,
+            self.typecode,
+            self.data,
+            self.layout,
+        )
+        other._shares = self._shares
+        other.segment = self.segment
+        self._shares[0] += 1
+        return other
+
+    def _detach(self, data: array[int]) -> None:
+        # leaves the group of buffers sharing the current storage
+        self._shares[0] -= 1
+        self._shares = [1]
+        self.data = data
+        self.segment = None
+
+    def make_writable(self) -> None:
+        """Copies a read-only or shared storage into an `array` (copy on write)"""
+        if self.readonly or self.shared:
+            self._detach(_copy_samples(self.data, self.typecode))
+
+    def index(self, row: int, col: int, channel: int = 0) -> int:
+        """Position of a sample inside `data`
+
+        Args:
+            - row (int): zero based row
+            - col (int): zero based column
+            - channel (int, optional): channel of the sample. Defaults to 0.
+
+        Returns:
+            int: the index of that sample in the storage
+        """
+        if self.layout == "planar":
+            return channel * self.pixel_count + row * self.width + col
+        return (row * self.width + col) * self.channels + channel
+
+    def get(self, row: int, col: int) -> Sample:
+        """Reads the sample(s) of one pixel
+
+        Returns:
+            Sample: an integer for single channel images, a tuple otherwise
+        """
+        if self.channels == 1:
+            return self.data[row * self.width + col]
+        return tuple(self.data[self.index(row, col, c)] for c in range(self.channels))
+
+    def set(self, row: int, col: int, value: Sample) -> None:
+        """Writes the sample(s) of one pixel
+
+        Args:
+            - row (int): zero based row
+            - col (int): zero based column
+            - value (Sample): an integer or a tuple with one value per channel
+        """
+        self.make_writable()
+        self.version += 1
+        if self.channels == 1:
+            self.data[row * self.width + col] = cast(int, value)
+            return
+        for c, sample in enumerate(cast(Tuple[int, ...], value)):
+            self.data[self.index(row, col, c)] = sample
+
+    def plane(self, channel: int = 0) -> array[int] | memoryview:
+        """Samples of one channel, row after row
+
+        Single channel buffers return their storage itself (an array or a
+        read-only memoryview), color buffers return a copy of the channel
+        samples.
+        """
+        if self.channels == 1:
+            return self.data
+        if self.layout == "planar":
+            start = channel * self.pixel_count
+            samples = self.data[start : start + self.pixel_count]
+        else:
+            samples = self.data[channel :: self.channels]
+        if isinstance(samples, array):
+            return samples
+        return _copy_samples(samples, self.typecode)
+
+    def set_plane(self, channel: int, values: Iterable[int]) -> None:
+        """Replaces all samples of one channel
+
+        Args:
+            - channel (int): the channel to replace
+            - values (Iterable[int]): `width * height` samples, row after row
+        """
+        if not isinstance(values, array) or values.typecode != self.typecode:
+            values = array(self.typecode, values)
+        self.version += 1
+        if self.channels == 1:
+            self._detach(values)
+            return
+        self.make_writable()
+        if self.layout == "planar":
+            start = channel * self.pixel_count
+            self.data[start : start + self.pixel_count] = values
+        else:
+            self.data[channel :: self.channels] = values
+
+    def iter_rows(self) -> Iterator[array[int] | memoryview]:
+        """Yields the samples of each row, channels interleaved"""
+        row_length = self.width * self.channels
+        if self.channels == 1 or self.layout == "interleaved":
+            for start in range(0, len(self.data), row_length):
+                yield self.data[start : start + row_length]
+            return
+        for row in range(self.height):
+            samples = array(self.typecode, [0]) * row_length
+            for c in range(self.channels):
+                start = c * self.pixel_count + row * self.width
+                samples[c :: self.channels] = _copy_samples(
+                    self.data[start : start + self.width], self.typecode
+                )
+            yield samples
+
+    def planes(self) -> list[array[int] | memoryview]:
+        return [self.plane(c) for c in range(self.channels)]
+
+    def with_data(self, data: Iterable[int]) -> PixelBuffer:
+        """Creates a buffer with the same geometry holding other samples
+
+        Args:
+            - data (Iterable[int]): samples in the same layout as this buffer
+
+        Returns:
+            PixelBuffer: a new buffer, `data` is used as is if already an array
+        """
+        if not isinstance(data, array) or data.typecode != self.typecode:
+            data = array(self.typecode, data)
+        return PixelBuffer(
+            self.width, self.height, self.channels, self.typecode, data, self.layout
+        )
+
+    def with_planes(
+        self,
+        planes: Sequence[Iterable[int]],
+        width: int | None = None,
+        height: int | None = None,
+    ) -> PixelBuffer:
+        """Creates a buffer from one plane per channel
+
+        Args:
+            - planes (Sequence[Iterable[int]]): one sequence of samples per channel
+            - width (int, optional): width of the result. Defaults to this buffer width.
+            - height (int, optional): height of the result. Defaults to this buffer height.
+
+        Returns:
+            PixelBuffer: a new buffer using this buffer typecode and layout
+        """
+        result = PixelBuffer(
+            self.width if width is None else width,
+            self.height if height is None else height,
+            self.channels,
+            self.typecode,
+            layout=self.layout,
+        )
+        for c, values in enumerate(planes):
+            result.set_plane(c, values)
+        return result
+
+    def _region_slices(
+        self, x0: int, y0: int, width: int, height: int
+    ) -> Iterator[slice]:
+        # storage slices covering a rectangle, row after row (and channel
+        # after channel for the planar layout)
+        if self.channels == 1 or self.layout == "interleaved":
+            for row in range(y0, y0 + height):
+                start = (row * self.width + x0) * self.channels
+                yield slice(start, start + width * self.channels)
+            return
+        for c in range(self.channels):
+            for row in range(y0, y0 + height):
+                start = c * self.pixel_count + row * self.width + x0
+                yield slice(start, start + width)
+
+    def crop(self, x0: int, y0: int, width: int, height: int) -> PixelBuffer:
+        """Copies a rectangle of pixels, reading only that rectangle
+
+        Args:
+            - x0 (int): zero based column of the top left pixel
+            - y0 (int): zero based row of the top left pixel
+            - width (int): width of the rectangle
+            - height (int): height of the rectangle
+
+        Returns:
+            PixelBuffer: the rectangle, with this buffer typecode and layout
+        """
+        data = array(self.typecode)
+        for region in self._region_slices(x0, y0, width, height):
+            data.extend(_copy_samples(self.data[region], self.typecode))
+        return PixelBuffer(
+            width, height, self.channels, self.typecode, data, self.layout
+        )
+
+    def paste(self, other: PixelBuffer, x0: int, y0: int) -> None:
+        """Writes the pixels of another buffer over a rectangle of this one
+
+        Args:
+            - other (PixelBuffer): the pixels to write, with the same channels
+            - x0 (int): zero based column where the top left pixel goes
+            - y0 (int): zero based row where the top left pixel goes
+        """
+        samples = other.with_layout(self.layout).data
+        self.make_writable()
+        self.version += 1
+        position = 0
+        for region in self._region_slices(x0, y0, other.width, other.height):
+            length = region.stop - region.start
+            self.data[region] = _copy_samples(
+                samples[position : position + length], self.typecode
+            )
+            position += length
+
+    def copy(self) -> PixelBuffer:
+        return self.with_data(_copy_samples(self.data, self.typecode))
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> PixelBuffer:
+        return self.share()
+
+    @classmethod
+    def from_pixels(
+        cls,
+        pixels: Iterable[Iterable[Pixel]],
+        width: int,
+        height: int,
+        channels: int = 1,
+        typecode: str = "B",
+        layout: str = "interleaved",
+    ) -> PixelBuffer:
+        """Packs a pixel matrix into a buffer
+
+        Args:
+            - pixels (Iterable[Iterable[Pixel]]): rows of GrayPixel or RGBPixel objects
+
+        Raises:
+            ValidationError: If the amount of pixels does not match the dimensions
+
+        Returns:
+            PixelBuffer: buffer holding the pixel values
+        """
+        data = array(typecode)
+        if channels == 1:
+            for row in pixels:
+                data.extend(p.value for p in cast(Iterable[GrayPixel], row))
+        else:
+            for row in pixels:
+                for p in cast(Iterable[RGBPixel], row):
+                    data.extend((p.red, p.green, p.blue))
+        buffer = cls(width, height, channels, typecode, data)
+        if layout == "planar":
+            buffer = buffer.with_layout(layout)
+        return buffer
+
+    def with_layout(self, layout: str) -> PixelBuffer:
+        """Returns the same samples arranged in another layout"""
+        if layout == self.layout:
+            return self
+        result = PixelBuffer(
+            self.width, self.height, self.channels, self.typecode, layout=layout
+        )
+        for c in range(self.channels):
+            result.set_plane(c, self.plane(c))
+        return result
+
+
+class BufferView:
+    def __init__(
+        self,
+        base: PixelBuffer,
+        width: int,
+        height: int,
+        offset: int,
+        row_stride: int,
+        col_stride: int,
+    ):
+        """Geometric view (flip, rotation, transposition) over a PixelBuffer
+
+        The pixel at `(row, col)` of the view is the pixel number
+        `offset + row * row_stride + col * col_stride` of the base buffer (row
+        after row), so each transform only changes these numbers, in O(1),
+        and the samples are only moved by `materialize`.
+
+        Args:
+            - base (PixelBuffer): the buffer holding the samples
+            - width (int): number of columns of the view
+            - height (int): number of rows of the view
+            - offset (int): base pixel number of the view top left pixel
+            - row_stride (int): pixel number step between two view rows
+            - col_stride (int): pixel number step between two view columns
+        """
+        self.base = base
+        self.width = width
+        self.height = height
+        self.offset = offset
+        self.row_stride = row_stride
+        self.col_stride = col_stride
+
+    @classmethod
+    def identity(cls, base: PixelBuffer) -> BufferView:
+        return cls(base, base.width, base.height, 0, base.width, 1)
+
+    def with_base(self, base: PixelBuffer) -> BufferView:
+        """The same view over another buffer of the same geometry"""
+        return BufferView(
+            base,
+            self.width,
+            self.height,
+            self.offset,
+            self.row_stride,
+            self.col_stride,
+        )
+
+    @property
+    def is_identity(self) -> bool:
+        return (self.offset, self.row_stride, self.col_stride) == (
+            0,
+            self.base.width,
+            1,
+        )
+
+    def transposed(self) -> BufferView:
+        return BufferView(
+            self.base,
+            self.height,
+            self.width,
+            self.offset,
+            self.col_stride,
+            self.row_stride,
+        )
+
+    def flipped_rows(self) -> BufferView:
+        """Last row first (upside down)"""
+        return BufferView(
+            self.base,
+            self.width,
+            self.height,
+            self.offset + (self.height - 1) * self.row_stride,
+            -self.row_stride,
+            self.col_stride,
+        )
+
+    def flipped_cols(self) -> BufferView:
+        """Last column first (left-right)"""
+        return BufferView(
+            self.base,
+            self.width,
+            self.height,
+            self.offset + (self.width - 1) * self.col_stride,
+            self.row_stride,
+            -self.col_stride,
+        )
+
+    def get(self, row: int, col: int) -> Sample:
+        """Reads the sample(s) of one pixel of the view, see `PixelBuffer.get`"""
+        pixel = self.offset + row * self.row_stride + col * self.col_stride
+        return self.base.get(*divmod(pixel, self.base.width))
+
+    def _row(self, plane: array[int], row: int) -> array[int]:
+        # one extended slice of the plane per row
+        start = self.offset + row * self.row_stride
+        stop = start + self.width * self.col_stride
+        return plane[start : stop if stop >= 0 else None : self.col_stride]
+
+    def _planes(self) -> Iterator[array[int]]:
+        for c in range(self.base.channels):
+            plane = self.base.plane(c)
+            yield (
+                plane
+                if isinstance(plane, array)
+                else _copy_samples(plane, self.base.typecode)
+            )
+
+    def iter_rows(self) -> Iterator[array[int]]:
+        """Yields the samples of each row of the view, channels interleaved"""
+        planes = list(self._planes())
+        channels = self.base.channels
+        for row in range(self.height):
+            if channels == 1:
+                yield self._row(planes[0], row)
+                continue
+            samples = array(self.base.typecode, [0]) * (self.width * channels)
+            for c, plane in enumerate(planes):
+                samples[c::channels] = self._row(plane, row)
+            yield samples
+
+    def materialize(self) -> PixelBuffer:
+        """Contiguous buffer holding the samples in the view order"""
+        base = self.base
+        result = PixelBuffer(
+            self.width, self.height, base.channels, base.typecode, layout=base.layout
+        )
+        for c, plane in enumerate(self._planes()):
+            samples = array(base.typecode)
+            for row in range(self.height):
+                samples.extend(self._row(plane, row))
+            result.set_plane(c, samples)
+        return result
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(width={self.width}, height={self.height}, "
+            f"offset={self.offset}, strides=({self.row_stride}, {self.col_stride}))"
+        )
+
+
+def _copy_samples(data: array[int] | memoryview, typecode: str) -> array[int]:
+    if isinstance(data, array):
+        return data[:]
+    samples = array(typecode)
+    samples.frombytes(data if data.contiguous else data.tobytes())
+    return samples
+
+
+def _to_pixel(sample: Sample) -> Pixel:
+    if isinstance(sample, tuple):
+        return RGBPixel(*sample)
+    return GrayPixel(sample)
+
+
+def _from_pixel(pixel: Pixel, channels: int) -> Sample:
+    if channels == 1:
+        return cast(GrayPixel, pixel).value
+    rgb = cast(RGBPixel, pixel)
+    return (rgb.red, rgb.green, rgb.blue)
+
+
+class PixelRow:
+    def __init__(self, buffer: PixelBuffer, row: int):
+        """Row view over a PixelBuffer
+
+        Indexing returns detached Pixel objects, assigning a Pixel to an index
+        writes its value back into the buffer.
+        """
+        self._buffer = buffer
+        self._row = row
+
+    def __len__(self) -> int:
+        return self._buffer.width
+
+    @overload
+    def __getitem__(self, col: int) -> Pixel: ...
+
+    @overload
+    def __getitem__(self, col: slice) -> list[Pixel]: ...
+
+    def __getitem__(self, col: int | slice) -> Pixel | list[Pixel]:
+        if isinstance(col, slice):
+            return [self[c] for c in range(*col.indices(len(self)))]
+        if col < 0:
+            col += len(self)
+        if not 0 <= col < len(self):
+            raise IndexError("pixel index out of range")
+        return _to_pixel(self._buffer.get(self._row, col))
+
+    def __setitem__(self, col: int, pixel: Pixel) -> None:
+        if col < 0:
+            col += len(self)
+        if not 0 <= col < len(self):
+            raise IndexError("pixel index out of range")
+        self._buffer.set(self._row, col, _from_pixel(pixel, self._buffer.channels))
+
+    def __iter__(self) -> Iterator[Pixel]:
+        for col in range(len(self)):
+            yield _to_pixel(self._buffer.get(self._row, col))
+
+    def __eq__(self, other: Any) -> bool:
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class PixelMatrix:
+    def __init__(self, buffer: PixelBuffer):
+        """Matrix view over a PixelBuffer
+
+        Keeps the `values[row][col]` interface of the original list of lists,
+        while every read and write goes through the underlying buffer.
+        """
+        self._buffer = buffer
+
+    def __len__(self) -> int:
+        return self._buffer.height
+
+    @overload
+    def __getitem__(self, row: int) -> PixelRow: ...
+
+    @overload
+    def __getitem__(self, row: slice) -> list[PixelRow]: ...
+
+    def __getitem__(self, row: int | slice) -> PixelRow | list[PixelRow]:
+        if isinstance(row, slice):
+            return [self[r] for r in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("row index out of range")
+        return PixelRow(self._buffer, row)
+
+    def __iter__(self) -> Iterator[PixelRow]:
+        for row in range(len(self)):
+            yield PixelRow(self._buffer, row)
+
+    def __eq__(self, other: Any) -> bool:
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr([list(row) for row in self])
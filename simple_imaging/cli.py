@@ -0,0 +1,290 @@
+"""Batch processing command line
+
+Applies a chain of Image operations to many Netpbm files:
+
+    python main.py photos/ "scans/**/*.pgm" --op median:5 --op gamma:0.6 -o output
+
+Inputs are files, directories (searched recursively for Netpbm files) or glob
+patterns. Each output is written under the output directory at the path of
+its input relative to the directory (or to the non wildcard part of the
+pattern) it was found from, so the input tree is mirrored. Inputs that would
+be written to the same output, or over themselves, are refused.
+
+Operations are written `name:arg,arg,key=value`, where the name is an Image
+method or one of the short names of `pipeline.STEP_ALIASES`. The chain runs as a
+lazy `Pipeline`, so consecutive pointwise operations are fused. Files are
+spread over a pool of worker processes, each reading, processing and writing
+its own files.
+
+`--spec` runs a processing graph described in a JSON or TOML file instead,
+see `spec`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import as_completed
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from .errors import ValidationError
+from .image import read_file
+from .image import save_file
+from .index import NETPBM_EXTENSIONS
+from .pipeline import LAZY_OPERATIONS
+from .pipeline import parse_step
+from .pipeline import Step
+from .spec import run_spec
+
+# operations reading a second image cannot be chained from the command line
+CLI_OPERATIONS = tuple(
+    name for name in LAZY_OPERATIONS if name not in ("add_image", "subtract_image")
+)
+_WILDCARDS = "*?["
+# arguments of `process_file`: source, destination, steps and header
+Job = Tuple[str, str, Sequence[Step], Optional[str]]
+
+
+def parse_operation(spec: str) -> Step:
+    """Parses a command line operation, see `pipeline.parse_step`
+
+    Raises:
+        ValidationError: If the operation is unknown or reads a second image
+    """
+    step = parse_step(spec)
+    if step[0] not in CLI_OPERATIONS:
+        raise ValidationError(
+            f"Operation {step[0]} cannot run from the command line, options are {CLI_OPERATIONS}"
+        )
+    return step
+
+
+def _operation_type(spec: str) -> Step:
+    try:
+        return parse_operation(spec)
+    except ValidationError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _pattern_root(pattern: str) -> str:
+    """The leading directories of a glob pattern without any wildcard"""
+    parts = []
+    for part in os.path.dirname(pattern).split(os.sep):
+        if any(c in part for c in _WILDCARDS):
+            break
+        parts.append(part)
+    return os.sep.join(parts)
+
+
+def find_inputs(patterns: Sequence[str]) -> list[tuple[str, str]]:
+    """Expands files, directories and glob patterns into the files to process
+
+    Args:
+        - patterns (Sequence[str]): the command line inputs
+
+    Returns:
+        list[tuple[str, str]]: each file path (once) with the relative path
+        its output is written at
+    """
+    inputs: dict[str, str] = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                for name in sorted(files):
+                    if name.lower().endswith(NETPBM_EXTENSIONS):
+                        path = os.path.join(root, name)
+                        inputs.setdefault(path, os.path.relpath(path, pattern))
+        elif any(c in pattern for c in _WILDCARDS):
+            root = _pattern_root(pattern)
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path):
+                    inputs.setdefault(path, os.path.relpath(path, root or "."))
+        else:
+            inputs.setdefault(pattern, os.path.basename(pattern))
+    return list(inputs.items())
+
+
+def process_file(
+    source: str, destination: str, steps: Sequence[Step], header: str | None = None
+) -> tuple[int, float]:
+    """Runs the operations over one file and writes the result
+
+    Args:
+        - source (str): path of the input file
+        - destination (str): path of the output file, its directory is created if needed
+        - steps (Sequence[Step]): the operations, see `parse_operation`
+        - header (str, optional): output format. Defaults to the input header.
+
+    Raises:
+        ValidationError: If the destination is the source file
+
+    Returns:
+        tuple[int, float]: the input file size in bytes and the seconds spent
+    """
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        raise ValidationError(f"The output {destination} would overwrite the input")
+    start = time.perf_counter()
+    pipeline = read_file(source, mmap=True).lazy()
+    pipeline.steps.extend(steps)
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    save_file(destination, pipeline, header)
+    return os.path.getsize(source), time.perf_counter() - start
+
+
+def _collisions(jobs: Sequence[Job]) -> dict[str, list[str]]:
+    """The outputs written by more than one input, with these inputs"""
+    sources = defaultdict(list)
+    for source, destination, _, _ in jobs:
+        sources[os.path.normcase(os.path.abspath(destination))].append(source)
+    return {
+        destination: names for destination, names in sources.items() if len(names) > 1
+    }
+
+
+def _run_inline(job: Job) -> Future[tuple[int, float]]:
+    future: Future[tuple[int, float]] = Future()
+    try:
+        future.set_result(process_file(*job))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _report(
+    outcomes: Iterator[tuple[Job, Future[tuple[int, float]]]],
+) -> tuple[int, int, int]:
+    """Prints the result of each file as it completes
+
+    Returns:
+        tuple[int, int, int]: files processed, their total size in bytes and files failed
+    """
+    done, total_bytes, failed = 0, 0, 0
+    for (source, destination, _, _), future in outcomes:
+        try:
+            size, seconds = future.result()
+        except Exception as e:
+            failed += 1
+            print(f"{source}: failed, {e}", file=sys.stderr)
+            continue
+        done += 1
+        total_bytes += size
+        print(
+            f"{source} -> {destination}: {size / 1e6:.2f} MB in {seconds * 1000:.1f} ms"
+        )
+    return done, total_bytes, failed
+
+
+def _run_spec(path: str, workers: int) -> int:
+    report = run_spec(path, workers)
+    for name, seconds in report.durations.items():
+        print(f"{name}: {seconds * 1000:.1f} ms")
+    print(
+        f"{len(report.durations)} nodes in {report.elapsed:.2f} s, critical path "
+        f"{' -> '.join(report.critical_path)}: {report.critical_seconds:.2f} s"
+    )
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Applies a chain of operations to Netpbm files"
+    )
+    parser.add_argument(
+        "inputs", nargs="*", help="input files, directories or glob patterns"
+    )
+    parser.add_argument(
+        "--op",
+        dest="steps",
+        action="append",
+        type=_operation_type,
+        default=[],
+        metavar="NAME[:ARGS]",
+        help="operation to apply, in order, e.g. median:5 or gamma:0.6",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="output",
+        help="directory mirroring the input tree, created if it does not exist",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="worker processes, defaults to the number of CPUs",
+    )
+    parser.add_argument("--header", help="output format, defaults to the input one")
+    parser.add_argument(
+        "--spec",
+        help="JSON or TOML graph to run instead of the inputs, see `simple_imaging.spec`",
+    )
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Command line entry point
+
+    Prints a line per file with its size and processing time, then the
+    aggregate throughput in MB/s and images/s.
+
+    Args:
+        - argv (Sequence[str], optional): the arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        int: the exit status, 1 if any file (or the spec) failed
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.workers <= 0:
+        parser.error(f"Worker count must be positive, found {args.workers}")
+    if args.spec:
+        try:
+            return _run_spec(args.spec, args.workers)
+        except Exception as e:
+            print(f"{args.spec}: failed, {e}", file=sys.stderr)
+            return 1
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        parser.error("No input files found")
+
+    jobs = [
+        (source, os.path.join(args.output, relative), args.steps, args.header)
+        for source, relative in inputs
+    ]
+    collisions = _collisions(jobs)
+    if collisions:
+        parser.error(
+            "Several inputs would be written to the same output: "
+            + "; ".join(f"{', '.join(s)} -> {d}" for d, s in collisions.items())
+        )
+    start = time.perf_counter()
+    if args.workers == 1:
+        done, total_bytes, failed = _report((job, _run_inline(job)) for job in jobs)
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = {executor.submit(process_file, *job): job for job in jobs}
+            done, total_bytes, failed = _report(
+                (futures[future], future) for future in as_completed(futures)
+            )
+    # clamped, so tiny batches never divide by zero
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(
+        f"{done} images, {total_bytes / 1e6:.2f} MB in {elapsed:.2f} s: "
+        f"{total_bytes / 1e6 / elapsed:.2f} MB/s, {done / elapsed:.2f} images/s"
+        + (f", {failed} failed" if failed else "")
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
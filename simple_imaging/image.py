@@ -1,51 +1,71 @@
 from __future__ import annotations
 
-import copy
-from typing import Generator
-
+import operator
+import os
+import pickle
+import sys
+import weakref
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from itertools import accumulate
+from typing import Any
+from typing import Callable
+from typing import cast
+from typing import Iterable
+from typing import Iterator
+from typing import Sequence
+from typing import SupportsIndex
+
+from . import backend
+from .backend import numpy_enabled
+from .border import pad_plane
+from .border import PaddedView
+from .border import validate_mode
+from .buffer import _to_pixel
+from .buffer import BufferView
+from .buffer import channels_for
+from .buffer import PixelBuffer
+from .buffer import PixelMatrix
+from .buffer import typecode_for
 from .errors import ImcompatibleImages
 from .errors import ValidationError
+from .kernels import convolve_plane
+from .kernels import get_kernel
+from .kernels import Kernel
+from .lut import apply_table
+from .lut import build_table
+from .lut import lookup_table
+from .lut import Table
+from .lut import translate
+from .parallel import Parallel
+from .parallel import run_in_bands
+from .parallel import translate_in_parts
+from .parallel import validate_parallel
+from .pipeline import Pipeline
+from .shared import attach_buffer
+from .shared import share_buffer
+from .shared import SharedDescriptor
 from .types import GrayPixel
 from .types import Pixel
-from .types import RGBPixel
-from .utils import get_split_strings
-from .utils import parse_file_contents
-
-# TODO: Replace this Dictionary with a Enum
-# source: https://en.wikipedia.org/wiki/Kernel_(image_processing)#Edge_Handling
-KERNEL_FILTERS = {
-    "identity": (0, 0, 0, 0, 1, 0, 0, 0, 0),
-    "edge": (1, 0, -1, 0, 0, 0, -1, 0, 1),
-    "laplace": (0, -1, 0, -1, 4, -1, 0, -1, 0),
-    "laplace2": (-1, -1, -1, -1, 8, -1, -1, -1, -1),
-    "sharpen": (0, -1, 0, -1, 5, -1, 0, -1, 0),
-    "box_blur": (
-        0.1111,
-        0.1111,
-        0.1111,
-        0.1111,
-        0.1111,
-        0.1111,
-        0.1111,
-        0.1111,
-        0.1111,
-    ),
-    "gaussian_blur": (
-        0.0625,
-        0.125,
-        0.0625,
-        0.125,
-        0.25,
-        2,
-        0.0625,
-        0.125,
-        0.0625,
-    ),
-    "emboss": (-2, -1, 0, -1, 1, 1, 0, 1, 2),
-}
-
-
-def read_file(filepath: str) -> Image:
+from .types import validate_value_and_raise
+from .utils import BINARY_HEADERS
+from .utils import BITMAP_HEADERS
+from .utils import decode_image
+from .utils import encode_image
+from .utils import map_binary_file
+from .utils import NetpbmWriter
+from .utils import parse_ascii_file
+from .utils import parse_binary_file
+from .utils import raster_buffer
+from .utils import read_header
+from .utils import replacing_file
+
+PROBE_SIZE = 512
+HIGH_BOOST_BLURS = ("median", "box", "gaussian")
+
+
+def read_file(filepath: str, mmap: bool = False) -> Image:
     """File reading utility
 
     Given a file path, attempts to validade file contents,
@@ -54,39 +74,105 @@ def read_file(filepath: str) -> Image:
 
     Args:
         - filepath {str} -- path for desired Netpbm file
+        - mmap {bool} -- memory map binary rasters instead of reading them (default: {False})
 
     Returns:
         Image -- Image object generated by the file contents
     """
-    image = Image.from_file(filepath)
+    image = Image.from_file(filepath, mmap=mmap)
     return image
 
 
-def save_file(filepath: str, image: Image) -> None:
+def probe(filepath: str) -> dict[str, Any]:
+    """Reads only the header of a Netpbm file
+
+    The file is opened with a small read buffer, so only its first few hundred
+    bytes are read (more only if the header has long comments).
+
+    Args:
+        - filepath (str): path for desired Netpbm file
+
+    Returns:
+        dict[str, Any]: `header`, `dimensions`, `max_level`, `raster_offset`
+        (position of the first raster byte, or of the first ASCII sample) and
+        `file_size` in bytes
+    """
+    with open(filepath, "rb", buffering=PROBE_SIZE) as f:
+        file_data = read_header(f)
+        file_data["raster_offset"] = f.tell()
+        file_data["file_size"] = os.fstat(f.fileno()).st_size
+    return file_data
+
+
+def _bitmap_rows(
+    rows: Iterable[Sequence[int]], typecode: str, max_level: int
+) -> Iterator[array[int]]:
+    """Grayscale rows as PBM bits, samples below half the range are black (1)"""
+    table = lookup_table("bitmap", typecode, (max_level + 1) // 2)
+    for row in rows:
+        yield translate(row, typecode, table)
+
+
+def save_file(filepath: str, image: Image | Pipeline, header: str | None = None) -> int:
     """Writes image to disk
 
+    Rows are encoded one at a time into a reusable buffer that is flushed in
+    large blocks, so the memory needed does not grow with the image. ASCII
+    formats keep every line under 70 characters, the binary formats (P4, P5
+    and P6) are written as raw bytes, using two bytes per sample when
+    `max_level` is above 255. Grayscale images written as a bitmap (P1 or P4)
+    are thresholded at half their range.
+
     Args:
-        - filepath (str): the path to write the file too
-        - image (Image): an Image object to be written
+        - filepath (str): the path to write the file too, replaced once the image is written
+        - image (Image | Pipeline): an Image object to be written, pipelines are computed first
+        - header (str, optional): output format, P1 to P6. Defaults to the image header.
+
+    Raises:
+        ValidationError: If the output format does not match the image channels
+
+    Returns:
+        int: the amount of bytes written
     """
-    with open(filepath, "w") as f:
-        f.write(f"{image.header}\n")
-        f.write(f"{image.x} {image.y}\n")
-        f.write(f"{image.max_level}\n")
-        if image.header == "P3":
-            pixel_data = []
-            for line in image.values:
-                pixel_line = []
-                for pixel in line:
-                    pixel_line.extend(pixel.value)
-                pixel_data.extend(pixel_line)
-        else:
-            pixel_data = []
-            for line in image.values:
-                p_line = " ".join([str(pixel.value) for pixel in line])
-                pixel_data.append(p_line)
-        str_line = "\n".join(line for line in pixel_data)
-        f.writelines(f"{str_line}")
+    if isinstance(image, Pipeline):
+        image = image.compute()
+    header = image.header if header is None else header
+    channels = image._storage.channels
+    if channels_for(header) != channels:
+        raise ValidationError(f"Cannot write a {channels} channel image as {header}")
+    # flipped or rotated images are written without materializing them
+    rows: Iterable[Sequence[int]] = image._iter_rows()
+    if header in BITMAP_HEADERS and image.header not in BITMAP_HEADERS:
+        rows = _bitmap_rows(rows, image._storage.typecode, image.max_level)
+    # an image memory mapped from the destination keeps reading the old file
+    with replacing_file(filepath) as f:
+        with NetpbmWriter(f, header, image.x, image.y, image.max_level) as writer:
+            writer.write_rows(rows)
+    return writer.bytes_written
+
+
+@contextmanager
+def in_shared_memory(image: Image) -> Iterator[Image]:
+    """Copies an image into shared memory for the duration of a block
+
+    The image given to the block can be sent to worker processes, which
+    receive only its descriptor (see `Image.to_shared_memory`). The segment
+    is unlinked when the block exits, even on errors.
+
+    Args:
+        - image (Image): the image to share, left unchanged
+
+    Yields:
+        Iterator[Image]: the image over the shared memory segment
+    """
+    shared = image.to_shared_memory()
+    # kept for the whole block, even if the image stops using it
+    segment = shared._storage.segment
+    try:
+        yield shared
+    finally:
+        if segment is not None:
+            segment.unlink()
 
 
 def extract_channels(img: Image) -> list[Image, Image, Image]:
@@ -98,31 +184,16 @@ def extract_channels(img: Image) -> list[Image, Image, Image]:
     Returns:
         list[Image, Image, Image]: a list where each element is a channel in the RGB Image
     """
-    # Split each channel into a separated value list.
-    red_channel = [[GrayPixel(pixel.red) for pixel in row] for row in img.values]
-    green_channel = [[GrayPixel(pixel.green) for pixel in row] for row in img.values]
-    blue_channel = [[GrayPixel(pixel.blue) for pixel in row] for row in img.values]
-    # Instantiate each channel as a new P2 (Grayscale) Image
-    r_channel_image = Image(
-        header="P2",
-        max_level=img.max_level,
-        dimensions=(img.x, img.y),
-        contents=red_channel,
-    )
-    g_channel_image = Image(
-        header="P2",
-        max_level=img.max_level,
-        dimensions=(img.x, img.y),
-        contents=blue_channel,
-    )
-    b_channel_image = Image(
-        header="P2",
-        max_level=img.max_level,
-        dimensions=(img.x, img.y),
-        contents=green_channel,
-    )
-
-    return [r_channel_image, g_channel_image, b_channel_image]
+    # Instantiate each channel plane as a new P2 (Grayscale) Image
+    return [
+        Image(
+            header="P2",
+            max_level=img.max_level,
+            dimensions=(img.x, img.y),
+            buffer=PixelBuffer(img.x, img.y, 1, img._buffer.typecode, plane),
+        )
+        for plane in img._buffer.planes()
+    ]
 
 
 def merge_channels(channels: list[Image, Image, Image]) -> Image:
@@ -134,26 +205,18 @@ def merge_channels(channels: list[Image, Image, Image]) -> Image:
     Returns:
         Image: a composite P3 Image
     """
-    # Grabs only the channel data
-    r_channel, g_channel, b_channel = (
-        channels[0].values,
-        channels[1].values,
-        channels[2].values,
-    )
-    rgb_channels = [
-        [RGBPixel(r.value, g.value, b.value) for r, g, b in row]
-        for row in zip(r_channel, g_channel, b_channel)
-    ]
-    for row in zip(r_channel, g_channel, b_channel):
-        print(f"{row=}")
-        for r, g, b in row:
-            print(f"{r=} {g=} {b=}")
     base_image = channels[0]
+    rgb_buffer = PixelBuffer(
+        base_image.x, base_image.y, 3, typecode_for(base_image.max_level)
+    )
+    # Grabs only the channel data
+    for c, channel in enumerate(channels):
+        rgb_buffer.set_plane(c, channel._buffer.plane())
     return Image(
         header="P3",
         max_level=base_image.max_level,
         dimensions=(base_image.x, base_image.y),
-        contents=rgb_channels,
+        buffer=rgb_buffer,
     )
 
 
@@ -177,10 +240,6 @@ def validate_image_compatibility(image1: Image, image2: Image) -> bool:
     )
 
 
-def _map_value(input_value: int) -> float:
-    return input_value / 255.0
-
-
 def _calculate_frequencies(
     histogram: dict[str, int], pixel_total: int
 ) -> dict[str, float]:
@@ -214,26 +273,352 @@ def _generate_equalized_map(
     # Calculate the mapped output for each level
     for level, freq in frequencies.items():
         cummulative_freq += freq
-        resulting_value = round((num_level - 1) * cummulative_freq)
-        equalized_map[level] = resulting_value
+        equalized_map[level] = _equalized_level(cummulative_freq, num_level)
     return equalized_map
 
 
+def _equalized_level(cummulative_freq: float, num_level: int) -> int:
+    """New intensity of a level, given its cumulative frequency"""
+    return round((num_level - 1) * cummulative_freq)
+
+
+def _count_levels(samples: Sequence[int], typecode: str, levels: int) -> array[int]:
+    """Occurrences of each value below `levels`, in a single pass
+
+    Args:
+        - samples (Sequence[int]): the samples to count
+        - typecode (str): `array` typecode of the samples
+        - levels (int): number of levels counted, larger values are ignored
+
+    Returns:
+        array: `levels` counts (typecode `Q`), indexed by sample value
+    """
+    if numpy_enabled():
+        return backend.count_levels(samples, typecode, levels)
+    counts = array("Q", bytes(8 * levels))
+    for value, count in Counter(samples).items():
+        if value < levels:
+            counts[value] = count
+    return counts
+
+
+def _equalization_table(
+    counts: Sequence[int], num_level: int, ceiling: int, typecode: str
+) -> Table:
+    """Lookup table of the global histogram equalization of one channel
+
+    Args:
+        - counts (Sequence[int]): the channel histogram, see `Image.histogram`
+        - num_level (int): number of graylevels in the image
+        - ceiling (int): largest value a sample can take
+        - typecode (str): `array` typecode of the samples
+
+    Returns:
+        Table: the new value of each sample, 0 for values outside the histogram
+    """
+    total = sum(counts)
+    levels = [
+        max(0, min(ceiling, _equalized_level(cumulative / total, num_level)))
+        for cumulative in accumulate(counts)
+    ]
+    return build_table(lambda v: levels[v] if v < len(levels) else 0, typecode)
+
+
+def _local_equalization(
+    plane: array[int] | memoryview,
+    width: int,
+    height: int,
+    size: int,
+    num_level: int,
+    mode: str = "extend",
+) -> Iterator[tuple[int, int]]:
+    """Equalizes each sample against the histogram of its `size x size` window
+
+    The window histogram is kept in a Fenwick tree over the sample levels, so
+    the cumulative count up to the pivot level costs O(log levels). Windows
+    are visited in a zig-zag scan (left to right, then right to left on the
+    next row), so each step only adds and removes one row or one column.
+
+    With the `extend` border mode the tree holds the in-range rectangle of
+    the window, and the pivot row and column repeated for the out-of-range
+    coordinates are counted directly. Other modes pad the plane first.
+
+    Yields:
+        Iterator[tuple[int, int]]: the index of each sample and its new value
+    """
+    offset = size // 2
+    span = 2 * offset + 1
+    area = span * span
+    levels = 1 << (8 * plane.itemsize)
+    tree = [0] * (levels + 1)
+    if mode == "extend":
+        source, source_width = plane, width
+    else:
+        source = pad_plane(plane, width, height, offset, mode)
+        source_width = width + 2 * offset
+
+    def bounds(coord: int, length: int) -> tuple[int, int]:
+        # window bounds in `source` coordinates
+        if mode == "extend":
+            return max(0, coord - offset), min(length, coord + offset + 1)
+        return coord, coord + span
+
+    def update(rows: range, cols: range, delta: int) -> None:
+        for r in rows:
+            start = r * source_width
+            for c in cols:
+                index = source[start + c] + 1
+                while index <= levels:
+                    tree[index] += delta
+                    index += index & -index
+
+    def count_up_to(value: int) -> int:
+        total, index = 0, value + 1
+        while index > 0:
+            total += tree[index]
+            index -= index & -index
+        return total
+
+    top = bottom = left = right = 0
+    for i in range(height):
+        columns = range(width) if i % 2 == 0 else range(width - 1, -1, -1)
+        for j in columns:
+            new_left, new_right = bounds(j, width)
+            rows = range(top, bottom)
+            update(rows, range(new_left, left), 1)
+            update(rows, range(left, new_left), -1)
+            update(rows, range(right, new_right), 1)
+            update(rows, range(new_right, right), -1)
+            left, right = new_left, new_right
+            new_top, new_bottom = bounds(i, height)
+            cols = range(left, right)
+            update(range(new_top, top), cols, 1)
+            update(range(top, new_top), cols, -1)
+            update(range(bottom, new_bottom), cols, 1)
+            update(range(new_bottom, bottom), cols, -1)
+            top, bottom = new_top, new_bottom
+
+            pivot = i * width + j
+            value = plane[pivot]
+            below = count_up_to(value)
+            missing_rows, missing_cols = span - (bottom - top), span - (right - left)
+            if missing_rows:
+                row = plane[i * width + left : i * width + right]
+                below += missing_rows * sum(1 for v in row if v <= value)
+            if missing_cols:
+                column = plane[top * width + j : bottom * width : width]
+                below += missing_cols * sum(1 for v in column if v <= value)
+            below += missing_rows * missing_cols
+            yield pivot, _equalized_level(below / area, num_level)
+
+
+def _integral_image(plane: Sequence[int], width: int, height: int) -> list[list[int]]:
+    """Summed-area table of a plane
+
+    `table[i][j]` holds the sum of the samples above and to the left of
+    row `i` and column `j` (exclusive), with a leading row and column of zeros.
+    """
+    table = [[0] * (width + 1)]
+    for start in range(0, width * height, width):
+        above = table[-1]
+        row_sums = accumulate(plane[start : start + width], initial=0)
+        table.append([a + b for a, b in zip(above, row_sums)])
+    return table
+
+
+def _box_sums(
+    plane: array[int] | memoryview,
+    width: int,
+    height: int,
+    size: int,
+    mode: str = "extend",
+) -> Iterator[int]:
+    """Sum of each `size x size` window
+
+    With the `extend` border mode coordinates outside the image are replaced
+    by the pivot ones. A window then covers the in-range rectangle, plus the
+    pivot row and column repeated once per missing coordinate, each one an
+    O(1) lookup in the integral image. Other modes pad the plane first.
+    """
+    offset = size // 2
+    span = 2 * offset + 1  # even sizes still slide an odd window
+    if mode != "extend":
+        padded = pad_plane(plane, width, height, offset, mode)
+        table = _integral_image(padded, width + 2 * offset, height + 2 * offset)
+        for i in range(height):
+            t_row, b_row = table[i], table[i + span]
+            for j in range(width):
+                yield b_row[j + span] - t_row[j + span] - b_row[j] + t_row[j]
+        return
+    table = _integral_image(plane, width, height)
+    # in-range column bounds and the number of missing columns, per pivot column
+    col_bounds = []
+    for j in range(width):
+        left, right = max(0, j - offset), min(width, j + offset + 1)
+        col_bounds.append((left, right, span - (right - left)))
+    for i in range(height):
+        top, bottom = max(0, i - offset), min(height, i + offset + 1)
+        missing_rows = span - (bottom - top)
+        t_row, b_row = table[top], table[bottom]
+        p_top, p_bottom = table[i], table[i + 1]
+        for j, (left, right, missing_cols) in enumerate(col_bounds):
+            total = b_row[right] - t_row[right] - b_row[left] + t_row[left]
+            if missing_cols:
+                # pivot column over the in-range rows
+                column = b_row[j + 1] - t_row[j + 1] - b_row[j] + t_row[j]
+                total += missing_cols * column
+            if missing_rows:
+                # pivot row over the in-range columns
+                row = p_bottom[right] - p_top[right] - p_bottom[left] + p_top[left]
+                total += missing_rows * row
+                if missing_cols:
+                    total += missing_rows * missing_cols * plane[i * width + j]
+            yield total
+
+
+def _running_medians(
+    plane: array[int] | memoryview,
+    width: int,
+    height: int,
+    size: int,
+    mode: str = "extend",
+) -> Iterator[int]:
+    """Lower median of each `size x size` window
+
+    Huang's running histogram: along a row, sliding the window one column
+    only removes the leaving column from the histogram and adds the entering
+    one, and the median is tracked by moving it from its previous position.
+
+    With the `extend` border mode (see `border`), out-of-range rows are
+    replaced by the pivot row (which then weighs more in the histogram) and
+    out-of-range columns by the pivot column, added only while computing that
+    pivot median. Other modes pad the plane first.
+    """
+    offset = size // 2
+    span = 2 * offset + 1
+    area = span * span
+    rank = area // 2 if area % 2 != 0 else area // 2 - 1
+    histogram = [0] * (1 << (8 * plane.itemsize))
+    if mode == "extend":
+        source, source_width = plane, width
+        # in-range column bounds and the number of missing columns, per pivot column
+        col_bounds = []
+        for j in range(width):
+            left, right = max(0, j - offset), min(width, j + offset + 1)
+            col_bounds.append((left, right, span - (right - left)))
+    else:
+        source = pad_plane(plane, width, height, offset, mode)
+        source_width = width + 2 * offset
+        col_bounds = [(j, j + span, 0) for j in range(width)]
+    for i in range(height):
+        # (row start, weight) of the rows in the window
+        if mode == "extend":
+            top, bottom = max(0, i - offset), min(height, i + offset + 1)
+            rows = [
+                (r * width, 1 + (span - (bottom - top) if r == i else 0))
+                for r in range(top, bottom)
+            ]
+        else:
+            rows = [((i + a) * source_width, 1) for a in range(span)]
+        left, right, _ = col_bounds[0]
+        for c in range(left, right):
+            for start, weight in rows:
+                histogram[source[start + c]] += weight
+        # median candidate and the number of samples below it
+        median, below = 0, 0
+        for j, (new_left, new_right, missing_cols) in enumerate(col_bounds):
+            for c in range(left, new_left):
+                for start, weight in rows:
+                    value = source[start + c]
+                    histogram[value] -= weight
+                    if value < median:
+                        below -= weight
+            for c in range(right, new_right):
+                for start, weight in rows:
+                    value = source[start + c]
+                    histogram[value] += weight
+                    if value < median:
+                        below += weight
+            left, right = new_left, new_right
+            if missing_cols:
+                for start, weight in rows:
+                    value = source[start + j]
+                    histogram[value] += weight * missing_cols
+                    if value < median:
+                        below += weight * missing_cols
+            while below > rank:
+                median -= 1
+                below -= histogram[median]
+            while below + histogram[median] <= rank:
+                below += histogram[median]
+                median += 1
+            yield median
+            if missing_cols:
+                for start, weight in rows:
+                    value = source[start + j]
+                    histogram[value] -= weight * missing_cols
+                    if value < median:
+                        below -= weight * missing_cols
+        # empty the histogram for the next row
+        for c in range(left, right):
+            for start, weight in rows:
+                histogram[source[start + c]] -= weight
+
+
+def _blurred_sums(
+    plane: array[int] | memoryview,
+    width: int,
+    height: int,
+    size: int,
+    blur: str,
+    mode: str = "extend",
+) -> tuple[Iterator[int], int]:
+    """Blurred samples of a plane, as exact sums and the divisor of those sums
+
+    Args:
+        - plane (array | memoryview): samples of one channel, row after row
+        - width (int): plane width
+        - height (int): plane height
+        - size (int): size of the blur window
+        - blur (str): one of `HIGH_BOOST_BLURS`
+        - mode (str, optional): border mode. Defaults to "extend".
+
+    Returns:
+        tuple[Iterator[int], int]: the sum of each sample, row after row, and
+        the divisor giving the blurred value
+    """
+    if blur == "median":
+        return _running_medians(plane, width, height, size, mode), 1
+    if blur == "box":
+        span = 2 * (size // 2) + 1
+        return _box_sums(plane, width, height, size, mode), span * span
+    kernel = Kernel.gaussian(size // 2)
+    rows = convolve_plane(plane, width, height, kernel, mode)
+    return (total for row in rows for total in row), kernel.scale
+
+
 class Image:
     def __init__(
         self,
         header: str,
         max_level: int,
         dimensions: tuple[int, int],
-        contents: list[list[Pixel]] = None,
+        contents: Sequence[Sequence[Pixel]] | None = None,
+        buffer: PixelBuffer | None = None,
+        layout: str = "interleaved",
     ):
         """Image class
 
+        The pixels are kept in a single typed buffer (see `PixelBuffer`),
+        8 bits per sample up to `max_level` 255 and 16 bits above that.
+
         Args:
             - header (str): A string of the image header, accepts (P1, P2 and P3)
             - max_level (int): Max number of gray levels allowed for the image
             - dimensions (tuple[int, int]): The (width, height) dimensions of the image
-            - contents (list[list[Pixel]], optional): A Pixel matrix to pre-populate the iamge. Defaults to None.
+            - contents (Sequence[Sequence[Pixel]], optional): A Pixel matrix to pre-populate the iamge. Defaults to None.
+            - buffer (PixelBuffer, optional): Pixel storage to use as is, instead of `contents`. Defaults to None.
+            - layout (str, optional): Sample layout for color images, `interleaved` or `planar`. Defaults to "interleaved".
 
         Raises:
             ValidationError: If there're invalid dimensions (below 0, None)
@@ -245,37 +630,444 @@ class Image:
         self.header = header
         self.x, self.y = dimensions
         self.max_level = max_level
-        self.values = contents
+        if buffer is None:
+            buffer = PixelBuffer(
+                self.x,
+                self.y,
+                channels_for(header),
+                typecode_for(max_level),
+                layout=layout,
+            )
+            if contents is not None:
+                buffer = PixelBuffer.from_pixels(
+                    contents,
+                    self.x,
+                    self.y,
+                    buffer.channels,
+                    buffer.typecode,
+                    layout,
+                )
+        elif (buffer.width, buffer.height) != (self.x, self.y):
+            raise ValidationError(
+                f"Buffer dimensions {(buffer.width, buffer.height)} do not match {dimensions}"
+            )
+        self._buffer = buffer
+        # (buffer reference, buffer version, max_level, histograms) last counted
+        self._histogram_cache: (
+            tuple[weakref.ref[PixelBuffer], int, int, list[array[int]]] | None
+        ) = None
+
+    # lookup table applied by `_with_planes`, only set while a `Pipeline` runs
+    _output_table: Table | None = None
 
     @classmethod
-    def from_file(cls, filepath: str) -> Image:
+    def from_file(cls, filepath: str, mmap: bool = False) -> Image:
         """Creates image from file
 
+        Binary files (P4, P5 and P6) are decoded straight into the pixel buffer,
+        ASCII files are tokenized lazily while the buffer is filled.
+
+        With `mmap`, 8 bit P5 and P6 files only have their header parsed, the
+        pixel buffer is a read-only memory map of the raster. Read-only
+        operations stream from the mapping, the first write copies it.
+
         Args:
             - filepath (str): path to source file
+            - mmap (bool, optional): memory map binary rasters. Defaults to False.
         """
-        with open(filepath) as f:
-            f_contents = get_split_strings(f)
-        image_data = parse_file_contents(f_contents)
+        with open(filepath, "rb") as f:
+            header = f.read(2).decode("ascii", errors="replace")
+            f.seek(0)
+            if mmap and header in BINARY_HEADERS:
+                image_data = map_binary_file(f)
+            elif header in BINARY_HEADERS:
+                image_data = parse_binary_file(f)
+            else:
+                image_data = parse_ascii_file(f)
         image = cls(**image_data)
         return image
 
+    @classmethod
+    def from_shared_memory(cls, descriptor: SharedDescriptor) -> Image:
+        """Creates an image over a shared memory segment, see `to_shared_memory`
+
+        Args:
+            - descriptor (SharedDescriptor): the descriptor of the shared image
+
+        Raises:
+            FileNotFoundError: If the segment was already unlinked
+        """
+        return cls(
+            descriptor.header,
+            descriptor.max_level,
+            (descriptor.width, descriptor.height),
+            buffer=attach_buffer(descriptor),
+        )
+
+    # (parent image, x0, y0) of a region of interest, see `roi`
+    _region: tuple[Image, int, int] | None = None
+    # flip, rotation, transposition or padding not applied to the storage yet
+    _view: BufferView | PaddedView | None = None
+    # (parent buffer reference, parent buffer version) a region was cropped from
+    _region_source: tuple[weakref.ref[PixelBuffer], int]
+    # the storage, read through `_storage` and `_buffer`
+    _raw: PixelBuffer
+
+    @property
+    def _storage(self) -> PixelBuffer:
+        """Pixel storage under any pending view
+
+        A region of interest crops it again from its parent when the parent
+        pixels changed since the last read.
+        """
+        if self._region is not None:
+            parent, x0, y0 = self._region
+            source = parent._buffer
+            reference, version = self._region_source
+            if reference() is not source or version != source.version:
+                self._raw = source.crop(x0, y0, self.x, self.y)
+                self._region_source = (weakref.ref(source), source.version)
+        return self._raw
+
+    @property
+    def _buffer(self) -> PixelBuffer:
+        """Contiguous pixel storage, materializing any pending view"""
+        if self._view is not None:
+            self._raw = self._view.materialize()
+            self._view = None
+        return self._storage
+
+    @_buffer.setter
+    def _buffer(self, buffer: PixelBuffer) -> None:
+        self._raw = buffer
+        self._view = None
+        if self._region is not None:
+            self._write_back()
+
+    def _write_back(self) -> None:
+        """Writes the pixels of a region of interest into its parent"""
+        if self._region is None:
+            return
+        parent, x0, y0 = self._region
+        target = parent._buffer
+        target.paste(self._raw, x0, y0)
+        if parent._region is not None:
+            parent._write_back()
+        self._region_source = (weakref.ref(target), target.version)
+
+    def _orient(
+        self, transform: Callable[[BufferView], BufferView], inplace: bool = True
+    ) -> Image:
+        """Records a flip, rotation or transposition, without moving samples"""
+        image = self if inplace else self.copy_current_image()
+        if image._region is not None:
+            view = transform(BufferView.identity(image._storage))
+            if (view.width, view.height) == (image.x, image.y):
+                # same shape, the result is written through to the parent
+                image._buffer = view.materialize()
+                return image
+            image._region = None
+        if isinstance(image._view, BufferView):
+            view = transform(image._view)
+        else:
+            view = transform(BufferView.identity(image._buffer))
+        image.x, image.y = view.width, view.height
+        image._view = None if view.is_identity else view
+        return image
+
+    def _iter_rows(self) -> Iterator[array[int] | memoryview]:
+        """Rows of samples, read through the pending view if there is one"""
+        storage = self._storage
+        if self._view is not None:
+            return self._view.iter_rows()
+        return storage.iter_rows()
+
     @property
     def dimensions(self):
         return (self.x, self.y)
 
+    @property
+    def values(self) -> PixelMatrix:
+        """Pixel matrix view over the image buffer
+
+        Reading `values[i][j]` returns a detached Pixel, assigning a Pixel to
+        `values[i][j]` (or a whole matrix to `values`) writes into the buffer.
+        """
+        return PixelMatrix(self._buffer)
+
+    @values.setter
+    def values(self, contents: list[list[Pixel]]) -> None:
+        self._buffer = PixelBuffer.from_pixels(
+            contents,
+            self.x,
+            self.y,
+            self._buffer.channels,
+            self._buffer.typecode,
+            self._buffer.layout,
+        )
+
+    @property
+    def ndarray(self) -> Any:
+        """Zero-copy NumPy view over the pixel buffer
+
+        Shaped `(y, x)` for grayscale images and `(y, x, 3)` for color ones
+        (`(3, y, x)` with the planar layout). Writes into the array are seen
+        by the image, as they share the same memory. A buffer shared with
+        copies of this image, or a read-only one (e.g. memory mapped by
+        `read_file`), is copied first, so the array is always writable and
+        neither the copies nor the file are affected.
+
+        Raises:
+            ImportError: If NumPy is not installed
+        """
+        self._buffer.make_writable()
+        return backend.as_ndarray(self._buffer)
+
+    @property
+    def _ceiling(self) -> int:
+        # Highest value an operation may produce, 255 for 8 bit images
+        return 255 if self._storage.typecode == "B" else self.max_level
+
     def copy_current_image(self) -> Image:
-        """Creates a deepcopy of the current image
+        """Creates a copy of the current image
+
+        The copy shares the pixel buffer with this image until one of them
+        writes into it (copy on write), so copying is O(1). Pending geometric
+        views are kept.
+
+        Returns:
+            Image: copy of the current image data
+        """
+        storage = self._storage.share()
+        image = type(self)(
+            header=self.header,
+            max_level=self.max_level,
+            dimensions=(storage.width, storage.height),
+            buffer=storage,
+        )
+        if self._view is not None:
+            image._view = self._view.with_base(storage)
+            image.x, image.y = self.x, self.y
+        return image
+
+    def roi(self, x0: int, y0: int, width: int, height: int) -> Image:
+        """Region of interest, an image over a rectangle of this one
+
+        Operations on the region only read and process the pixels of the
+        rectangle. The region is written through: in place results,
+        `set_pixel` and whole `values` assignments on the region land in this
+        image, and the region sees the changes made to this image. Copies of
+        the region, and transforms changing its shape, are detached from it.
+
+        Args:
+            - x0 (int): zero based column of the top left pixel
+            - y0 (int): zero based row of the top left pixel
+            - width (int): width of the region
+            - height (int): height of the region
+
+        Raises:
+            ValidationError: If the rectangle is not inside the image
+
+        Returns:
+            Image: the region
+        """
+        if not (
+            0 <= x0
+            and 0 <= y0
+            and 0 < width
+            and 0 < height
+            and x0 + width <= self.x
+            and y0 + height <= self.y
+        ):
+            raise ValidationError(
+                f"Region ({x0}, {y0}, {width}, {height}) is outside of the image ({self.x} x {self.y})"
+            )
+        source = self._buffer
+        region = type(self)(
+            header=self.header,
+            max_level=self.max_level,
+            dimensions=(width, height),
+            buffer=source.crop(x0, y0, width, height),
+        )
+        region._region = (self, x0, y0)
+        region._region_source = (weakref.ref(source), source.version)
+        return region
+
+    def crop(
+        self, x0: int, y0: int, width: int, height: int, inplace: bool = True
+    ) -> Image:
+        """Keeps only a rectangle of the image, see `roi` for the arguments
+
+        Returns:
+            Image: processing result
+        """
+        result = self.roi(x0, y0, width, height).copy_current_image()
+        if not inplace:
+            return result
+        self._region = None
+        self.x, self.y = width, height
+        self._buffer = result._storage
+        return self
+
+    def pad(self, size: int, mode: str = "constant", inplace: bool = True) -> Image:
+        """Adds a border of `size` pixels on every side
+
+        The border is virtual, read through the border mode until an
+        operation needs contiguous samples.
+
+        Args:
+            - size (int): border size
+            - mode (str, optional): replicate, reflect, wrap or constant, see `border`. Defaults to "constant".
+            - inplace (bool, optional): If false will generate a new image as result. Defaults to True.
+
+        Raises:
+            ValidationError: If the mode is unknown or `extend`
+
+        Returns:
+            Image: processing result
+        """
+        image = self if inplace else self.copy_current_image()
+        view = PaddedView(image._buffer, size, mode)
+        image._region = None
+        image._view = view
+        image.x, image.y = view.width, view.height
+        return image
+
+    def to_shared_memory(self) -> Image:
+        """Copies the image into a new shared memory segment
+
+        The new image owns the segment, which is unlinked by
+        `unlink_shared_memory` (see `in_shared_memory`), or at the latest
+        when no image of this process reads it anymore. While the segment is in use,
+        pickling the image (e.g. to send it to a worker process) only sends
+        its `shared_descriptor`, from which the receiving process maps the
+        same memory. Writes copy the pixels out of the segment first.
+
+        Returns:
+            Image: an image over the segment
+        """
+        return type(self)(
+            self.header,
+            self.max_level,
+            (self.x, self.y),
+            buffer=share_buffer(self._buffer),
+        )
+
+    @property
+    def shared_descriptor(self) -> SharedDescriptor | None:
+        """Descriptor of the shared memory holding the pixels, None when not shared"""
+        if self._view is not None or self._region is not None:
+            return None
+        segment = self._raw.segment
+        if segment is None or segment.unlinked:
+            return None
+        buffer = self._raw
+        return SharedDescriptor(
+            segment.name,
+            self.header,
+            self.max_level,
+            buffer.width,
+            buffer.height,
+            buffer.channels,
+            buffer.typecode,
+            buffer.layout,
+        )
+
+    def unlink_shared_memory(self) -> None:
+        """Frees the shared memory segment created by `to_shared_memory`
+
+        The pixels stay readable in this process, other processes can no
+        longer map them. Does nothing for images not owning a segment.
+        """
+        segment = self._storage.segment
+        if segment is not None:
+            segment.unlink()
+
+    def __reduce_ex__(self, protocol: SupportsIndex) -> tuple[Any, ...]:
+        """Pickles the image as its geometry and raw samples
+
+        Images in shared memory only send their `shared_descriptor`. With
+        pickle protocol 5 the samples are a `PickleBuffer`, which a
+        `buffer_callback` can send out-of-band, without copying them.
+        """
+        descriptor = self.shared_descriptor
+        if descriptor is not None:
+            return type(self).from_shared_memory, (descriptor,)
+        buffer = self._buffer
+        raster: pickle.PickleBuffer | bytes
+        if operator.index(protocol) >= 5:
+            raster = pickle.PickleBuffer(buffer.data)
+        else:
+            raster = buffer.data.tobytes()
+        arguments = (
+            self.header,
+            self.max_level,
+            raster,
+            buffer.width,
+            buffer.height,
+            buffer.channels,
+            buffer.typecode,
+            buffer.layout,
+            sys.byteorder,
+        )
+        return type(self)._from_raster, arguments
+
+    @classmethod
+    def _from_raster(
+        cls,
+        header: str,
+        max_level: int,
+        raster: Any,
+        width: int,
+        height: int,
+        channels: int,
+        typecode: str,
+        layout: str,
+        byteorder: str,
+    ) -> Image:
+        buffer = raster_buffer(
+            raster, width, height, channels, typecode, layout, byteorder
+        )
+        return cls(header, max_level, (width, height), buffer=buffer)
+
+    def to_bytes(self) -> bytes:
+        """Serializes the image: a small fixed size header and the raw samples
+
+        Returns:
+            bytes: the image in the wire format, see `utils.WIRE_HEADER`
+        """
+        return encode_image(self.header, self.max_level, self._buffer)
+
+    @classmethod
+    def from_bytes(cls, data: Any) -> Image:
+        """Creates an image from the output of `to_bytes`
+
+        The pixels are a read-only view over `data` until the first write.
+
+        Args:
+            - data (Any): any bytes-like object
+
+        Raises:
+            InvalidFileError: If the data is not a serialized image
+        """
+        return cls(**decode_image(data))
+
+    def lazy(self) -> Pipeline:
+        """Starts a lazy pipeline over this image
+
+        The operations called on the pipeline are only recorded, and run
+        together (with the pointwise ones fused into lookup tables) by
+        `Pipeline.compute` or `save_file`.
 
         Returns:
-            Image: copy (full copy) of the current image data
+            Pipeline: an empty pipeline reading this image
         """
-        return copy.deepcopy(self)
+        return Pipeline(self)
 
     def negative(self, inplace: bool = True) -> Image:
         """Negative operation
 
-        For each pixel in the image, invokes the Pixel `negative` method
+        Sets each sample to `255 - value`, obeying the 0~255 interval
 
         Args:
             - inplace (bool, optional): Controls if the result will be a new Image. Defaults to True.
@@ -283,10 +1075,9 @@ class Image:
         Returns:
             Image: Processing result
         """
-        for line in self.values:
-            for pixel in line:
-                pixel.negative()
-        return self if inplace else self.copy_current_image()
+        table = lookup_table("negative", self._buffer.typecode, self._ceiling)
+        data = apply_table(self._buffer, table)
+        return self._return_result(self._buffer.with_data(data), inplace)
 
     def add_image(self, other_image: Image, inplace: bool = True) -> Image:
         """Image addition
@@ -308,12 +1099,17 @@ class Image:
                 "The images are incompatible for the `add` operation"
             )
 
-        value_list = other_image.values
-        pixel_data = self._generate_working_copy(populate=True)
-        for i, line in enumerate(value_list):
-            for j, pixel in enumerate(line):
-                pixel_data[i][j] += pixel
-        return self._return_result(pixel_data, inplace)
+        ceiling = self._ceiling
+        other_buffer = other_image._buffer.with_layout(self._buffer.layout)
+        data: Iterable[int]
+        if numpy_enabled():
+            data = backend.add(self._buffer, other_buffer, ceiling)
+        else:
+            data = (
+                min(ceiling, a + b)
+                for a, b in zip(self._buffer.data, other_buffer.data)
+            )
+        return self._return_result(self._buffer.with_data(data), inplace)
 
     def subtract_image(self, other_image: Image, inplace: bool = True) -> Image:
         """Image subtraction
@@ -335,12 +1131,16 @@ class Image:
                 "The images are incompatible for the `subtract` operation"
             )
 
-        value_list = other_image.values
-        pixel_data = self._generate_working_copy(populate=True)
-        for i, line in enumerate(value_list):
-            for j, pixel in enumerate(line):
-                pixel_data[i][j] -= pixel
-        return self._return_result(pixel_data, inplace)
+        other_buffer = other_image._buffer.with_layout(self._buffer.layout)
+        data: Iterable[int]
+        if numpy_enabled():
+            data = backend.subtract(self._buffer, other_buffer)
+        else:
+            data = (
+                a - b if a > b else 0
+                for a, b in zip(self._buffer.data, other_buffer.data)
+            )
+        return self._return_result(self._buffer.with_data(data), inplace)
 
     def multiply_image(self, value: int, inplace: bool = True) -> Image:
         """Image multiplication by an integer
@@ -354,52 +1154,131 @@ class Image:
         Returns:
             Image: processing result
         """
-        pixel_matrix = self._generate_working_copy(populate=True)
-        for row in pixel_matrix:
-            for pixel in row:
-                pixel *= value
-        return self._return_result(pixel_matrix, inplace)
+        table = lookup_table("multiply", self._buffer.typecode, value, self._ceiling)
+        data = apply_table(self._buffer, table)
+        return self._return_result(self._buffer.with_data(data), inplace)
 
-    def high_boost_filter(self, k: int | float = 1, inplace: bool = True) -> Image:
+    def high_boost_filter(
+        self,
+        k: int | float = 1,
+        inplace: bool = True,
+        mode: str = "extend",
+        blur: str = "median",
+        kernel: int = 3,
+        parallel: Parallel | None = None,
+    ) -> Image:
         """Applies the High-Boost filter
 
+        Each sample becomes `v + k * (v - blurred)`, rounded and clamped once
+        (with `k = 1` this is unsharp masking). The blur is computed in the
+        same pass, without any intermediate image.
+
         Args:
             - k (int, optional): adjustment constant. Defaults to 1.
             - inplace (bool, optional): If false will generate a new image as result. Defaults to True.
+            - mode (str, optional): border mode, see `border.BORDER_MODES`. Defaults to "extend".
+            - blur (str, optional): `median`, `box` or `gaussian`. Defaults to "median".
+            - kernel (int, optional): size of the blur window. Defaults to 3.
+            - parallel (Parallel, optional): worker processes (or an Executor) filtering bands of the image, see `parallel`. Defaults to None.
+
+        Raises:
+            ValidationError: If the blur is unknown
 
         Returns:
             Image: processing result
         """
-        img_copy = self.copy_current_image()  # create working copy
-        # blur image using median filter 3x3
-        blurred_image = self.median_filter(kernel=3, inplace=False)
-        # create a mask by subtracting the blur from the "original"
-        mask = img_copy.subtract_image(blurred_image, inplace=True)
-        # result is the current image added to the mask mutiplied by a K constant
-        return self.add_image(mask.multiply_image(k), inplace)
+        if blur not in HIGH_BOOST_BLURS:
+            raise ValidationError(
+                f"Unknown blur {blur}, options are {HIGH_BOOST_BLURS}"
+            )
+        validate_mode(mode)
+        validate_parallel(parallel)
+        if parallel is not None and mode != "wrap":
+            buffer = run_in_bands(
+                self,
+                "high_boost_filter",
+                kernel // 2,
+                parallel,
+                k,
+                mode=mode,
+                blur=blur,
+                kernel=kernel,
+            )
+            return self._return_result(buffer, inplace)
+        ceiling = self._ceiling
+        if numpy_enabled():
+            boosted = backend.high_boost(self._buffer, k, blur, kernel, ceiling, mode)
+            return self._return_result(self._with_planes(boosted), inplace)
+
+        planes = []
+        for c in range(self._buffer.channels):
+            plane = self._buffer.plane(c)
+            sums, divisor = _blurred_sums(plane, self.x, self.y, kernel, blur, mode)
+            # the mask (original - blurred) is neither stored nor rounded
+            planes.append(
+                [
+                    max(0, min(ceiling, round(v + k * (v - total / divisor))))
+                    for v, total in zip(plane, sums)
+                ]
+            )
+        return self._return_result(self._with_planes(planes), inplace)
 
-    def average_filter(self, kernel: int, inplace: bool = True) -> Image:
+    def average_filter(
+        self,
+        kernel: int,
+        inplace: bool = True,
+        mode: str = "extend",
+        parallel: Parallel | None = None,
+    ) -> Image:
         """Average filtering
 
         Given a kernel size this method will get the arithmetic average of the
         pixels in a sliding window and apply the result to the pivot (central) pixel.
 
         Args:
-            - kernel (int): kernel size. a kernel of 3 will result in a sliding window of 3x3 pixels.
+            - kernel (int): kernel size. a kernel of 3 will result in a sliding window of 3x3 pixels, an even size slides the next odd window.
             - inplace (bool, optional): If false will generate a new image as result. Defaults to True.
+            - mode (str, optional): border mode, see `border.BORDER_MODES`. Defaults to "extend".
+            - parallel (Parallel, optional): worker processes (or an Executor) filtering bands of the image, see `parallel`. Defaults to None.
 
         Returns:
             Image: processing result
         """
-        coord_list = [(i, j) for i in range(self.y) for j in range(self.x)]
-        pixel_data = self._generate_working_copy()
-        for sw, (i, j) in zip(self._sliding_window(size=kernel), coord_list):
-            flattened_values = [value for line in sw for value in line]
-            avg_value = round(sum(flattened_values) / (kernel * kernel))
-            pixel_data[i][j] = GrayPixel(max(0, min(255, avg_value)))
-        return self._return_result(pixel_data, inplace)
+        validate_mode(mode)
+        validate_parallel(parallel)
+        if parallel is not None and mode != "wrap":
+            buffer = run_in_bands(
+                self, "average_filter", kernel // 2, parallel, kernel, mode=mode
+            )
+            return self._return_result(buffer, inplace)
+        span = 2 * (kernel // 2) + 1
+        area = span * span
+        ceiling = self._ceiling
+        planes: Sequence[Sequence[int]]
+        if numpy_enabled():
+            planes = backend.window_average(self._buffer, kernel, ceiling, mode)
+            return self._return_result(self._with_planes(planes), inplace)
+
+        # window sums come from an integral image, so the cost per pixel
+        # does not depend on the kernel size
+        planes = [
+            [
+                max(0, min(ceiling, round(total / area)))
+                for total in _box_sums(
+                    self._buffer.plane(c), self.x, self.y, kernel, mode
+                )
+            ]
+            for c in range(self._buffer.channels)
+        ]
+        return self._return_result(self._with_planes(planes), inplace)
 
-    def median_filter(self, kernel: int, inplace: bool = True) -> Image:
+    def median_filter(
+        self,
+        kernel: int,
+        inplace: bool = True,
+        mode: str = "extend",
+        parallel: Parallel | None = None,
+    ) -> Image:
         """Median filtering
 
         Given a kernel size this method will get the median of the ordered list
@@ -408,38 +1287,61 @@ class Image:
         Args:
             - kernel (int): kernel size. a kernel of 3 will result in a sliding window of 3x3 pixels.
             - inplace (bool, optional): If false will generate a new image as result. Defaults to True.
+            - mode (str, optional): border mode, see `border.BORDER_MODES`. Defaults to "extend".
+            - parallel (Parallel, optional): worker processes (or an Executor) filtering bands of the image, see `parallel`. Defaults to None.
 
         Returns:
             Image: processing result
         """
-        coord_list = [(i, j) for i in range(self.y) for j in range(self.x)]
-        pixel_data = self._generate_working_copy()
-        for sw, (i, j) in zip(self._sliding_window(size=kernel), coord_list):
-            flattened_values = sorted([value for line in sw for value in line])
-            l_size = len(flattened_values)
-            if l_size % 2 != 0:
-                pixel_data[i][j] = GrayPixel(flattened_values[l_size // 2])
-            else:
-                pixel_data[i][j] = GrayPixel(flattened_values[l_size // 2 - 1])
-
-        return self._return_result(pixel_data, inplace)
+        validate_mode(mode)
+        validate_parallel(parallel)
+        if parallel is not None and mode != "wrap":
+            buffer = run_in_bands(
+                self, "median_filter", kernel // 2, parallel, kernel, mode=mode
+            )
+            return self._return_result(buffer, inplace)
+        planes: Sequence[Sequence[int]]
+        if numpy_enabled():
+            planes = backend.window_median(self._buffer, kernel, mode)
+            return self._return_result(self._with_planes(planes), inplace)
+
+        # lower median from a running histogram, instead of sorting each window
+        planes = [
+            list(_running_medians(self._buffer.plane(c), self.x, self.y, kernel, mode))
+            for c in range(self._buffer.channels)
+        ]
+        return self._return_result(self._with_planes(planes), inplace)
 
-    def laplacian_filter(self, inplace: bool = True) -> Image:
+    def laplacian_filter(
+        self,
+        inplace: bool = True,
+        mode: str = "extend",
+        parallel: Parallel | None = None,
+    ) -> Image:
         """Applies the laplacian filter to the image
 
         Args:
             - inplace (bool, optional): If false will generate a new image as result. Defaults to True.
+            - mode (str, optional): border mode, see `border.BORDER_MODES`. Defaults to "extend".
+            - parallel (Parallel, optional): worker processes (or an Executor) filtering bands of the image, see `parallel`. Defaults to None.
 
         Returns:
             Image: processing result
         """
-        return self._kernel_filter(inplace=inplace)
+        return self._kernel_filter(inplace=inplace, mode=mode, parallel=parallel)
 
-    def _kernel_filter(self, kernel: str = "laplace", inplace: bool = True) -> Image:
+    def _kernel_filter(
+        self,
+        kernel: str | Kernel = "laplace",
+        inplace: bool = True,
+        mode: str = "extend",
+        parallel: Parallel | None = None,
+    ) -> Image:
         """Abstract kernel filtering method
 
         given a selection of predefined kernels, this method will apply that kernel to
-        the image.
+        the image. Any `Kernel` object, or the name of a kernel added with
+        `register_kernel`, can be used as well.
 
         Current predefined options are:
             - identity
@@ -452,8 +1354,10 @@ class Image:
             - emboss
 
         Args:
-            - kernel (str, optional): The kernel to be utilized. Defaults to "laplace".
+            - kernel (str | Kernel, optional): The kernel to be utilized. Defaults to "laplace".
             - inplace (bool, optional): If false will generate a new image as result. Defaults to True.
+            - mode (str, optional): border mode, see `border.BORDER_MODES`. Defaults to "extend".
+            - parallel (Parallel, optional): worker processes (or an Executor) filtering bands of the image, see `parallel`. Defaults to None.
 
         Raises:
             ValidationError: if the passed kernel is not defined.
@@ -461,31 +1365,32 @@ class Image:
         Returns:
             Image: processing result
         """
-        try:
-            kernel_filter = KERNEL_FILTERS[kernel]
-        except KeyError:
-            raise ValidationError(
-                f"Selected kernel is invalid, options are {KERNEL_FILTERS.keys()}"
-            )
-        coord_list = [(i, j) for i in range(self.y) for j in range(self.x)]
-        pixel_data = self._generate_working_copy()
-        for sw, (i, j) in zip(self._sliding_window(size=3), coord_list):
-            flattened_sw = [val for line in sw for val in line]
-            # process the result of the filtering process, clamping the value betwee [0, 255]
-            result = max(
-                0,
-                min(
-                    255,
-                    round(
-                        sum(
-                            coef * val for coef, val in zip(kernel_filter, flattened_sw)
-                        )
-                    ),
-                ),
+        kernel = get_kernel(kernel)
+        validate_mode(mode)
+        validate_parallel(parallel)
+        if parallel is not None and mode != "wrap":
+            buffer = run_in_bands(
+                self, "_kernel_filter", kernel.radius, parallel, kernel, mode=mode
             )
-            pixel_data[i][j] = GrayPixel(result)
-
-        return self._return_result(pixel_data, inplace)
+            return self._return_result(buffer, inplace)
+        ceiling = self._ceiling
+        planes: Sequence[Sequence[int]]
+        if numpy_enabled():
+            planes = backend.convolve(self._buffer, kernel, ceiling, mode)
+            return self._return_result(self._with_planes(planes), inplace)
+
+        scale = kernel.scale
+        planes = [
+            [
+                max(0, min(ceiling, round(total / scale)))
+                for row in convolve_plane(
+                    self._buffer.plane(c), self.x, self.y, kernel, mode
+                )
+                for total in row
+            ]
+            for c in range(self._buffer.channels)
+        ]
+        return self._return_result(self._with_planes(planes), inplace)
 
     def gamma_transformation(
         self, gamma: float, c: int | float = 1, inplace: bool = True
@@ -503,93 +1408,114 @@ class Image:
         Returns:
             Image: [description]
         """
-        # create a working copy from pixel data
-        pixel_matrix = [[GrayPixel() for _ in range(self.x)] for _ in range(self.y)]
-        for i, row in enumerate(self.values):
-            for j, _ in enumerate(row):
-                # map the pixel value to a 0~1 range
-                current_value = _map_value(self.values[i][j].value)
-                # calculate the gamma transformed value and reescale to 0~255 range
-                gamma_value = round((255 * c) * (current_value ** gamma))
-                # update the pixel value with the new transformed value,
-                # respecting 0~255 range
-                pixel_matrix[i][j] = GrayPixel(max(0, min(255, gamma_value)))
-        return self._return_result(pixel_matrix, inplace)
-
-    def histogram_equalization(self, inplace: bool = True) -> Image:
+        table = lookup_table("gamma", self._buffer.typecode, gamma, c, self._ceiling)
+        data = apply_table(self._buffer, table)
+        return self._return_result(self._buffer.with_data(data), inplace)
+
+    def histogram_equalization(
+        self, inplace: bool = True, parallel: Parallel | None = None
+    ) -> Image:
         """Does the global histogram equalization
 
+        Color images are equalized channel by channel.
+
         Args:
             - inplace (bool, optional): If false will generate a new image as result. Defaults to True.
+            - parallel (Parallel, optional): worker processes (or an Executor) mapping parts of the image through the equalization tables. Defaults to None.
 
         Returns:
             Image: processing result
         """
-        hist = self.get_histogram()
-        hist_frequencies = _calculate_frequencies(hist, self.x * self.y)
-        eq_map = _generate_equalized_map(hist_frequencies, self.max_level)
-        pixel_matrix = [[GrayPixel() for _ in range(self.x)] for _ in range(self.y)]
-        for i, row in enumerate(self.values):
-            for j, _ in enumerate(row):
-                equalized_value = eq_map[str(self.values[i][j].value)]
-                pixel_matrix[i][j] = GrayPixel(max(0, min(255, equalized_value)))
-        return self._return_result(pixel_matrix, inplace)
-
-    def _sliding_window(self, size: int) -> Generator[list[list[int]], None, None]:
-        """Utility method for sliding window operations
+        typecode = self._buffer.typecode
+        # the tables depend on the image itself, so they are not cached
+        tables = [
+            _equalization_table(counts, self.max_level, self._ceiling, typecode)
+            for counts in self.histograms()
+        ]
+        if parallel is not None:
+            planes = translate_in_parts(self._buffer, tables, parallel)
+        else:
+            planes = [
+                translate(self._buffer.plane(c), typecode, table)
+                for c, table in enumerate(tables)
+            ]
+        return self._return_result(self._buffer.with_planes(planes), inplace)
 
-        This method will slide a `size x size` window in the current matrix,
-        returning the current window in each step of the generator.
+    def local_histogram_equalization(
+        self, kernel: int, inplace: bool = True, mode: str = "extend"
+    ) -> Image:
+        """Local histogram euqalization
 
-        This method uses the "extending" policy meaning that the border pixels
-        are virtually repeated for this process
+        Each pixel is mapped as in `histogram_equalization`, but using the
+        histogram of the `kernel x kernel` window around it. The window
+        histogram is updated incrementally, so the cost per pixel is O(kernel).
 
         Args:
-            - size (int): the size of the sliding window
+            - kernel (int): size of the window for the LHE process.
+            - inplace (bool, optional): If false will generate a new image as result. Defaults to True.
+            - mode (str, optional): border mode, see `border.BORDER_MODES`. Defaults to "extend".
 
-        Yields:
-            Generator[list[list[int]], None, None]: a generator object that yields the current window
+        Returns:
+            Image: processing result
         """
-        offset = size // 2
-        offset_coords = [
-            (off_i, off_j)
-            for off_i in range(-offset, offset + 1)
-            for off_j in range(-offset, offset + 1)
-        ]
-        for i in range(0, self.y):
-            for j in range(0, self.x):
-                curr_window = [[0 for _ in range(size)] for _ in range(size)]
-                for window_coord in offset_coords:
-                    k, g = window_coord
-                    p_i = i + k if 0 <= i + k < self.y else None
-                    p_j = j + g if 0 <= j + g < self.x else None
-                    if not (p_i is None or p_j is None):
-                        curr_window[offset + k][offset + g] = self.values[p_i][
-                            p_j
-                        ].value
-                    elif p_i is None and p_j is None:
-                        curr_window[offset + k][offset + g] = self.values[i][j].value
-                    elif p_i is None:
-                        curr_window[offset + k][offset + g] = self.values[i][p_j].value
-                    elif p_j is None:
-                        curr_window[offset + k][offset + g] = self.values[p_i][j].value
-                yield curr_window
-
-    def local_histogram_equalization(self, kernel: int, inplace: bool = True) -> Image:
-        """Local histogram euqalization
+        validate_mode(mode)
+        ceiling = self._ceiling
+        planes = []
+        for c in range(self._buffer.channels):
+            result = array(self._buffer.typecode, [0]) * (self.x * self.y)
+            for index, value in _local_equalization(
+                self._buffer.plane(c), self.x, self.y, kernel, self.max_level, mode
+            ):
+                result[index] = max(0, min(ceiling, value))
+            planes.append(result)
+        return self._return_result(self._with_planes(planes), inplace)
+
+    def histograms(self) -> list[array[int]]:
+        """Histogram of each channel, see `histogram`"""
+        # counts do not depend on the orientation, no need to materialize
+        # flips and rotations, but a padded border adds pixels
+        if isinstance(self._view, BufferView):
+            buffer = self._storage
+        else:
+            buffer = self._buffer
+        cache = self._histogram_cache
+        # the buffer is only weakly referenced, so replaced buffers are freed
+        if (
+            cache is None
+            or cache[0]() is not buffer
+            or cache[1:3] != (buffer.version, self.max_level)
+        ):
+            levels = self.max_level + 1
+            histograms = [
+                _count_levels(p, buffer.typecode, levels) for p in buffer.planes()
+            ]
+            cache = (weakref.ref(buffer), buffer.version, self.max_level, histograms)
+            self._histogram_cache = cache
+        return cache[3]
+
+    def histogram(self, channel: int = 0) -> array[int]:
+        """Occurrences of each sample value in one channel
+
+        The samples are counted in a single pass, and the result is cached
+        until the pixels change (`set_pixel`, `values` or any in place
+        operation). Writes made through `ndarray` are not tracked.
 
         Args:
-            - kernel (int): size of the window for the LHE process.
-            - inplace (bool, optional): If false will generate a new image as result. Defaults to True.
+            - channel (int, optional): the channel to count. Defaults to 0.
 
         Returns:
-            Image: processing result
+            array: `max_level + 1` counts (typecode `Q`), indexed by sample value
         """
-        return NotImplemented
+        return self.histograms()[channel]
 
-    def get_histogram(self, pixel_data: list[list[Pixel]] = None) -> dict[str, int]:
+    def get_histogram(
+        self, pixel_data: list[list[Pixel]] | None = None
+    ) -> dict[str, int]:
         """Generates the histogram for the image
 
+        Kept for compatibility, `histogram` returns the counts as an array
+        and supports color images.
+
         Args:
             - pixel_data (list[list[Pixel]], optional): the pixel matrix to work on. Defaults to None. If None passed, will use the complete current image data.
 
@@ -601,16 +1527,16 @@ class Image:
             where each key is the pixel value and each value is
             the number of courrences in the image
         """
-        if self.header not in ("P1", "P2"):
+        if channels_for(self.header) != 1:
             raise ValidationError("Cannot extract histogram of non-grayscale images")
-        pixel_value_list = (
-            [p.value for row in self.values for p in row]
-            if pixel_data is None
-            else [p.value for row in pixel_data for p in row]
-        )
-        # for each level, get the count of ocurrences in the pixel list
-        hist = {str(i): pixel_value_list.count(i) for i in range(self.max_level + 1)}
-        return hist
+        if pixel_data is not None:
+            samples = array(
+                "H", [cast(GrayPixel, p).value for row in pixel_data for p in row]
+            )
+            counts = _count_levels(samples, "H", self.max_level + 1)
+        else:
+            counts = self.histogram()
+        return {str(i): count for i, count in enumerate(counts)}
 
     def darken(self, level: int, inplace: bool = True) -> Image:
         """Darken image method
@@ -626,10 +1552,10 @@ class Image:
             Image: Resulting Image object from operation,
                     returns a copy if `inplace` is False
         """
-        for i, row in enumerate(self.values):
-            for j, _ in enumerate(row):
-                self.values[i][j].darken(level)
-        return self if inplace else self.copy_current_image()
+        validate_value_and_raise(level)
+        table = lookup_table("darken", self._buffer.typecode, level)
+        data = apply_table(self._buffer, table)
+        return self._return_result(self._buffer.with_data(data), inplace)
 
     def lighten(self, level: int, inplace: bool = True) -> Image:
         """Lighten image method
@@ -645,10 +1571,10 @@ class Image:
             Image: Resulting Image object from operation,
                     returns a copy if `inplace` is False
         """
-        for i, row in enumerate(self.values):
-            for j, _ in enumerate(row):
-                self.values[i][j].lighten(level)
-        return self if inplace else self.copy_current_image()
+        validate_value_and_raise(level)
+        table = lookup_table("lighten", self._buffer.typecode, level, self._ceiling)
+        data = apply_table(self._buffer, table)
+        return self._return_result(self._buffer.with_data(data), inplace)
 
     def binarization(self, threshold: int, inplace: bool = True) -> Image:
         """Binarization process
@@ -663,14 +1589,11 @@ class Image:
         Returns:
             Image: resulting process
         """
-        pixel_matrix = self._generate_working_copy()
-        for i, row in enumerate(self.values):
-            for j, _ in enumerate(row):
-                if self.values[i][j].value < threshold:
-                    pixel_matrix[i][j] = GrayPixel(0)
-                else:
-                    pixel_matrix[i][j] = GrayPixel(255)
-        return self._return_result(pixel_matrix, inplace)
+        table = lookup_table(
+            "binarization", self._buffer.typecode, threshold, self._ceiling
+        )
+        data = apply_table(self._buffer, table)
+        return self._return_result(self._buffer.with_data(data), inplace)
 
     def highlight_band(
         self,
@@ -699,23 +1622,21 @@ class Image:
                 f"The threshold interval {threshold} contains invalid values. \
                     Should be a tuple of 2 integers, (a,b) where a < b."
             )
-        # create a working copy from pixel data
-        pixel_matrix = self._generate_working_copy()
-        for i, row in enumerate(self.values):
-            for j, _ in enumerate(row):
-                if tr_min < self.values[i][j].value < tr_max:
-                    pixel_matrix[i][j] = GrayPixel(intensity)
-                # if we chose an intensity for the values outside of the
-                # [A, B] interval
-                elif intensity_outside is not None and isinstance(
-                    intensity_outside, int
-                ):
-                    pixel_matrix[i][j] = GrayPixel(intensity_outside)
-        return self._return_result(pixel_matrix, inplace)
+        # if we chose an intensity for the values outside of the
+        # [A, B] interval, otherwise they are left blank
+        outside = intensity_outside if isinstance(intensity_outside, int) else 0
+        table = lookup_table(
+            "highlight_band", self._buffer.typecode, tr_min, tr_max, intensity, outside
+        )
+        data = apply_table(self._buffer, table)
+        return self._return_result(self._buffer.with_data(data), inplace)
 
     def rotate_90(self, clockwise: bool = True, inplace: bool = True) -> Image:
         """90 degree rotation
 
+        Like the other geometric transforms, only a view over the pixels is
+        recorded, samples are moved once when an operation needs them.
+
         Args:
             - clockwise (bool, optional): defines the direction of rotation. Defaults to True.
             - inplace (bool, optional): If false will generate a new image as result. Defaults to True.
@@ -723,16 +1644,11 @@ class Image:
         Returns:
             Image: processing result
         """
-        # This image MxN has to become NxM
-        working_values = [[0 for _ in range(self.y)] for _ in range(self.x)]
-        for i, row in enumerate(self.values):
-            for j, pixel in enumerate(row):
-                if not clockwise:
-                    working_values[j][self.y - i - 1] = pixel
-                else:
-                    working_values[self.x - j - 1][i] = pixel
-        self.x, self.y, self.values = self.y, self.x, working_values
-        return self if inplace else self.copy_current_image()
+        # This image MxN has to become NxM, each new row is an old column, read
+        # from the bottom up when turning clockwise
+        if clockwise:
+            return self._orient(lambda view: view.transposed().flipped_cols(), inplace)
+        return self._orient(lambda view: view.transposed().flipped_rows(), inplace)
 
     def rotate_180(self, inplace: bool = True) -> Image:
         """180 deegres rotation
@@ -743,10 +1659,22 @@ class Image:
         Returns:
             Image: processing result
         """
-        for i, row in enumerate(self.values):
-            for j, pixel in enumerate(row):
-                self.values[self.x - i - 1][self.y - j - 1] = pixel
-        return self if inplace else self.copy_current_image()
+        return self._orient(lambda view: view.flipped_rows().flipped_cols(), inplace)
+
+    def rotate_270(self, inplace: bool = True) -> Image:
+        """270 degree (clockwise) rotation, a counter-clockwise `rotate_90`"""
+        return self.rotate_90(clockwise=False, inplace=inplace)
+
+    def transpose(self, inplace: bool = True) -> Image:
+        """Transposition, each row becomes a column
+
+        Args:
+            - inplace (bool, optional): If false will generate a new image as result. Defaults to True.
+
+        Returns:
+            Image: processing result
+        """
+        return self._orient(lambda view: view.transposed(), inplace)
 
     def vertical_mirror(self, inplace: bool = True) -> Image:
         """Vertical mirroring operation
@@ -757,10 +1685,7 @@ class Image:
         Returns:
             Image: processing result
         """
-        for i, row in enumerate(self.values):
-            for j, pixel in enumerate(row):
-                self.values[i][self.y - j - 1] = pixel
-        return self if inplace else self.copy_current_image()
+        return self._orient(lambda view: view.flipped_cols(), inplace)
 
     def horizontal_mirror(self, inplace: bool = True) -> Image:
         """Horizontal Mirroring operation
@@ -771,17 +1696,14 @@ class Image:
         Returns:
             Image: processing result
         """
-        for i, row in enumerate(self.values):
-            for j, pixel in enumerate(row):
-                self.values[self.x - i - 1][j] = pixel
-        return self if inplace else self.copy_current_image()
+        return self._orient(lambda view: view.flipped_rows(), inplace)
 
     def set_pixel(self, x: int, y: int, pixel: Pixel) -> None:
         """Sets a pixel to a location
 
         Args:
-            - x (int): x position
-            - y (int): y position
+            - x (int): x position (column, starting at 1)
+            - y (int): y position (row, starting at 1)
             - pixel (Pixel): pixel to replace the contents of that position
 
         Raises:
@@ -792,66 +1714,64 @@ class Image:
                 f"Tried to set_pixel on invalid position ({x}, {y}) on image ({self.x} x {self.y})"
             )
             # TODO: Validate pixel type
-        self.values[x - 1][y - 1] = pixel
+        if self._region is not None:
+            parent, x0, y0 = self._region
+            parent.set_pixel(x0 + x, y0 + y, pixel)
+            return
+        self.values[y - 1][x - 1] = pixel
 
     def get_pixel(self, x: int, y: int) -> Pixel:
         """gets the pixel in a certain location
 
         Args:
-            - x (int): x position
-            - y (int): y position
+            - x (int): x position (column, starting at 1)
+            - y (int): y position (row, starting at 1)
 
         Raises:
             ValidationError: if the location is outside current image bounds.
 
         Returns:
-            Pixel: the Pixel object at the desired location
+            Pixel: a copy of the Pixel at the desired location
         """
         if not (0 < x <= self.x and 0 < y <= self.y):
             raise ValidationError(
                 f"Tried to get_pixel on invalid position ({x}, {y}) on image ({self.x} x {self.y})"
             )
-        return self.values[x - 1][y - 1]
+        if self._view is not None:
+            return _to_pixel(self._view.get(y - 1, x - 1))
+        return self.values[y - 1][x - 1]
 
-    def _return_result(
-        self, pixel_matrix: list[list[Pixel]], inplace: bool = True
-    ) -> Image:
+    def _with_planes(self, planes: Sequence[Sequence[int]]) -> PixelBuffer:
+        """Buffer of a sliding window result, one plane per channel
+
+        Planes are mapped through `_output_table` when a `Pipeline` fused the
+        pointwise operations following this one into it.
+        """
+        if self._output_table is not None:
+            typecode = self._buffer.typecode
+            planes = [translate(p, typecode, self._output_table) for p in planes]
+        return self._buffer.with_planes(planes)
+
+    def _return_result(self, result: PixelBuffer, inplace: bool = True) -> Image:
         """Utility method to handle the return of the processing result
 
         Args:
-            - pixel_matrix (list[list[Pixel]]): the processed pixel matrix
+            - result (PixelBuffer): the processed pixel buffer
             - inplace (bool, optional): If false will generate a new image as result. Defaults to True.
 
         Returns:
             Image: processing result
         """
         if inplace:
-            self.values = pixel_matrix
+            self._buffer = result
             return self
         else:
             return Image(
                 header=self.header,
                 max_level=self.max_level,
                 dimensions=(self.x, self.y),
-                contents=pixel_matrix,
+                buffer=result,
             )
 
-    def _generate_working_copy(self, populate: bool = False) -> list[list[Pixel]]:
-        """Genertes a pixel matrix in the current image dimentions for processing
-
-        Args:
-            - populate (bool, optional): If true will populate the matrix with the current values. Defaults to False.
-
-        Returns:
-            list[list[Pixel]]: a X * Y matrix of pixels
-        """
-        if populate:
-            return [
-                [GrayPixel(self.values[j][i].value) for i in range(self.x)]
-                for j in range(self.y)
-            ]
-        else:
-            return [[GrayPixel() for _ in range(self.x)] for _ in range(self.y)]
-
     def __repr__(self):
         return f"{type(self).__name__}(header={self.header}, dim={self.dimensions})"
@@ -0,0 +1,117 @@
+"""Persistent index of the Netpbm files in a directory
+
+Each file is described by its `probe` record (header, dimensions, max level,
+raster offset and size), so work can be planned across many images without
+decoding any of them. The index is stored as JSON, keyed by file path, and a
+record is only probed again when the file mtime or size changes.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any
+
+from .errors import InvalidConfigsError
+from .errors import InvalidFileError
+from .errors import InvalidHeaderError
+from .image import probe
+from .utils import replacing_file
+
+NETPBM_EXTENSIONS = (".pbm", ".pgm", ".ppm", ".pnm")
+INDEX_VERSION = 1
+
+
+def load_index(index_path: str) -> dict[str, dict[str, Any]]:
+    """Loads a saved index, an empty one if it does not exist or is outdated
+
+    Args:
+        - index_path (str): path of the JSON index file
+
+    Returns:
+        dict[str, dict[str, Any]]: one record per file path
+    """
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if index.get("version") != INDEX_VERSION:
+        return {}
+    records = index["files"]
+    for record in records.values():
+        if "dimensions" in record:
+            record["dimensions"] = tuple(record["dimensions"])
+    return records
+
+
+def save_index(index_path: str, records: dict[str, dict[str, Any]]) -> None:
+    """Writes the index records as JSON
+
+    The file is replaced atomically, so a concurrent reader never sees a
+    partially written index, and concurrent writers never share a temporary
+    file (see `utils.replacing_file`).
+    """
+    data = json.dumps({"version": INDEX_VERSION, "files": records})
+    with replacing_file(index_path) as f:
+        f.write(data.encode("utf-8"))
+
+
+def scan_directory(
+    directory: str,
+    index_path: str | None = None,
+    recursive: bool = True,
+    extensions: tuple[str, ...] = NETPBM_EXTENSIONS,
+) -> dict[str, dict[str, Any]]:
+    """Builds (or refreshes) the index of the Netpbm files in a directory
+
+    Files whose path, mtime and size match the saved index are not opened.
+    Files that are not valid Netpbm images are recorded with an `error`
+    message instead of the header values, so they are not probed again.
+    Files that cannot be read (e.g. without permission, or removed during the
+    scan) are left out and do not stop the scan.
+
+    Args:
+        - directory (str): the directory to scan
+        - index_path (str, optional): JSON file to load and save the index. Defaults to None (not persisted).
+        - recursive (bool, optional): also scan the subdirectories. Defaults to True.
+        - extensions (tuple[str, ...], optional): file extensions to consider. Defaults to NETPBM_EXTENSIONS.
+
+    Returns:
+        dict[str, dict[str, Any]]: one record per file path, the `probe`
+        result plus the file `mtime`
+    """
+    previous = load_index(index_path) if index_path else {}
+    records = {}
+    for root, dirs, files in os.walk(directory):
+        if not recursive:
+            dirs.clear()
+        for name in sorted(files):
+            if not name.lower().endswith(extensions):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # e.g. a dangling link or a file removed during the scan
+                continue
+            record = previous.get(path)
+            if (
+                record is not None
+                and record["mtime"] == stat.st_mtime_ns
+                and record["file_size"] == stat.st_size
+            ):
+                records[path] = record
+                continue
+            try:
+                record = probe(path)
+            except (InvalidHeaderError, InvalidFileError, InvalidConfigsError) as e:
+                record = {"error": str(e), "file_size": stat.st_size}
+            except OSError:
+                # not recorded, so it is read again by the next scan
+                continue
+            record["mtime"] = stat.st_mtime_ns
+            records[path] = record
+    if index_path:
+        save_index(index_path, records)
+    return records
@@ -0,0 +1,320 @@
+"""Convolution kernels
+
+A `Kernel` holds a square matrix of coefficients of any odd size. On creation
+it checks whether the matrix is separable (the outer product of a column and
+a row vector, i.e. of rank 1), in which case the convolution runs as two 1-D
+passes, and precomputes the integer fixed-point coefficients used by the
+convolution, so sums are exact integers rounded once at the end.
+
+Named kernels live in a registry, see `register_kernel` and `get_kernel`.
+"""
+
+from __future__ import annotations
+
+import math
+from array import array
+from itertools import chain
+from numbers import Number
+from typing import Any
+from typing import Iterable
+from typing import Iterator
+from typing import Sequence
+from typing import Union
+
+from .border import pad_plane
+from .errors import ValidationError
+
+# fractional bits of the fixed-point coefficients
+FIXED_POINT_BITS = 16
+_SEPARABILITY_TOLERANCE = 1e-9
+
+Coefficients = Union[Sequence[float], Sequence[Sequence[float]]]
+
+
+def _to_fixed(values: Sequence[float], bits: int) -> tuple[int, ...]:
+    """The values `1 << bits` times larger, rounded to integers
+
+    The rounding errors are spread, largest fractional parts first, so the
+    integers add up to the rounded scaled sum: exactly `1 << bits` for
+    normalized coefficients, which then keep flat images flat.
+    """
+    scaled = [v * (1 << bits) for v in values]
+    fixed = [math.floor(v) for v in scaled]
+    missing = round(sum(scaled)) - sum(fixed)
+    order = sorted(range(len(fixed)), key=lambda i: fixed[i] - scaled[i])
+    for i in order[:missing]:
+        fixed[i] += 1
+    return tuple(fixed)
+
+
+def _fraction_bits(values: Sequence[float]) -> int:
+    # integer coefficients need no fractional bits
+    return 0 if all(float(v).is_integer() for v in values) else FIXED_POINT_BITS
+
+
+def _factorize(
+    matrix: tuple[tuple[float, ...], ...],
+) -> tuple[tuple[float, ...], tuple[float, ...]] | None:
+    """Splits a rank 1 matrix into a column and a row vector, None otherwise"""
+    size = len(matrix)
+    pivot_row, pivot_col = max(
+        ((i, j) for i in range(size) for j in range(size)),
+        key=lambda ij: abs(matrix[ij[0]][ij[1]]),
+    )
+    pivot = matrix[pivot_row][pivot_col]
+    if pivot == 0:
+        return None
+    column = tuple(matrix[i][pivot_col] for i in range(size))
+    row = tuple(v / pivot for v in matrix[pivot_row])
+    tolerance = _SEPARABILITY_TOLERANCE * abs(pivot)
+    for i in range(size):
+        for j in range(size):
+            if abs(column[i] * row[j] - matrix[i][j]) > tolerance:
+                return None
+    return column, row
+
+
+class Kernel:
+    def __init__(self, coefficients: Coefficients, name: str | None = None):
+        """Square convolution kernel
+
+        Args:
+            - coefficients (Coefficients): a square matrix, or its values row after row
+            - name (str, optional): a name for the kernel. Defaults to None.
+
+        Raises:
+            ValidationError: If the coefficients are not a square matrix of odd size
+        """
+        values: list[Any] = list(coefficients)
+        if values and isinstance(values[0], Number):
+            size = math.isqrt(len(values))
+            if size * size != len(values):
+                raise ValidationError(
+                    f"A kernel needs a square amount of coefficients, found {len(values)}"
+                )
+            values = [values[i * size : (i + 1) * size] for i in range(size)]
+        size = len(values)
+        if size % 2 == 0 or any(len(row) != size for row in values):
+            raise ValidationError("A kernel must be a square matrix of odd size")
+        self.name = name
+        self.size = size
+        self.coefficients = tuple(tuple(row) for row in values)
+
+        factors = _factorize(self.coefficients)
+        self.separable = factors is not None
+        if factors is not None:
+            self.column, self.row = factors
+            row_sum = sum(self.row)
+            if row_sum and _fraction_bits(self.column):
+                # with a row summing to 1 the fixed-point sums of both passes
+                # are exact, so normalized kernels sum to exactly `scale`
+                self.column = tuple(v * row_sum for v in self.column)
+                self.row = tuple(v / row_sum for v in self.row)
+            self.column_bits = _fraction_bits(self.column)
+            self.row_bits = _fraction_bits(self.row)
+            self.fixed_column = _to_fixed(self.column, self.column_bits)
+            self.fixed_row = _to_fixed(self.row, self.row_bits)
+            self.bits = self.column_bits + self.row_bits
+        else:
+            flat = [v for row in self.coefficients for v in row]
+            self.bits = _fraction_bits(flat)
+            fixed = _to_fixed(flat, self.bits)
+            self.fixed = tuple(fixed[i * size : (i + 1) * size] for i in range(size))
+
+    @property
+    def radius(self) -> int:
+        return self.size // 2
+
+    @property
+    def scale(self) -> int:
+        """The fixed-point sums are `scale` times the real ones"""
+        return 1 << self.bits
+
+    @classmethod
+    def box(cls, radius: int) -> Kernel:
+        """Mean of a `(2 * radius + 1)` square window"""
+        size = 2 * radius + 1
+        return cls([[1 / (size * size)] * size for _ in range(size)], name="box")
+
+    @classmethod
+    def gaussian(cls, radius: int, sigma: float | None = None) -> Kernel:
+        """Normalized Gaussian, `sigma` defaults to a third of the radius"""
+        if radius == 0:
+            return cls([1], name="gaussian")
+        sigma = radius / 3 if sigma is None else sigma
+        weights = [
+            math.exp(-(x * x) / (2 * sigma * sigma)) for x in range(-radius, radius + 1)
+        ]
+        total = sum(weights)
+        weights = [w / total for w in weights]
+        return cls([[a * b for b in weights] for a in weights], name="gaussian")
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Kernel):
+            return NotImplemented
+        return self.coefficients == other.coefficients
+
+    def __hash__(self) -> int:
+        return hash(self.coefficients)
+
+    def __repr__(self) -> str:
+        return (
+            f"Kernel(size={self.size}, separable={self.separable}, name={self.name!r})"
+        )
+
+
+def _shift(row: Sequence[int], shift: int) -> Iterable[int]:
+    """`row[j + shift]` for each column j, `row[j]` when that is out of range
+
+    The `extend` border mode (see `border`), built from chained slices.
+    """
+    width = len(row)
+    if shift == 0 or abs(shift) >= width:
+        return row
+    if shift > 0:
+        return chain(row[shift:], row[width - shift :])
+    return chain(row[:-shift], row[: width + shift])
+
+
+def _accumulate(
+    totals: list[int], coefficients: Sequence[int], rows: Sequence[Iterable[int]]
+) -> list[int]:
+    for coef, row in zip(coefficients, rows):
+        if coef:
+            totals = [t + coef * v for t, v in zip(totals, row)]
+    return totals
+
+
+def _horizontal_pass(
+    row: Sequence[int], coefficients: Sequence[int], width: int
+) -> list[int]:
+    span = len(coefficients)
+    shifted: list[Iterable[int]]
+    if len(row) > width:
+        # padded row, every window is a plain slice
+        shifted = [row[b : b + width] for b in range(span)]
+    else:
+        shifted = [_shift(row, g) for g in range(-(span // 2), span // 2 + 1)]
+    return _accumulate([0] * width, coefficients, shifted)
+
+
+def convolve_plane(
+    plane: array[int] | memoryview,
+    width: int,
+    height: int,
+    kernel: Kernel,
+    mode: str = "extend",
+) -> Iterator[list[int]]:
+    """Convolves (correlates) a plane with a kernel, row by row
+
+    Separable kernels run a horizontal pass over every row and then a
+    vertical one, other kernels add one horizontal pass per kernel row.
+    With the `extend` border mode out-of-range coordinates are replaced by the
+    pivot ones on each axis, other modes pad the plane first (see `border`).
+
+    Args:
+        - plane (array | memoryview): samples of one channel, row after row
+        - width (int): plane width
+        - height (int): plane height
+        - kernel (Kernel): the kernel to apply
+        - mode (str, optional): border mode. Defaults to "extend".
+
+    Yields:
+        Iterator[list[int]]: the exact fixed-point sums of each row, `kernel.scale`
+        times the real convolution result
+    """
+    radius = kernel.radius
+    if mode == "extend":
+        row_width = width
+    else:
+        plane = pad_plane(plane, width, height, radius, mode)
+        row_width = width + 2 * radius
+    rows: list[Sequence[int]] = [
+        plane[start : start + row_width] for start in range(0, len(plane), row_width)
+    ]
+    if kernel.separable:
+        rows = [_horizontal_pass(row, kernel.fixed_row, width) for row in rows]
+    for i in range(height):
+        if mode == "extend":
+            # out-of-range rows are replaced by the pivot row
+            window = [
+                rows[i + k] if 0 <= i + k < height else rows[i]
+                for k in range(-radius, radius + 1)
+            ]
+        else:
+            window = rows[i : i + kernel.size]
+        if kernel.separable:
+            yield _accumulate([0] * width, kernel.fixed_column, window)
+            continue
+        totals = [0] * width
+        for row, coefficients in zip(window, kernel.fixed):
+            if any(coefficients):
+                horizontal = _horizontal_pass(row, coefficients, width)
+                totals = [t + h for t, h in zip(totals, horizontal)]
+        yield totals
+
+
+_KERNELS: dict[str, Kernel] = {}
+
+
+def register_kernel(name: str, kernel: Kernel | Coefficients) -> Kernel:
+    """Makes a kernel available by name (e.g. to `Image._kernel_filter`)
+
+    Args:
+        - name (str): the kernel name, replaces any kernel with the same name
+        - kernel (Kernel | Coefficients): a Kernel, or the coefficients to build one
+
+    Returns:
+        Kernel: the registered kernel
+    """
+    if not isinstance(kernel, Kernel):
+        kernel = Kernel(kernel, name=name)
+    _KERNELS[name] = kernel
+    return kernel
+
+
+def get_kernel(kernel: str | Kernel) -> Kernel:
+    """Looks a kernel up by name (Kernel objects are returned as is)
+
+    Raises:
+        ValidationError: if no kernel is registered with that name
+    """
+    if isinstance(kernel, Kernel):
+        return kernel
+    try:
+        return _KERNELS[kernel]
+    except KeyError:
+        raise ValidationError(
+            f"Selected kernel is invalid, options are {kernel_names()}"
+        )
+
+
+def kernel_names() -> list[str]:
+    """Names of the registered kernels"""
+    return list(_KERNELS)
+
+
+# source: https://en.wikipedia.org/wiki/Kernel_(image_processing)#Edge_Handling
+KERNEL_FILTERS = {
+    "identity": (0, 0, 0, 0, 1, 0, 0, 0, 0),
+    "edge": (1, 0, -1, 0, 0, 0, -1, 0, 1),
+    "laplace": (0, -1, 0, -1, 4, -1, 0, -1, 0),
+    "laplace2": (-1, -1, -1, -1, 8, -1, -1, -1, -1),
+    "sharpen": (0, -1, 0, -1, 5, -1, 0, -1, 0),
+    "box_blur": (0.1111,) * 9,
+    "gaussian_blur": (
+        0.0625,
+        0.125,
+        0.0625,
+        0.125,
+        0.25,
+        0.125,
+        0.0625,
+        0.125,
+        0.0625,
+    ),
+    "emboss": (-2, -1, 0, -1, 1, 1, 0, 1, 2),
+}
+
+for _name, _coefficients in KERNEL_FILTERS.items():
+    register_kernel(_name, _coefficients)
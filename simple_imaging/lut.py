@@ -0,0 +1,144 @@
+"""Lookup tables for the pointwise operations
+
+A pointwise operation maps each sample value to a new one, and a sample can
+only take 256 (8 bit images) or 65536 (16 bit images) values. So the
+operation is evaluated once per possible value into a table, and the image
+is transformed by looking each sample up. 8 bit tables are `bytes`, applied
+with a single `bytes.translate` call.
+
+Tables are cached (least recently used first out) by operation name and
+parameters, see `lookup_table`.
+"""
+
+from __future__ import annotations
+
+from array import array
+from functools import lru_cache
+from typing import Callable
+from typing import Sequence
+from typing import Union
+
+from . import backend
+from .backend import numpy_enabled
+from .buffer import PixelBuffer
+
+LUT_CACHE_SIZE = 128
+
+Table = Union[bytes, "array[int]"]
+Mapping = Callable[[int], int]
+
+
+def _map_value(input_value: int, max_value: int = 255) -> float:
+    return input_value / float(max_value)
+
+
+def _negative(ceiling: int) -> Mapping:
+    return lambda v: ceiling - v if v <= ceiling else 0
+
+
+def _darken(level: int) -> Mapping:
+    return lambda v: v - level if v > level else 0
+
+
+def _lighten(level: int, ceiling: int) -> Mapping:
+    return lambda v: min(ceiling, v + level)
+
+
+def _multiply(value: int | float, ceiling: int) -> Mapping:
+    return lambda v: max(0, min(ceiling, round(v * value)))
+
+
+def _binarization(threshold: int, ceiling: int) -> Mapping:
+    return lambda v: 0 if v < threshold else ceiling
+
+
+def _bitmap(threshold: int) -> Mapping:
+    # PBM bits are set for black, so the dark samples are the set ones
+    return lambda v: 1 if v < threshold else 0
+
+
+def _highlight_band(tr_min: int, tr_max: int, intensity: int, outside: int) -> Mapping:
+    return lambda v: intensity if tr_min < v < tr_max else outside
+
+
+def _gamma(gamma: float, c: int | float, ceiling: int) -> Mapping:
+    scale = ceiling * c
+
+    def gamma_value(v: int) -> int:
+        # map the sample to a 0~1 range, apply the gamma and reescale it,
+        # respecting the 0~255 range
+        return max(0, min(ceiling, round(scale * (_map_value(v, ceiling) ** gamma))))
+
+    return gamma_value
+
+
+# operation name -> function building the value to value mapping from the parameters
+POINTWISE_OPERATIONS: dict[str, Callable[..., Mapping]] = {
+    "negative": _negative,
+    "darken": _darken,
+    "lighten": _lighten,
+    "multiply": _multiply,
+    "binarization": _binarization,
+    "bitmap": _bitmap,
+    "highlight_band": _highlight_band,
+    "gamma": _gamma,
+}
+
+
+def build_table(mapping: Mapping, typecode: str) -> Table:
+    """Evaluates a mapping for every value a sample of `typecode` can take
+
+    Args:
+        - mapping (Mapping): the value to value function
+        - typecode (str): `array` typecode of the samples
+
+    Returns:
+        Table: `bytes` for 8 bit samples, an `array` otherwise
+    """
+    size = 1 << (8 * array(typecode).itemsize)
+    table = array(typecode, [mapping(v) for v in range(size)])
+    return table.tobytes() if typecode == "B" else table
+
+
+@lru_cache(maxsize=LUT_CACHE_SIZE)
+def lookup_table(operation: str, typecode: str, *params: int | float) -> Table:
+    """Cached table of a pointwise operation
+
+    Args:
+        - operation (str): a name from `POINTWISE_OPERATIONS`
+        - typecode (str): `array` typecode of the samples
+        - *params: the operation parameters
+
+    Returns:
+        Table: see `build_table`
+    """
+    return build_table(POINTWISE_OPERATIONS[operation](*params), typecode)
+
+
+def translate(samples: Sequence[int], typecode: str, table: Table) -> array[int]:
+    """Maps samples through a table
+
+    Args:
+        - samples (Sequence[int]): the samples, any sequence of integers
+        - typecode (str): `array` typecode of the samples and of the result
+        - table (Table): see `build_table`
+
+    Returns:
+        array: the mapped samples, in the same order
+    """
+    if typecode == "B":
+        result = array("B")
+        result.frombytes(bytes(samples).translate(table))
+        return result
+    if numpy_enabled():
+        return backend.apply_table(samples, typecode, table)
+    return array(typecode, map(table.__getitem__, samples))
+
+
+def apply_table(buffer: PixelBuffer, table: Table) -> array[int]:
+    """Maps every sample of a buffer through a table
+
+    Returns:
+        array: the mapped samples, in the buffer layout
+    """
+    return translate(buffer.data, buffer.typecode, table)
@@ -0,0 +1,178 @@
+"""Multi-process execution of the sliding window filters
+
+The image is split into horizontal bands, one per worker. Like the strips of
+`strips.process_file`, each band carries the `halo` rows above and below it
+that its windows read, and bands touching the top or bottom of the image have
+no halo on that side, so the band border is the image border. Each band is
+filtered in a worker process as a small Image and only its own rows are sent
+back, to be pasted into the result: the output is the same, sample for
+sample, as running the filter over the whole image.
+
+The `parallel` argument of the filters is either a number of worker
+processes, for which a `ProcessPoolExecutor` is created and shut down around
+the call, or an `Executor` to reuse between calls, for which the work is split
+in `EXECUTOR_PARTS` parts (the CPU count by default). Filters with the `wrap`
+border mode read rows from the other end of the image, so they ignore it and
+run serially.
+"""
+
+from __future__ import annotations
+
+import os
+from array import array
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import repeat
+from typing import Any
+from typing import Iterator
+from typing import TYPE_CHECKING
+from typing import Union
+
+from .buffer import PixelBuffer
+from .errors import ValidationError
+from .lut import Table
+from .lut import translate
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .image import Image
+
+Parallel = Union[int, Executor]
+# parts the work is split in when an Executor is given, None for the CPU count
+EXECUTOR_PARTS: int | None = None
+
+
+def validate_parallel(parallel: Parallel | None) -> None:
+    """Checks the `parallel` argument of a filter, None runs serially
+
+    Raises:
+        ValidationError: If it is a worker count below 1
+    """
+    if parallel is not None and not isinstance(parallel, Executor) and parallel <= 0:
+        raise ValidationError(f"Worker count must be positive, found {parallel}")
+
+
+@contextmanager
+def _executor(parallel: Parallel) -> Iterator[tuple[Executor, int]]:
+    """The executor to submit to and the amount of parts to split the work in"""
+    if isinstance(parallel, Executor):
+        yield parallel, EXECUTOR_PARTS or os.cpu_count() or 1
+        return
+    validate_parallel(parallel)
+    with ProcessPoolExecutor(max_workers=parallel) as executor:
+        yield executor, parallel
+
+
+def band_bounds(height: int, bands: int) -> list[tuple[int, int]]:
+    """Splits `height` rows into at most `bands` bands of (almost) equal height
+
+    Returns:
+        list[tuple[int, int]]: the first row and the number of rows of each band
+    """
+    bands = max(1, min(bands, height))
+    size, extra = divmod(height, bands)
+    bounds, start = [], 0
+    for b in range(bands):
+        count = size + (b < extra)
+        bounds.append((start, count))
+        start += count
+    return bounds
+
+
+def _process_band(
+    image_type: type,
+    header: str,
+    max_level: int,
+    buffer: PixelBuffer,
+    top: int,
+    count: int,
+    output_table: Table | None,
+    operation: str,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+) -> PixelBuffer:
+    image = image_type(header, max_level, (buffer.width, buffer.height), buffer=buffer)
+    image._output_table = output_table
+    result = getattr(image, operation)(*args, **kwargs, inplace=True)
+    return result._buffer.crop(0, top, buffer.width, count)
+
+
+def run_in_bands(
+    image: Image,
+    operation: str,
+    halo: int,
+    parallel: Parallel,
+    *args: Any,
+    **kwargs: Any,
+) -> PixelBuffer:
+    """Runs a sliding window filter over bands of the image in worker processes
+
+    Args:
+        - image (Image): the image to filter, left unchanged
+        - operation (str): name of the Image method to run on each band
+        - halo (int): rows above and below a band read by its windows
+        - parallel (Parallel): number of worker processes, or an Executor
+        - *args, **kwargs: arguments for the Image method
+
+    Returns:
+        PixelBuffer: the filtered samples of the whole image
+    """
+    source = image._buffer
+    width, height = source.width, source.height
+    result = PixelBuffer(
+        width, height, source.channels, source.typecode, layout=source.layout
+    )
+    with _executor(parallel) as (executor, bands):
+        futures = []
+        for start, count in band_bounds(height, bands):
+            low, high = max(0, start - halo), min(height, start + count + halo)
+            futures.append(
+                (
+                    start,
+                    executor.submit(
+                        _process_band,
+                        type(image),
+                        image.header,
+                        image.max_level,
+                        source.crop(0, low, width, high - low),
+                        start - low,
+                        count,
+                        image._output_table,
+                        operation,
+                        args,
+                        kwargs,
+                    ),
+                )
+            )
+        for start, future in futures:
+            result.paste(future.result(), 0, start)
+    return result
+
+
+def translate_in_parts(
+    samples: PixelBuffer, tables: list[Table], parallel: Parallel
+) -> list[array[int]]:
+    """Maps each plane of a buffer through its own table in worker processes
+
+    Args:
+        - samples (PixelBuffer): the samples to map
+        - tables (list[Table]): one table per channel, see `lut.build_table`
+        - parallel (Parallel): number of worker processes, or an Executor
+
+    Returns:
+        list[array[int]]: the mapped planes
+    """
+    typecode, width = samples.typecode, samples.width
+    planes = []
+    with _executor(parallel) as (executor, parts):
+        for c, table in enumerate(tables):
+            plane = samples.plane(c)
+            chunks = [
+                plane[start * width : (start + count) * width]
+                for start, count in band_bounds(samples.height, parts)
+            ]
+            mapped = executor.map(translate, chunks, repeat(typecode), repeat(table))
+            planes.append(array(typecode))
+            for chunk in mapped:
+                planes[-1].extend(chunk)
+    return planes
@@ -0,0 +1,227 @@
+"""Lazy processing pipelines
+
+`Image.lazy()` returns a `Pipeline`, which records Image operations instead
+of running them. Nothing is computed until `Pipeline.compute()` (or
+`save_file` with the pipeline) is called, which lets the recorded steps be
+planned as a whole:
+
+    - consecutive pointwise operations (`darken`, `gamma_transformation`,
+      `binarization`...) are fused into a single lookup table, by running
+      them over a small image holding every possible sample value once
+    - a fused table following a sliding window operation (`average_filter`,
+      `median_filter`, `_kernel_filter`...) is applied while that operation
+      writes its result, instead of in a pass of its own
+
+So `img.lazy().median_filter(3).darken(10).gamma_transformation(0.5)` goes
+over the pixels once for the filter, and `darken(10).binarization(128)`
+once in total.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+from .buffer import PixelBuffer
+from .errors import ValidationError
+from .lut import apply_table
+from .lut import Table
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .image import Image
+
+# operations mapping each sample on its own, fused into lookup tables
+POINTWISE_OPERATIONS = (
+    "negative",
+    "darken",
+    "lighten",
+    "multiply_image",
+    "gamma_transformation",
+    "binarization",
+    "highlight_band",
+)
+# operations building their result plane by plane, which can apply a table
+# while writing it
+WINDOW_OPERATIONS = (
+    "average_filter",
+    "median_filter",
+    "laplacian_filter",
+    "_kernel_filter",
+    "local_histogram_equalization",
+    "high_boost_filter",
+)
+OTHER_OPERATIONS = (
+    "add_image",
+    "subtract_image",
+    "histogram_equalization",
+    "rotate_90",
+    "rotate_180",
+    "rotate_270",
+    "transpose",
+    "vertical_mirror",
+    "horizontal_mirror",
+    "crop",
+    "pad",
+)
+LAZY_OPERATIONS = POINTWISE_OPERATIONS + WINDOW_OPERATIONS + OTHER_OPERATIONS
+
+Step = Tuple[str, Tuple[Any, ...], Dict[str, Any]]
+
+# short names accepted by `parse_step`
+STEP_ALIASES = {
+    "median": "median_filter",
+    "average": "average_filter",
+    "mean": "average_filter",
+    "laplacian": "laplacian_filter",
+    "kernel": "_kernel_filter",
+    "high_boost": "high_boost_filter",
+    "local_equalize": "local_histogram_equalization",
+    "equalize": "histogram_equalization",
+    "gamma": "gamma_transformation",
+    "multiply": "multiply_image",
+    "binarize": "binarization",
+    "rotate90": "rotate_90",
+    "rotate180": "rotate_180",
+    "rotate270": "rotate_270",
+}
+
+
+def _parse_value(text: str) -> Any:
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    if text in ("true", "false"):
+        return text == "true"
+    return text
+
+
+def parse_step(spec: str) -> Step:
+    """Parses an operation written `name:arg,arg,key=value`
+
+    The name is an operation from `LAZY_OPERATIONS` or one of `STEP_ALIASES`.
+    Numbers are converted to int or float, `true` and `false` to booleans,
+    anything else is kept as a string.
+
+    Args:
+        - spec (str): the operation, e.g. `median:5` or `median:5,mode=reflect`
+
+    Raises:
+        ValidationError: If the operation is unknown
+
+    Returns:
+        Step: the Image method name, its positional and its keyword arguments
+    """
+    name, _, params = spec.partition(":")
+    name = STEP_ALIASES.get(name, name)
+    if name not in LAZY_OPERATIONS:
+        raise ValidationError(
+            f"Unknown operation {name}, options are {LAZY_OPERATIONS} and {tuple(STEP_ALIASES)}"
+        )
+    args, kwargs = [], {}
+    for param in filter(None, params.split(",")):
+        key, equals, value = param.partition("=")
+        if equals:
+            kwargs[key] = _parse_value(value)
+        else:
+            args.append(_parse_value(param))
+    return name, tuple(args), kwargs
+
+
+class Pipeline:
+    def __init__(self, image: Image):
+        """Operations recorded over an image, see `Image.lazy`
+
+        Every operation from `LAZY_OPERATIONS` can be called on the pipeline
+        with the same arguments as on the Image (`inplace` is not accepted),
+        returning the pipeline so calls can be chained.
+
+        Args:
+            - image (Image): the source image, never modified by the pipeline
+        """
+        self.image = image
+        self.steps: list[Step] = []
+
+    def __getattr__(self, name: str) -> Callable[..., Pipeline]:
+        if name not in LAZY_OPERATIONS:
+            raise AttributeError(
+                f"{type(self).__name__} has no operation {name}, options are {LAZY_OPERATIONS}"
+            )
+
+        def record(*args: Any, **kwargs: Any) -> Pipeline:
+            self.steps.append((name, args, kwargs))
+            return self
+
+        return record
+
+    def plan(self) -> list[tuple[Step | None, list[Step]]]:
+        """Groups the steps into passes over the pixels
+
+        Returns:
+            list[tuple[Step | None, list[Step]]]: for each pass, the non
+            pointwise step it runs (None for a pass applying a table only)
+            and the pointwise steps fused into the table applied after it
+        """
+        passes: list[tuple[Step | None, list[Step]]] = []
+        for step in self.steps:
+            if step[0] in POINTWISE_OPERATIONS and passes:
+                operation, pointwise = passes[-1]
+                if operation is None or operation[0] in WINDOW_OPERATIONS:
+                    pointwise.append(step)
+                    continue
+            if step[0] in POINTWISE_OPERATIONS:
+                passes.append((None, [step]))
+            else:
+                passes.append((step, []))
+        return passes
+
+    def compute(self) -> Image:
+        """Runs the recorded operations
+
+        Returns:
+            Image: a new image holding the result
+        """
+        result = self.image.copy_current_image()
+        for operation, pointwise in self.plan():
+            if operation is None:
+                result._buffer = result._buffer.with_data(
+                    apply_table(result._buffer, self._fused_table(pointwise))
+                )
+                continue
+            table = self._fused_table(pointwise) if pointwise else None
+            name, args, kwargs = operation
+            result._output_table = table
+            try:
+                getattr(result, name)(*args, **kwargs, inplace=True)
+            finally:
+                result._output_table = None
+        return result
+
+    def _fused_table(self, steps: list[Step]) -> Table:
+        """Composes pointwise steps into one table
+
+        The steps run over a single row image holding each possible sample
+        value once, so the table reproduces every rule of the operations.
+        """
+        typecode = self.image._buffer.typecode
+        size = 1 << (8 * array(typecode).itemsize)
+        samples = array(typecode, range(size))
+        identity = type(self.image)(
+            header="P2",
+            max_level=self.image.max_level,
+            dimensions=(size, 1),
+            buffer=PixelBuffer(size, 1, 1, typecode, samples),
+        )
+        for name, args, kwargs in steps:
+            identity = getattr(identity, name)(*args, **kwargs, inplace=True)
+        table = identity._buffer.data
+        return table.tobytes() if typecode == "B" else array(typecode, table)
+
+    def __repr__(self) -> str:
+        steps = ", ".join(name for name, _, _ in self.steps)
+        return f"{type(self).__name__}({self.image!r}, steps=[{steps}])"
@@ -0,0 +1,141 @@
+"""Pixel buffers in shared memory
+
+A buffer copied into a `multiprocessing.shared_memory` segment can be read by
+other processes without sending its samples: a `SharedDescriptor` (the
+segment name and the buffer geometry) is all they need to attach to it.
+Images over a segment pickle as their descriptor, see `Image.to_shared_memory`.
+
+The samples are a read-only view over the segment, so writes follow the copy
+on write rules of `PixelBuffer` and never reach the other processes.
+
+The process creating a segment owns it: the segment is unlinked (its name
+removed, so it is freed once every process unmapped it) by
+`SharedSegment.unlink`, or when the owning `SharedSegment` is garbage
+collected or the interpreter exits, whichever comes first. Attached segments
+are only unmapped, when the last buffer over them is gone.
+"""
+
+from __future__ import annotations
+
+import weakref
+from array import array
+from multiprocessing.shared_memory import SharedMemory
+from typing import cast
+from typing import NamedTuple
+
+from .buffer import PixelBuffer
+
+
+class SharedDescriptor(NamedTuple):
+    """What a process needs to attach to a shared image"""
+
+    name: str
+    header: str
+    max_level: int
+    width: int
+    height: int
+    channels: int
+    typecode: str
+    layout: str
+
+
+def _unlink_segment(memory: SharedMemory) -> None:
+    try:
+        memory.unlink()
+    except FileNotFoundError:
+        # already unlinked by another process
+        pass
+
+
+class SharedSegment:
+    def __init__(self, memory: SharedMemory, owner: bool):
+        """A shared memory segment holding the samples of a buffer
+
+        Args:
+            - memory (SharedMemory): the mapped segment
+            - owner (bool): whether this process created the segment, and unlinks it
+        """
+        self.memory = memory
+        self.name = memory.name
+        self.owner = owner
+        self._finalizer = (
+            weakref.finalize(self, _unlink_segment, memory) if owner else None
+        )
+
+    @classmethod
+    def create(cls, size: int) -> SharedSegment:
+        return cls(SharedMemory(create=True, size=max(1, size)), owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> SharedSegment:
+        """Maps an existing segment
+
+        Raises:
+            FileNotFoundError: If no segment has that name (e.g. it was unlinked)
+        """
+        return cls(SharedMemory(name), owner=False)
+
+    @property
+    def unlinked(self) -> bool:
+        return self._finalizer is not None and not self._finalizer.alive
+
+    def unlink(self) -> None:
+        """Frees the segment once every process unmapped it, owners only
+
+        Processes can no longer attach to it, buffers already over it stay
+        valid. Calling it more than once is harmless.
+        """
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def view(self, nbytes: int, typecode: str) -> memoryview:
+        """Read-only samples of the first `nbytes` of the segment"""
+        buf = cast(memoryview, self.memory.buf)
+        return buf[:nbytes].toreadonly().cast(typecode)  # type: ignore[call-overload]
+
+
+def share_buffer(buffer: PixelBuffer) -> PixelBuffer:
+    """Copies a buffer into a new shared memory segment
+
+    Args:
+        - buffer (PixelBuffer): the samples to copy
+
+    Returns:
+        PixelBuffer: a buffer over the segment (see `PixelBuffer.segment`),
+        owned by this process
+    """
+    nbytes = len(buffer.data) * array(buffer.typecode).itemsize
+    segment = SharedSegment.create(nbytes)
+    cast(memoryview, segment.memory.buf)[:nbytes] = memoryview(buffer.data).cast("B")
+    return _over_segment(segment, buffer, nbytes)
+
+
+def attach_buffer(descriptor: SharedDescriptor) -> PixelBuffer:
+    """Creates a buffer over the segment of a descriptor
+
+    Raises:
+        FileNotFoundError: If the segment was unlinked
+    """
+    segment = SharedSegment.attach(descriptor.name)
+    nbytes = (
+        descriptor.width
+        * descriptor.height
+        * descriptor.channels
+        * array(descriptor.typecode).itemsize
+    )
+    return _over_segment(segment, descriptor, nbytes)
+
+
+def _over_segment(
+    segment: SharedSegment, geometry: PixelBuffer | SharedDescriptor, nbytes: int
+) -> PixelBuffer:
+    buffer = PixelBuffer(
+        geometry.width,
+        geometry.height,
+        geometry.channels,
+        geometry.typecode,
+        segment.view(nbytes, geometry.typecode),
+        geometry.layout,
+    )
+    buffer.segment = segment
+    return buffer
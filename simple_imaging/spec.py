@@ -0,0 +1,400 @@
+"""Declarative processing graphs
+
+A spec (a JSON or TOML file, or the equivalent dict) describes a graph of
+images:
+
+    [inputs]
+    photo = "photo.ppm"
+
+    [nodes.channels]
+    function = "extract_channels"
+    inputs = ["photo"]
+
+    [nodes.red]
+    input = "channels[0]"
+    ops = ["median:5", "gamma:0.6"]
+
+    [nodes.merged]
+    function = "merge_channels"
+    inputs = ["red", "channels[1]", "channels[2]"]
+
+    [nodes.sharp]
+    input = "photo"
+    ops = [{op = "laplacian_filter"}, {op = "add_image", args = ["@photo"]}]
+
+    [outputs]
+    "out/merged.ppm" = "merged"
+    "out/sharp.ppm" = {node = "sharp", header = "P3"}
+
+`inputs` name the files to read. A node either runs a chain of `ops` over its
+`input`, as a lazy `Pipeline` (so pointwise operations are fused), or calls
+one of the `FUNCTIONS` with its `inputs`. Operations are written as in
+`pipeline.parse_step`, or as tables with `op`, `args` and `kwargs`, where a
+string argument `@name` stands for another node result. A reference to a node
+returning a list of images (`extract_channels`) picks one with `name[index]`.
+`outputs` map file paths to the node written there. Relative paths are
+relative to the spec file. TOML specs need Python 3.11 or later, or the
+`tomli` package (the `toml` extra).
+
+The scheduler runs every node whose inputs are ready concurrently, in an
+executor, and drops each result as soon as the last node reading it is done,
+so only the images still needed are kept. It reports how long each node took
+and the critical path, the chain of dependent nodes that bounds the run time.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import Executor
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+from typing import Any
+from typing import NamedTuple
+
+from .errors import ValidationError
+from .image import extract_channels
+from .image import Image
+from .image import merge_channels
+from .image import read_file
+from .image import save_file
+from .pipeline import LAZY_OPERATIONS
+from .pipeline import parse_step
+from .pipeline import Step
+
+try:
+    import tomllib
+except ImportError:  # pragma: no cover
+    # before Python 3.11, TOML needs the tomli package (the `toml` extra)
+    try:
+        import tomli as tomllib  # type: ignore[no-redef, import-not-found]
+    except ImportError:
+        tomllib = None  # type: ignore[assignment]
+
+_REFERENCE = re.compile(r"^(?P<node>[^\[\]]+)(\[(?P<index>\d+)\])?$")
+
+
+def _extract_channels(images: list[Image]) -> list[Image]:
+    return extract_channels(images[0])
+
+
+# function name -> callable taking the list of input images
+FUNCTIONS = {
+    "extract_channels": _extract_channels,
+    "merge_channels": merge_channels,
+}
+# functions returning a list of images, read as `name[index]`
+LIST_FUNCTIONS = ("extract_channels",)
+
+
+class Task(NamedTuple):
+    """One node of the graph
+
+    `kind` is `read`, `ops`, `function` or `write`, `references` the results
+    the task receives (see `parse_reference`) and `params` the file path, the
+    steps, the function name or the output path and header.
+    """
+
+    name: str
+    kind: str
+    references: tuple[str, ...]
+    params: Any
+
+
+class ScheduleReport(NamedTuple):
+    """What `run_graph` measured
+
+    `durations` are the seconds each task ran, `critical_path` the chain of
+    dependent tasks with the longest total duration (`critical_seconds`),
+    `elapsed` the wall time of the whole run and `peak_results` the most
+    results held at once.
+    """
+
+    durations: dict[str, float]
+    critical_path: list[str]
+    critical_seconds: float
+    elapsed: float
+    peak_results: int
+
+
+def parse_reference(reference: str) -> tuple[str, int | None]:
+    """Splits `name` or `name[index]` into the node name and the index
+
+    Raises:
+        ValidationError: If the reference is malformed
+    """
+    match = _REFERENCE.match(reference)
+    if match is None:
+        raise ValidationError(f"Invalid node reference {reference!r}")
+    index = match.group("index")
+    return match.group("node"), None if index is None else int(index)
+
+
+def _parse_op(op: str | dict[str, Any]) -> Step:
+    if isinstance(op, str):
+        return parse_step(op)
+    name = op.get("op")
+    if name not in LAZY_OPERATIONS:
+        raise ValidationError(
+            f"Unknown operation {name}, options are {LAZY_OPERATIONS}"
+        )
+    return name, tuple(op.get("args", ())), dict(op.get("kwargs", {}))
+
+
+def _image_arguments(steps: list[Step]) -> list[str]:
+    """The `@name` references found in the arguments of the steps"""
+    return [
+        value[1:]
+        for _, args, kwargs in steps
+        for value in (*args, *kwargs.values())
+        if isinstance(value, str) and value.startswith("@")
+    ]
+
+
+def build_graph(spec: dict[str, Any], base_dir: str = ".") -> dict[str, Task]:
+    """Checks a spec and turns it into tasks
+
+    Args:
+        - spec (dict[str, Any]): the spec, see the module documentation
+        - base_dir (str, optional): directory relative paths start from. Defaults to ".".
+
+    Raises:
+        ValidationError: If the spec is malformed, has a cycle, references unknown nodes or a list of images without an index
+
+    Returns:
+        dict[str, Task]: the tasks by name, outputs are named `output:<path>`
+    """
+    tasks = {}
+    for name, path in spec.get("inputs", {}).items():
+        tasks[name] = Task(name, "read", (), os.path.join(base_dir, path))
+    for name, node in spec.get("nodes", {}).items():
+        if name in tasks:
+            raise ValidationError(f"Node {name} is defined twice")
+        if "function" in node:
+            if node["function"] not in FUNCTIONS:
+                raise ValidationError(
+                    f"Unknown function {node['function']}, options are {tuple(FUNCTIONS)}"
+                )
+            references = tuple(node.get("inputs", ()))
+            tasks[name] = Task(name, "function", references, node["function"])
+        elif "input" in node:
+            steps = [_parse_op(op) for op in node.get("ops", ())]
+            references = (node["input"], *_image_arguments(steps))
+            tasks[name] = Task(name, "ops", references, steps)
+        else:
+            raise ValidationError(f"Node {name} needs an `input` or a `function`")
+    for path, output in spec.get("outputs", {}).items():
+        if isinstance(output, str):
+            output = {"node": output}
+        destination = os.path.join(base_dir, path)
+        tasks[f"output:{path}"] = Task(
+            f"output:{path}",
+            "write",
+            (output["node"],),
+            (destination, output.get("header")),
+        )
+
+    for task in tasks.values():
+        for reference in task.references:
+            node, index = parse_reference(reference)
+            if node not in tasks or tasks[node].kind == "write":
+                raise ValidationError(f"{task.name} reads unknown node {node}")
+            is_list = (
+                tasks[node].kind == "function" and tasks[node].params in LIST_FUNCTIONS
+            )
+            if is_list and index is None:
+                raise ValidationError(
+                    f"{task.name} reads {node}, a list of images, pick one with {node}[index]"
+                )
+            if not is_list and index is not None:
+                raise ValidationError(
+                    f"{task.name} reads {reference}, but {node} is a single image"
+                )
+    unsorted = set(tasks) - set(_topological_order(tasks))
+    if unsorted:
+        raise ValidationError(f"The graph has a cycle through {sorted(unsorted)}")
+    return tasks
+
+
+def _dependencies(task: Task) -> set[str]:
+    return {parse_reference(reference)[0] for reference in task.references}
+
+
+def _consumers(dependencies: dict[str, set[str]]) -> dict[str, set[str]]:
+    """The tasks reading each task result"""
+    consumers = defaultdict(set)
+    for name, names in dependencies.items():
+        for dependency in names:
+            consumers[dependency].add(name)
+    return consumers
+
+
+def _topological_order(tasks: dict[str, Task]) -> list[str]:
+    """The tasks ordered after their dependencies, without those in a cycle"""
+    pending = {name: _dependencies(task) for name, task in tasks.items()}
+    consumers = _consumers(pending)
+    order = [name for name, dependencies in pending.items() if not dependencies]
+    for name in order:
+        for consumer in sorted(consumers[name]):
+            pending[consumer].discard(name)
+            if not pending[consumer]:
+                order.append(consumer)
+    return order
+
+
+def _substitute(value: Any, images: dict[str, Any]) -> Any:
+    if isinstance(value, str) and value.startswith("@"):
+        return images[value[1:]]
+    return value
+
+
+def _run_task(task: Task, values: list[Any]) -> tuple[Any, float]:
+    """Runs one task over the results it reads, returns its result and duration"""
+    start = time.perf_counter()
+    result: Any
+    if task.kind == "read":
+        result = read_file(task.params)
+    elif task.kind == "function":
+        result = FUNCTIONS[task.params](values)
+    elif task.kind == "write":
+        destination, header = task.params
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        result = save_file(destination, values[0], header)
+    else:
+        images = dict(zip(task.references, values))
+        pipeline = values[0].lazy()
+        for name, args, kwargs in task.params:
+            args = tuple(_substitute(v, images) for v in args)
+            kwargs = {k: _substitute(v, images) for k, v in kwargs.items()}
+            pipeline.steps.append((name, args, kwargs))
+        result = pipeline.compute()
+    return result, time.perf_counter() - start
+
+
+def _critical_path(
+    tasks: dict[str, Task], order: list[str], durations: dict[str, float]
+) -> tuple[list[str], float]:
+    finish: dict[str, float] = {}
+    previous: dict[str, str | None] = {}
+    for name in order:
+        dependencies = _dependencies(tasks[name])
+        slowest = max(dependencies, key=finish.__getitem__, default=None)
+        finish[name] = durations[name] + (finish[slowest] if slowest else 0.0)
+        previous[name] = slowest
+    last = max(finish, key=finish.__getitem__, default=None)
+    total = finish[last] if last is not None else 0.0
+    path = []
+    while last is not None:
+        path.append(last)
+        last = previous[last]
+    return path[::-1], total
+
+
+def run_graph(tasks: dict[str, Task], executor: Executor) -> ScheduleReport:
+    """Runs the tasks as soon as their inputs are ready
+
+    Args:
+        - tasks (dict[str, Task]): the tasks, see `build_graph`
+        - executor (Executor): runs the tasks, results are sent back to this process
+
+    Returns:
+        ScheduleReport: the durations and critical path of the run
+    """
+    pending = {name: _dependencies(task) for name, task in tasks.items()}
+    consumers = _consumers(pending)
+    readers_left = {name: len(consumers[name]) for name in tasks}
+
+    results: dict[str, Any] = {}
+    durations: dict[str, float] = {}
+    order: list[str] = []
+    running: dict[Future[tuple[Any, float]], str] = {}
+    peak_results = 0
+    ready = [name for name, dependencies in pending.items() if not dependencies]
+    start = time.perf_counter()
+    try:
+        while ready or running:
+            for name in ready:
+                values = []
+                for reference in tasks[name].references:
+                    node, index = parse_reference(reference)
+                    value = results[node]
+                    values.append(value if index is None else value[index])
+                running[executor.submit(_run_task, tasks[name], values)] = name
+            ready = []
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                result, durations[name] = future.result()
+                order.append(name)
+                if readers_left[name]:
+                    results[name] = result
+                peak_results = max(peak_results, len(results))
+                # intermediates are dropped once their last reader is done
+                for dependency in _dependencies(tasks[name]):
+                    readers_left[dependency] -= 1
+                    if not readers_left[dependency]:
+                        del results[dependency]
+                for consumer in sorted(consumers[name]):
+                    pending[consumer].discard(name)
+                    if not pending[consumer]:
+                        ready.append(consumer)
+    finally:
+        for future in running:
+            future.cancel()
+    elapsed = time.perf_counter() - start
+    path, seconds = _critical_path(tasks, order, durations)
+    return ScheduleReport(durations, path, seconds, elapsed, peak_results)
+
+
+def load_spec(path: str) -> dict[str, Any]:
+    """Reads a JSON spec, or a TOML one (`.toml` files)
+
+    TOML specs need Python 3.11 or later, or the `tomli` package (installed
+    by the `toml` extra).
+
+    Raises:
+        ValidationError: If TOML is not supported by this Python version
+    """
+    if path.lower().endswith(".toml"):
+        if tomllib is None:
+            raise ValidationError(
+                "TOML specs need Python 3.11 or later, or the tomli package"
+            )
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_spec(
+    spec: str | dict[str, Any],
+    workers: int | None = None,
+    executor: Executor | None = None,
+) -> ScheduleReport:
+    """Runs the graph described by a spec file or dict
+
+    Args:
+        - spec (str | dict[str, Any]): path of a spec file, or the spec itself
+        - workers (int, optional): worker processes when no executor is given. Defaults to the CPU count.
+        - executor (Executor, optional): runs the tasks. Defaults to a new `ProcessPoolExecutor`.
+
+    Raises:
+        ValidationError: If the spec is invalid
+
+    Returns:
+        ScheduleReport: see `run_graph`
+    """
+    base_dir = "."
+    if isinstance(spec, str):
+        base_dir = os.path.dirname(spec) or "."
+        spec = load_spec(spec)
+    tasks = build_graph(spec, base_dir)
+    if executor is not None:
+        return run_graph(tasks, executor)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return run_graph(tasks, pool)
@@ -0,0 +1,190 @@
+"""Out-of-core processing of Netpbm files
+
+The input file is read lazily, a horizontal strip of rows at a time. Each
+strip is processed as a small in-memory `Image` and its rows are written
+straight into the output file, so only a strip (plus its halo) is ever held
+in memory.
+
+Sliding window operations need the `kernel // 2` rows above and below a
+strip (the halo). Strips touching the top or bottom of the image simply have
+no halo on that side, which makes the strip border the image border and
+reproduces the `extend` border mode (see `border`): the results are the same
+as running the operation over the whole image.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from itertools import islice
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import Sequence
+
+from .buffer import channels_for
+from .buffer import PixelBuffer
+from .buffer import typecode_for
+from .errors import ValidationError
+from .image import _bitmap_rows
+from .image import Image
+from .kernels import get_kernel
+from .kernels import Kernel
+from .utils import BITMAP_HEADERS
+from .utils import NetpbmWriter
+from .utils import read_rows
+from .utils import replacing_file
+
+DEFAULT_STRIP_HEIGHT = 256
+
+
+def _no_halo(*args: Any, **kwargs: Any) -> int:
+    return 0
+
+
+def _kernel_halo(kernel: int, *args: Any, **kwargs: Any) -> int:
+    return kernel // 2
+
+
+def _fixed_halo(*args: Any, **kwargs: Any) -> int:
+    return 1
+
+
+def _high_boost_halo(
+    k: int | float = 1,
+    inplace: bool = True,
+    mode: str = "extend",
+    blur: str = "median",
+    kernel: int = 3,
+) -> int:
+    return kernel // 2
+
+
+def _convolution_halo(
+    kernel: str | Kernel = "laplace", *args: Any, **kwargs: Any
+) -> int:
+    return get_kernel(kernel).radius
+
+
+# operation name -> halo rows needed, computed from the operation arguments
+STRIP_OPERATIONS: dict[str, Callable[..., int]] = {
+    "negative": _no_halo,
+    "multiply_image": _no_halo,
+    "gamma_transformation": _no_halo,
+    "darken": _no_halo,
+    "lighten": _no_halo,
+    "binarization": _no_halo,
+    "highlight_band": _no_halo,
+    "average_filter": _kernel_halo,
+    "median_filter": _kernel_halo,
+    "laplacian_filter": _fixed_halo,
+    "_kernel_filter": _convolution_halo,
+    "high_boost_filter": _high_boost_halo,
+}
+
+
+def iter_strips(
+    rows: Iterator[Sequence[int]], height: int, strip_height: int, halo: int = 0
+) -> Iterator[tuple[list[Sequence[int]], int, int]]:
+    """Groups the rows of an image into horizontal strips with a halo
+
+    Rows shared by two strips are kept between them, so each row is read
+    from `rows` only once.
+
+    Args:
+        - rows (Iterator[Sequence[int]]): the image rows, top to bottom
+        - height (int): number of rows of the image
+        - strip_height (int): number of rows processed by each strip
+        - halo (int, optional): extra rows above and below each strip. Defaults to 0.
+
+    Yields:
+        Iterator[tuple[list[Sequence[int]], int, int]]: the strip rows (halo included),
+        the index of its first processed row and the number of processed rows
+    """
+    window: deque[Sequence[int]] = deque()
+    first = 0  # index of the first row kept in `window`
+    for start in range(0, height, strip_height):
+        end = min(start + strip_height, height)
+        low, high = max(0, start - halo), min(height, end + halo)
+        while first < low:
+            window.popleft()
+            first += 1
+        while first + len(window) < high:
+            window.append(next(rows))
+        yield list(window), start - low, end - start
+
+
+def process_file(
+    source: str,
+    destination: str,
+    operation: str,
+    *args: Any,
+    strip_height: int = DEFAULT_STRIP_HEIGHT,
+    header: str | None = None,
+    **kwargs: Any,
+) -> int:
+    """Applies an Image operation to a file, one strip at a time
+
+    Supports the pointwise operations (`negative`, `gamma_transformation`,
+    `darken`...) and the sliding window filters (`average_filter`,
+    `median_filter`, `laplacian_filter`, `_kernel_filter` and
+    `high_boost_filter`), see `STRIP_OPERATIONS`.
+
+    Args:
+        - source (str): path of the input file
+        - destination (str): path of the output file, replaced once written (it may be the source)
+        - operation (str): name of the Image method to apply
+        - *args, **kwargs: arguments for the Image method
+        - strip_height (int, optional): rows processed at a time. Defaults to DEFAULT_STRIP_HEIGHT.
+        - header (str, optional): output format. Defaults to the input header.
+
+    Raises:
+        ValidationError: If the operation cannot run over strips, or the output format does not match the image channels
+
+    Returns:
+        int: the amount of bytes written
+    """
+    try:
+        halo = STRIP_OPERATIONS[operation](*args, **kwargs)
+    except KeyError:
+        raise ValidationError(
+            f"Operation {operation} cannot run over strips, options are {STRIP_OPERATIONS.keys()}"
+        )
+    if kwargs.get("mode") == "wrap":
+        # wrapped borders read rows from the other end of the image
+        raise ValidationError("The wrap border mode cannot run over strips")
+    if strip_height <= 0:
+        raise ValidationError(f"Strip height must be positive, found {strip_height}")
+    with open(source, "rb") as src:
+        image_data, rows = read_rows(src)
+        in_header, max_level = image_data["header"], image_data["max_level"]
+        out_header = in_header if header is None else header
+        channels = channels_for(in_header)
+        if channels_for(out_header) != channels:
+            raise ValidationError(
+                f"Cannot write a {channels} channel image as {out_header}"
+            )
+        width, height = image_data["dimensions"]
+        typecode = typecode_for(max_level)
+        # grayscale written as a bitmap, thresholded like `save_file` does
+        bitmap = out_header in BITMAP_HEADERS and in_header not in BITMAP_HEADERS
+        # the source may be the destination, it is only replaced once written
+        with replacing_file(destination) as dst:
+            with NetpbmWriter(dst, out_header, width, height, max_level) as writer:
+                for strip, top, count in iter_strips(rows, height, strip_height, halo):
+                    data = array(typecode)
+                    for row in strip:
+                        data.extend(row)
+                    buffer = PixelBuffer(width, len(strip), channels, typecode, data)
+                    image = Image(
+                        in_header, max_level, (width, len(strip)), buffer=buffer
+                    )
+                    result = getattr(image, operation)(*args, **kwargs, inplace=True)
+                    written: Iterable[Sequence[int]] = islice(
+                        result._buffer.iter_rows(), top, top + count
+                    )
+                    if bitmap:
+                        written = _bitmap_rows(written, typecode, max_level)
+                    writer.write_rows(written)
+    return writer.bytes_written
@@ -1,16 +1,31 @@
+import mmap
+import os
+import struct
+import sys
+import uuid
+from array import array
+from contextlib import contextmanager
 from itertools import chain
+from itertools import islice
+from types import TracebackType
 from typing import Any
+from typing import BinaryIO
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
+from typing import Optional
+from typing import Sequence
 from typing import TextIO
 from typing import Tuple
-from typing import TypeVar
+from typing import Type
 
+from .buffer import channels_for
+from .buffer import PixelBuffer
+from .buffer import typecode_for
 from .errors import InvalidConfigsError
 from .errors import InvalidFileError
 from .errors import InvalidHeaderError
-from .types import GrayPixel
-from .types import RGBPixel
 
 
 def get_split_strings(file_contents: TextIO) -> List[str]:
@@ -29,138 +44,706 @@ def get_split_strings(file_contents: TextIO) -> List[str]:
     return list(chain.from_iterable(x.strip().split() for x in file_contents))
 
 
-def _extract_header(file_contents: List[str]) -> Tuple[str, List[str]]:
-    header, contents = _extract_first_element(file_contents)  # type: str, List[str]
-    acceptable_headers = ("P1", "P2", "P3")
-    if header not in acceptable_headers:
+ASCII_HEADERS = ("P1", "P2", "P3")
+BINARY_HEADERS = ("P4", "P5", "P6")
+BITMAP_HEADERS = ("P1", "P4")
+MAX_SAMPLE_VALUE = 65535
+DEFAULT_CHUNK_SIZE = 1 << 16
+ASCII_LINE_LIMIT = 70
+_WHITESPACE = b" \t\n\r\v\f"
+# each byte of a P4 raster unpacked into its 8 bits, most significant first
+_BIT_TABLE = [bytes((byte >> (7 - bit)) & 1 for bit in range(8)) for byte in range(256)]
+_BIT_CHARS = bytes.maketrans(bytes(range(256)), b"0" + b"1" * 255)
+
+# wire format of `Image.to_bytes`: magic, format version, Netpbm header,
+# typecode, byte order (1 for little-endian), layout (1 for planar),
+# channels, max_level, width and height, followed by the raw samples
+WIRE_MAGIC = b"SIMG"
+WIRE_VERSION = 1
+WIRE_HEADER = struct.Struct("<4sB2scBBBIII")
+
+
+def _read_header_token(stream: BinaryIO) -> bytes:
+    """Reads the next whitespace separated header token, skipping `#` comments"""
+    char = stream.read(1)
+    while char and (char in _WHITESPACE or char == b"#"):
+        if char == b"#":
+            while char and char not in b"\r\n":
+                char = stream.read(1)
+        char = stream.read(1)
+    token = b""
+    while char and char not in _WHITESPACE and char != b"#":
+        token += char
+        char = stream.read(1)
+    if char == b"#":
+        # a comment right after the token, consume it up to the line end
+        while char and char not in b"\r\n":
+            char = stream.read(1)
+    return token
+
+
+def _parse_header_value(token: bytes, name: str) -> int:
+    try:
+        value = int(token)
+    except ValueError:
+        raise InvalidFileError(f"Found invalid value {token!r} for {name} in header")
+    if value <= 0:
+        raise InvalidConfigsError(f"{name} cannot be negative or zero, found {value}")
+    return value
+
+
+def read_header(stream: BinaryIO) -> Dict[str, Any]:
+    """Reads a Netpbm header from a binary stream
+
+    Only the header is consumed, for binary formats the stream is left at the
+    first byte of the raster (after the single whitespace following the header).
+
+    Args:
+        - stream (BinaryIO): file opened in binary mode, positioned at its start
+
+    Raises:
+        InvalidHeaderError: If the magic number is unknown
+        InvalidFileError: If any header value is missing or non-numerical
+        InvalidConfigsError: If any header value is out of range
+
+    Returns:
+        Dict[str, Any]: `header`, `dimensions` and `max_level` of the file
+    """
+    header = stream.read(2).decode("ascii", errors="replace")
+    if header not in ASCII_HEADERS + BINARY_HEADERS:
         raise InvalidHeaderError(f"Header {header} is not allowed or invalid")
-    return header, contents
+    x = _parse_header_value(_read_header_token(stream), "width")
+    y = _parse_header_value(_read_header_token(stream), "height")
+    if header in BITMAP_HEADERS:
+        max_level = 1
+    else:
+        max_level = _parse_header_value(_read_header_token(stream), "max_level")
+        if max_level > MAX_SAMPLE_VALUE:
+            raise InvalidConfigsError(
+                f"max_level cannot be above {MAX_SAMPLE_VALUE}, found {max_level=}"
+            )
+    return {"header": header, "dimensions": (x, y), "max_level": max_level}
 
 
-def _extract_dimensions(file_contents: List[str]) -> Tuple[int, int, List[int]]:
-    try:
-        # All remaining values should be integers
-        x, y, *contents = [int(x) for x in file_contents]  # type: int, int, List[int]
-    except ValueError:
-        raise InvalidFileError("Found invalid values (non-numerical) in file contents")
-    if x <= 0 or y <= 0:
-        raise InvalidConfigsError(
-            f"Neither of the dimensions can be negative or zero, found {x=}, {y=}"
+def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+    raw = stream.read(size)
+    if len(raw) != size:
+        raise InvalidFileError(
+            f"Non-matching amount of raster data found, should have {size} bytes, found {len(raw)}"
         )
-    return x, y, contents
+    return raw
+
+
+def parse_binary_raster(
+    stream: BinaryIO, header: str, x: int, y: int, max_level: int
+) -> PixelBuffer:
+    """Decodes a P4, P5 or P6 raster straight into a pixel buffer
+
+    P4 rasters are unpacked into one 0/1 sample per pixel. P5 and P6 samples
+    take one byte each, or two big-endian bytes when `max_level` is above 255.
+
+    Args:
+        - stream (BinaryIO): binary stream positioned at the raster start
+        - header (str): the file header, one of P4, P5 or P6
+        - x (int): image width
+        - y (int): image height
+        - max_level (int): maximum sample value
+
+    Raises:
+        InvalidFileError: If the stream ends before the whole raster is read
+
+    Returns:
+        PixelBuffer: the decoded samples
+    """
+    channels = channels_for(header)
+    typecode = typecode_for(max_level)
+    data = array(typecode)
+    if header == "P4":
+        row_bytes = (x + 7) // 8
+        raw = _read_exactly(stream, row_bytes * y)
+        for start in range(0, len(raw), row_bytes):
+            data.frombytes(_unpack_bits(raw[start : start + row_bytes], x))
+    else:
+        data.frombytes(_read_exactly(stream, x * y * channels * data.itemsize))
+        if data.itemsize > 1 and sys.byteorder == "little":
+            data.byteswap()
+    return PixelBuffer(x, y, channels, typecode, data)
 
 
-T = TypeVar("T")
+def _unpack_bits(raw: bytes, x: int) -> bytes:
+    return b"".join(_BIT_TABLE[byte] for byte in raw)[:x]
 
 
-def _extract_first_element(file_contents: List[T]) -> Tuple[T, List[T]]:
-    first_element, *remaining_data = file_contents
-    return first_element, remaining_data
+def iter_binary_rows(
+    stream: BinaryIO, header: str, x: int, y: int, max_level: int
+) -> Iterator["array[int]"]:
+    """Lazily decodes a P4, P5 or P6 raster, one row at a time
 
+    Same decoding as `parse_binary_raster`, but only one row is read from
+    the stream (and held in memory) at a time.
 
-def _convert_into_tuples(value_list: List[int]) -> List[Tuple[int, int, int]]:
-    return [
-        (value_list[i], value_list[i + 1], value_list[i + 2])
-        for i in range(0, len(value_list), 3)
-    ]
+    Raises:
+        InvalidFileError: If the stream ends before the whole raster is read
+
+    Yields:
+        Iterator[array]: the samples of each row, channels interleaved
+    """
+    typecode = typecode_for(max_level)
+    itemsize = array(typecode).itemsize
+    if header == "P4":
+        row_bytes = (x + 7) // 8
+    else:
+        row_bytes = x * channels_for(header) * itemsize
+    for _ in range(y):
+        raw = _read_exactly(stream, row_bytes)
+        row = array(typecode)
+        if header == "P4":
+            row.frombytes(_unpack_bits(raw, x))
+            yield row
+            continue
+        row.frombytes(raw)
+        if itemsize > 1 and sys.byteorder == "little":
+            row.byteswap()
+        yield row
+
+
+def parse_binary_file(stream: BinaryIO) -> Dict[str, Any]:
+    """Reads a binary (P4, P5 or P6) Netpbm file
+
+    Args:
+        - stream (BinaryIO): file opened in binary mode, positioned at its start
+
+    Raises:
+        InvalidHeaderError: If the file is not a binary Netpbm file
+
+    Returns:
+        Dict[str, Any]: `header`, `dimensions`, `max_level` and the pixel `buffer`
+    """
+    image_data = read_header(stream)
+    header = image_data["header"]
+    if header not in BINARY_HEADERS:
+        raise InvalidHeaderError(f"Header {header} is not a binary Netpbm header")
+    x, y = image_data["dimensions"]
+    image_data["buffer"] = parse_binary_raster(
+        stream, header, x, y, image_data["max_level"]
+    )
+    return image_data
 
 
-def _format_pixel_data(data: List[T], m: int) -> List[List[T]]:
-    return [data[i : i + m] for i in range(0, len(data), m)]
+def map_binary_file(stream: BinaryIO) -> Dict[str, Any]:
+    """Reads a binary Netpbm header and memory maps the raster
+
+    For 8 bit P5 and P6 files the pixel buffer is a read-only view over a
+    memory map of the raster region, so no sample is read until it is
+    accessed. 16 bit samples are stored big-endian and P4 samples are bit
+    packed, so those rasters are decoded as in `parse_binary_file`.
+
+    Args:
+        - stream (BinaryIO): file opened in binary mode, positioned at its start
 
+    Raises:
+        InvalidHeaderError: If the file is not a binary Netpbm file
+        InvalidFileError: If the file is smaller than its raster
 
-def _validate_data_length(data_length: int, desired_length: int) -> bool:
-    if data_length != desired_length:
+    Returns:
+        Dict[str, Any]: `header`, `dimensions`, `max_level` and the pixel `buffer`
+    """
+    image_data = read_header(stream)
+    header, max_level = image_data["header"], image_data["max_level"]
+    x, y = image_data["dimensions"]
+    if header not in BINARY_HEADERS:
+        raise InvalidHeaderError(f"Header {header} is not a binary Netpbm header")
+    if header == "P4" or typecode_for(max_level) != "B":
+        image_data["buffer"] = parse_binary_raster(stream, header, x, y, max_level)
+        return image_data
+    channels = channels_for(header)
+    offset, size = stream.tell(), x * y * channels
+    mapping = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapping) - offset < size:
+        mapping.close()
         raise InvalidFileError(
-            f"Non-matching amount of pixels found, should have {desired_length} values, found {data_length}"
+            f"Non-matching amount of raster data found, should have {size} bytes, found {len(mapping) - offset}"
         )
-    return True
+    raster = memoryview(mapping)[offset : offset + size]
+    image_data["buffer"] = PixelBuffer(x, y, channels, "B", raster)
+    return image_data
+
 
+def raster_buffer(
+    raster: Any,
+    width: int,
+    height: int,
+    channels: int,
+    typecode: str,
+    layout: str = "interleaved",
+    byteorder: str = sys.byteorder,
+) -> PixelBuffer:
+    """Creates a pixel buffer over raw samples
 
-def _generate_pixel_matrix_grayscale(
-    pixel_data: List[List[int]], x: int, y: int
-) -> List[List[GrayPixel]]:
-    pixel_matrix = []
-    for line in pixel_data:
-        pixel_line = [GrayPixel(value) for value in line]
-        pixel_matrix.append(pixel_line)
-    return pixel_matrix
-    # return [[GrayPixel(pixel_data[i][j]) for i in range(y)] for j in range(x)]
+    The samples are used in place, as a read-only view copied on the first
+    write, unless they need swapping to the native byte order.
 
+    Args:
+        - raster (Any): any bytes-like object holding the samples
+        - width (int): number of columns
+        - height (int): number of rows
+        - channels (int): samples per pixel
+        - typecode (str): `array` typecode of the samples
+        - layout (str, optional): `interleaved` or `planar`. Defaults to "interleaved".
+        - byteorder (str, optional): byte order of the samples. Defaults to the native one.
+
+    Raises:
+        InvalidFileError: If the raster size does not match the dimensions
 
-def _generate_pixel_matrix_rgb(
-    pixel_data: List[List[Tuple[int, int, int]]], x: int, y: int
-) -> List[List[RGBPixel]]:
-    return [[RGBPixel(**pixel_data[i][j]) for i in range(x)] for j in range(y)]
+    Returns:
+        PixelBuffer: the buffer holding the samples
+    """
+    view = memoryview(raster).cast("B")
+    size = width * height * channels * array(typecode).itemsize
+    if len(view) != size:
+        raise InvalidFileError(
+            f"Non-matching amount of raster data found, should have {size} bytes, found {len(view)}"
+        )
+    if byteorder == sys.byteorder or typecode == "B":
+        data = view.toreadonly().cast(typecode)  # type: ignore[call-overload]
+    else:
+        data = array(typecode)
+        data.frombytes(view)
+        data.byteswap()
+    return PixelBuffer(width, height, channels, typecode, data, layout)
 
 
-Pixel = TypeVar("Pixel", int, Tuple[int, int, int])
+def encode_image(header: str, max_level: int, buffer: PixelBuffer) -> bytes:
+    """Serializes an image in the wire format, see `WIRE_HEADER`
 
+    Args:
+        - header (str): the image header
+        - max_level (int): the image max level
+        - buffer (PixelBuffer): the image samples
 
-def _validate_max_value(max_value: Pixel) -> bool:
-    if isinstance(max_value, int):
-        return max_value > 0
-    elif isinstance(max_value, tuple):
-        return all(v > 0.0 for v in max_value)
+    Returns:
+        bytes: a fixed size header followed by the raw samples
+    """
+    prefix = WIRE_HEADER.pack(
+        WIRE_MAGIC,
+        WIRE_VERSION,
+        header.encode("ascii"),
+        buffer.typecode.encode("ascii"),
+        sys.byteorder == "little",
+        buffer.layout == "planar",
+        buffer.channels,
+        max_level,
+        buffer.width,
+        buffer.height,
+    )
+    return b"".join((prefix, buffer.data))
+
+
+def decode_image(data: Any) -> Dict[str, Any]:
+    """Reads an image serialized by `encode_image`
+
+    The pixel buffer is a view over `data`, no sample is copied.
+
+    Args:
+        - data (Any): any bytes-like object
+
+    Raises:
+        InvalidFileError: If the data is not in the wire format, or its raster is incomplete
+
+    Returns:
+        Dict[str, Any]: `header`, `dimensions`, `max_level` and the pixel `buffer`
+    """
+    view = memoryview(data).cast("B")
+    if len(view) < WIRE_HEADER.size:
+        raise InvalidFileError("Data is too short to hold an image")
+    fields = WIRE_HEADER.unpack_from(view)
+    magic, version, header, typecode, little, planar = fields[:6]
+    channels, max_level, width, height = fields[6:]
+    if magic != WIRE_MAGIC or version != WIRE_VERSION:
+        raise InvalidFileError(f"Unknown image format {magic!r} version {version}")
+    buffer = raster_buffer(
+        view[WIRE_HEADER.size :],
+        width,
+        height,
+        channels,
+        typecode.decode("ascii"),
+        "planar" if planar else "interleaved",
+        "little" if little else "big",
+    )
+    return {
+        "header": header.decode("ascii"),
+        "dimensions": (width, height),
+        "max_level": max_level,
+        "buffer": buffer,
+    }
+
+
+@contextmanager
+def replacing_file(filepath: str) -> Iterator[BinaryIO]:
+    """Opens a new file next to `filepath`, moved over it when the block exits
+
+    The destination keeps its old contents until the new ones are complete:
+    an image memory mapped from it, or a stream still reading it, keeps
+    reading the old file, and an error leaves it untouched. The temporary
+    names are unique, so concurrent writers never share one.
+
+    Args:
+        - filepath (str): the file to write
+
+    Yields:
+        Iterator[BinaryIO]: the temporary file, opened for binary writing
+    """
+    directory, name = os.path.split(filepath)
+    temporary = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temporary, "xb") as f:
+            yield f
+        os.replace(temporary, filepath)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+class NetpbmWriter:
+    def __init__(
+        self,
+        stream: BinaryIO,
+        header: str,
+        width: int,
+        height: int,
+        max_level: int,
+        block_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        """Streams a Netpbm image into a binary stream, one row at a time
+
+        Encoded rows are accumulated in a reusable buffer that is flushed to the
+        stream every `block_size` bytes, so the memory needed does not depend on
+        the image size. ASCII lines are kept under 70 characters, binary
+        samples take two big-endian bytes when `max_level` is above 255 and
+        P4 rows are bit packed (any non-zero sample is a set bit).
+
+        Args:
+            - stream (BinaryIO): destination, opened in binary mode
+            - header (str): output format, P1 to P6
+            - width (int): image width
+            - height (int): image height
+            - max_level (int): maximum sample value
+            - block_size (int, optional): bytes buffered before each write. Defaults to DEFAULT_CHUNK_SIZE.
+
+        Raises:
+            InvalidHeaderError: If the header is not a Netpbm header
+        """
+        if header not in ASCII_HEADERS + BINARY_HEADERS:
+            raise InvalidHeaderError(f"Header {header} is not allowed or invalid")
+        self.header = header
+        self.width = width
+        self.height = height
+        self.max_level = max_level
+        self.block_size = block_size
+        self.bytes_written = 0
+        self.rows_written = 0
+        self._stream = stream
+        self._block = bytearray()
+        self._typecode = typecode_for(max_level)
+        if header in ASCII_HEADERS:
+            # text for every sample value, and how many fit in a 70 characters line
+            limit = 255 if self._typecode == "B" else MAX_SAMPLE_VALUE
+            self._tokens = [str(v).encode("ascii") for v in range(limit + 1)]
+            self._per_line = (ASCII_LINE_LIMIT + 1) // (len(str(limit)) + 1)
+        self._block += f"{header}\n{width} {height}\n".encode("ascii")
+        if header not in BITMAP_HEADERS:
+            self._block += f"{max_level}\n".encode("ascii")
+
+    def write_row(self, row: Sequence[int]) -> None:
+        """Encodes one row of samples (channels interleaved)"""
+        if self.header in ASCII_HEADERS:
+            tokens = self._tokens
+            for start in range(0, len(row), self._per_line):
+                line = row[start : start + self._per_line]
+                self._block += b" ".join(map(tokens.__getitem__, line))
+                self._block += b"\n"
+        elif self.header == "P4":
+            self._block += _pack_bits(row)
+        else:
+            if not isinstance(row, array) or row.typecode != self._typecode:
+                row = array(self._typecode, row)
+            if row.itemsize > 1 and sys.byteorder == "little":
+                row = row[:]
+                row.byteswap()
+            self._block += row
+        self.rows_written += 1
+        if len(self._block) >= self.block_size:
+            self.flush()
+
+    def write_rows(self, rows: Iterable[Sequence[int]]) -> None:
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self) -> None:
+        """Writes the buffered bytes into the stream"""
+        self._stream.write(self._block)
+        self.bytes_written += len(self._block)
+        self._block.clear()
+
+    def close(self) -> int:
+        """Flushes the remaining bytes
+
+        Raises:
+            InvalidFileError: If the amount of rows written does not match the height
+
+        Returns:
+            int: the amount of bytes written
+        """
+        self.flush()
+        if self.rows_written != self.height:
+            raise InvalidFileError(
+                f"Non-matching amount of rows written, should have {self.height} rows, found {self.rows_written}"
+            )
+        return self.bytes_written
+
+    def __enter__(self) -> "NetpbmWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.close()
+
+
+def _pack_bits(row: Sequence[int]) -> bytes:
+    # every non-zero sample is written as a set bit, rows are padded to a full byte
+    if not isinstance(row, (array, memoryview)) or row.itemsize != 1:
+        row = bytes(1 if v else 0 for v in row)
+    row_bytes = (len(row) + 7) // 8
+    bits = bytes(row).translate(_BIT_CHARS) + b"0" * (row_bytes * 8 - len(row))
+    return int(bits, 2).to_bytes(row_bytes, "big")
+
+
+def _strip_comments(data: bytes) -> Tuple[bytes, bool]:
+    """Replaces every complete `#` comment by a space
+
+    Returns:
+        Tuple[bytes, bool]: the data without comments, and True if it ends
+        inside a comment that continues in the next chunk
+    """
+    parts = []
+    position = 0
+    while True:
+        start = data.find(b"#", position)
+        if start == -1:
+            parts.append(data[position:])
+            return b" ".join(parts), False
+        parts.append(data[position:start])
+        end = _find_line_end(data, start)
+        if end == -1:
+            return b" ".join(parts), True
+        position = end
+
+
+def _find_line_end(data: bytes, start: int = 0) -> int:
+    ends = [i for i in (data.find(b"\n", start), data.find(b"\r", start)) if i != -1]
+    return min(ends) if ends else -1
+
+
+def iter_tokens(
+    stream: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Lazily splits a Netpbm file into whitespace separated tokens
+
+    The stream is read in chunks of `chunk_size` bytes, so at most one chunk
+    (plus a token split between two chunks) is held in memory. Comments,
+    from `#` up to the end of the line, are skipped.
+
+    Args:
+        - stream (BinaryIO): file opened in binary mode
+        - chunk_size (int, optional): bytes read at a time. Defaults to DEFAULT_CHUNK_SIZE.
+
+    Yields:
+        Iterator[bytes]: each token of the file
+    """
+    pending = b""
+    in_comment = False
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if in_comment:
+            end = _find_line_end(chunk)
+            if end == -1:
+                continue
+            chunk, in_comment = chunk[end:], False
+        data = pending + chunk
+        if b"#" in data:
+            data, in_comment = _strip_comments(data)
+        tokens = data.split()
+        pending = b""
+        # the last token may continue in the next chunk
+        if tokens and not in_comment and data[-1:] not in _WHITESPACE:
+            pending = tokens.pop()
+        yield from tokens
+    if pending:
+        yield pending
+
+
+def _as_text(token: Any) -> str:
+    if isinstance(token, bytes):
+        return token.decode("ascii", errors="replace")
+    return str(token)
+
+
+def _next_header_value(tokens: Iterator[Any], name: str) -> int:
+    token = next(tokens, None)
+    if token is None:
+        raise InvalidFileError(f"Missing {name} value in file contents")
+    return _parse_header_value(token, name)
+
+
+def _bitmap_samples(tokens: Iterator[Any]) -> Iterator[Any]:
+    # P1 does not require whitespace between samples, "0110" holds 4 of them
+    for token in tokens:
+        if len(token) == 1:
+            yield token
+        else:
+            yield from _as_text(token)
+
+
+def _parse_token_header(tokens: Iterator[Any]) -> Tuple[Dict[str, Any], Iterator[Any]]:
+    """Parses the header values of an ASCII Netpbm image from its tokens
+
+    Returns:
+        Tuple[Dict[str, Any], Iterator[Any]]: `header`, `dimensions` and
+        `max_level`, and the iterator over the sample tokens
+    """
+    first_token = next(tokens, None)
+    if first_token is None:
+        raise ValueError("Cannot parse empty file contents")
+    header = _as_text(first_token)
+    if header not in ASCII_HEADERS:
+        raise InvalidHeaderError(f"Header {header} is not allowed or invalid")
+    x = _next_header_value(tokens, "width")
+    y = _next_header_value(tokens, "height")
+    if header in BITMAP_HEADERS:
+        max_level = 1
+        tokens = _bitmap_samples(tokens)
     else:
-        raise TypeError(
-            f"max_level can only be represented by an integer or a triple of integer (int, int, int), found {type(max_value)}"
+        max_level = _next_header_value(tokens, "max_level")
+        if max_level > MAX_SAMPLE_VALUE:
+            raise InvalidConfigsError(
+                f"max_level cannot be above {MAX_SAMPLE_VALUE}, found {max_level=}"
+            )
+    return {"header": header, "dimensions": (x, y), "max_level": max_level}, tokens
+
+
+def _iter_token_rows(
+    tokens: Iterator[Any], header: str, x: int, y: int, max_level: int
+) -> Iterator["array[int]"]:
+    """Converts the sample tokens into rows of samples, channels interleaved"""
+    row_length = x * channels_for(header)
+    typecode = typecode_for(max_level)
+    try:
+        for _ in range(y):
+            row = array(typecode, [int(token) for token in islice(tokens, row_length)])
+            if len(row) != row_length:
+                raise InvalidFileError(
+                    f"Non-matching amount of pixels found, should have {x * y} pixels"
+                )
+            yield row
+    except ValueError:
+        raise InvalidFileError("Found invalid values (non-numerical) in file contents")
+    except OverflowError:
+        raise InvalidFileError(f"Found values outside the [0, {max_level}] interval")
+    if next(tokens, None) is not None:
+        raise InvalidFileError(
+            f"Non-matching amount of pixels found, found more than {x * y} pixels"
         )
 
 
-def _extract_max_level(value_data: List[Pixel]) -> Tuple[Pixel, List[Pixel]]:
-    max_level, data = _extract_first_element(value_data)
-    if not _validate_max_value(max_level):
-        raise InvalidConfigsError(
-            f"max_level cannot be negative or zero, found {max_level=}"
-        )
-    return max_level, data
+def _parse_tokens(tokens: Iterator[Any]) -> Dict[str, Any]:
+    """Parses an ASCII Netpbm image from an iterator of tokens
+
+    The header values are read first, then the samples are converted row by
+    row straight into a `PixelBuffer`.
+    """
+    image_data, tokens = _parse_token_header(tokens)
+    header, max_level = image_data["header"], image_data["max_level"]
+    x, y = image_data["dimensions"]
+    data = array(typecode_for(max_level))
+    for row in _iter_token_rows(tokens, header, x, y, max_level):
+        data.extend(row)
+    image_data["buffer"] = PixelBuffer(x, y, channels_for(header), data.typecode, data)
+    return image_data
 
 
-def _parse_value_data_grayscale(value_data: List[int], x: int, y: int):
-    max_level, data = _extract_max_level(value_data)  # type: int, List[int]
-    _validate_data_length(data_length=len(data), desired_length=x * y)
-    pixel_data = _format_pixel_data(data, x)
-    pixel_matrix = _generate_pixel_matrix_grayscale(pixel_data, x, y)
-    return max_level, pixel_matrix
+def parse_ascii_file(
+    stream: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """Reads an ASCII (P1, P2 or P3) Netpbm file
 
+    The file is tokenized lazily (see `iter_tokens`), so the peak memory is the
+    final pixel buffer plus one read chunk.
+
+    Args:
+        - stream (BinaryIO): file opened in binary mode, positioned at its start
+        - chunk_size (int, optional): bytes read at a time. Defaults to DEFAULT_CHUNK_SIZE.
+
+    Returns:
+        Dict[str, Any]: `header`, `dimensions`, `max_level` and the pixel `buffer`
+    """
+    return _parse_tokens(iter_tokens(stream, chunk_size))
 
-def _parse_value_data_rgb(value_data: List[Tuple[int, int, int]], x: int, y: int):
-    max_level, data = _extract_max_level(
-        value_data
-    )  # type: Tuple[int, int, int], List[Tuple[int, int, int]]
-    _validate_data_length(data_length=len(data), desired_length=x * y)
-    pixel_data = _format_pixel_data(data, x)
-    pixel_matrix = _generate_pixel_matrix_rgb(pixel_data, x, y)
-    return max_level, pixel_matrix
 
+def read_rows(
+    stream: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Tuple[Dict[str, Any], Iterator["array[int]"]]:
+    """Reads a Netpbm header and lazily decodes the raster row by row
 
-def parse_file_contents(file_contents: List[str]) -> Dict[str, Any]:
+    Works for every format, only the header and the current row (or read
+    chunk, for ASCII files) are held in memory.
+
+    Args:
+        - stream (BinaryIO): file opened in binary mode, positioned at its start
+        - chunk_size (int, optional): bytes read at a time from ASCII files. Defaults to DEFAULT_CHUNK_SIZE.
+
+    Returns:
+        Tuple[Dict[str, Any], Iterator["array[int]"]]: `header`, `dimensions` and
+        `max_level`, and an iterator over the samples of each row (channels interleaved)
+    """
+    start = stream.tell()
+    magic = stream.read(2).decode("ascii", errors="replace")
+    stream.seek(start)
+    if magic in BINARY_HEADERS:
+        image_data = read_header(stream)
+        x, y = image_data["dimensions"]
+        rows = iter_binary_rows(stream, magic, x, y, image_data["max_level"])
+    else:
+        image_data, tokens = _parse_token_header(iter_tokens(stream, chunk_size))
+        x, y = image_data["dimensions"]
+        rows = _iter_token_rows(
+            tokens, image_data["header"], x, y, image_data["max_level"]
+        )
+    return image_data, rows
+
+
+def parse_file_contents(file_contents: Iterable[Any]) -> Dict[str, Any]:
     """Utility function to validate and parse file contents
 
-    Given the file contents as a list of strings, validates the data and raises
-    any errors. If no problems occur, returns the parsed data as a dictionary.
+    Given the file contents as tokens (e.g. the output of `get_split_strings`),
+    validates the data and raises any errors. If no problems occur, returns
+    the parsed data as a dictionary.
 
     Args:
-        - file_contents (List[str]): File contents as a list of strings
+        - file_contents (Iterable[Any]): File contents as strings (or bytes) tokens
 
     Raises:
         InvalidConfigsError: If the provide file has incorrect data (non matching pixels, for example)
         InvalidFileError: The provide file has invalid data (special characters for example)
 
     Returns:
-        Dict[str, Any]: [description]
-    """
-    header, contents = _extract_header(file_contents)  # type: str, List[str]
-    x, y, value_data = _extract_dimensions(contents)  # type: int, int, List[int]
-    if header in ("P1", "P2"):
-        max_level, pixel_data = _parse_value_data_grayscale(value_data, x, y)
-    elif header == "P3":
-        data_rbg = _convert_into_tuples(value_data)  # type: List[Tuple[int, int, int]]
-        max_level, pixel_data = _parse_value_data_rgb(data_rbg, x, y)
-    return {
-        "header": header,
-        "dimensions": (x, y),
-        "max_level": max_level,
-        "contents": pixel_data,
-    }
+        Dict[str, Any]: `header`, `dimensions`, `max_level` and the pixel `buffer`
+    """
+    return _parse_tokens(iter(file_contents))
@@ -1,9 +1,12 @@
 from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import Iterator
 from typing import List
 
 import pytest
 
+from simple_imaging.border import pad_plane
 from simple_imaging.image import Image
 from simple_imaging.types import GrayPixel
 
@@ -44,3 +47,54 @@ def expected_file_data(x: int, y: int) -> Dict[str, Any]:
         "max_level": 255,
         "contents": [[GrayPixel(1) for _ in range(x)] for _ in range(y)],
     }
+
+
+def sliding_window(
+    image: Image, size: int, channel: int = 0, mode: str = "extend"
+) -> Iterator[List[List[int]]]:
+    """Every `size x size` window of a channel, read sample by sample
+
+    The slow reference the window filters are checked against. With the
+    `extend` border mode out-of-range coordinates are replaced by the pivot
+    ones, other modes pad the plane first.
+    """
+    x, y = image.dimensions
+    offset = size // 2
+    span = 2 * offset + 1
+    plane = image._buffer.plane(channel)
+    if mode != "extend":
+        padded = pad_plane(plane, x, y, offset, mode)
+        padded_width = x + 2 * offset
+        for i in range(y):
+            rows = [
+                padded[(i + a) * padded_width : (i + a + 1) * padded_width]
+                for a in range(span)
+            ]
+            for j in range(x):
+                yield [list(row[j : j + span]) for row in rows]
+        return
+    shifts = range(-offset, offset + 1)
+    col_maps = [[j + g if 0 <= j + g < x else j for g in shifts] for j in range(x)]
+    for i in range(y):
+        row_starts = [(i + k if 0 <= i + k < y else i) * x for k in shifts]
+        for cols in col_maps:
+            yield [[plane[start + col] for col in cols] for start in row_starts]
+
+
+def window_filter(
+    image: Image,
+    size: int,
+    reducer: Callable[[List[List[int]]], int],
+    mode: str = "extend",
+) -> Image:
+    """A new image with each sample reduced from its window, see `sliding_window`"""
+    planes = [
+        [reducer(sw) for sw in sliding_window(image, size, c, mode)]
+        for c in range(image._buffer.channels)
+    ]
+    return Image(
+        header=image.header,
+        max_level=image.max_level,
+        dimensions=image.dimensions,
+        buffer=image._buffer.with_planes(planes),
+    )
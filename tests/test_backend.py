@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import random
+from typing import Callable
+
+import pytest
+
+from simple_imaging import backend
+from simple_imaging.image import Image
+from simple_imaging.image import read_file
+from simple_imaging.image import save_file
+from simple_imaging.kernels import Kernel
+from simple_imaging.types import GrayPixel
+from simple_imaging.types import RGBPixel
+
+np = pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def random_image() -> Image:
+    rng = random.Random(42)
+    pixel_values = [[GrayPixel(rng.randrange(256)) for _ in range(7)] for _ in range(5)]
+    return Image(header="P2", max_level=255, dimensions=(7, 5), contents=pixel_values)
+
+
+@pytest.fixture
+def random_rgb_image() -> Image:
+    rng = random.Random(7)
+    pixel_values = [
+        [RGBPixel(*(rng.randrange(256) for _ in range(3))) for _ in range(4)]
+        for _ in range(6)
+    ]
+    return Image(header="P3", max_level=255, dimensions=(4, 6), contents=pixel_values)
+
+
+@pytest.fixture
+def python_backend():
+    backend.use_numpy(False)
+    yield
+    backend.use_numpy(True)
+
+
+def run_both_backends(
+    image: Image, operation: Callable[[Image], Image]
+) -> tuple[Image, Image]:
+    backend.use_numpy(True)
+    vectorized = operation(image.copy_current_image())
+    backend.use_numpy(False)
+    try:
+        pure_python = operation(image.copy_current_image())
+    finally:
+        backend.use_numpy(True)
+    return vectorized, pure_python
+
+
+OPERATIONS = [
+    pytest.param(lambda img: img.negative(), id="negative"),
+    pytest.param(lambda img: img.darken(40), id="darken"),
+    pytest.param(lambda img: img.lighten(40), id="lighten"),
+    pytest.param(lambda img: img.multiply_image(1.5), id="multiply"),
+    pytest.param(lambda img: img.gamma_transformation(0.4, c=1.1), id="gamma"),
+    pytest.param(lambda img: img.binarization(128), id="binarization"),
+    pytest.param(lambda img: img.highlight_band((50, 150), 255), id="highlight_band"),
+    pytest.param(lambda img: img.average_filter(5), id="average_filter"),
+    pytest.param(lambda img: img.average_filter(31), id="average_filter_large"),
+    pytest.param(lambda img: img.median_filter(5), id="median_filter"),
+    pytest.param(lambda img: img.median_filter(4), id="median_filter_even"),
+    pytest.param(lambda img: img.laplacian_filter(), id="laplacian_filter"),
+    pytest.param(lambda img: img._kernel_filter("gaussian_blur"), id="gaussian_blur"),
+    pytest.param(lambda img: img._kernel_filter("box_blur"), id="box_blur"),
+    pytest.param(
+        lambda img: img._kernel_filter(Kernel.gaussian(radius=4)), id="large_gaussian"
+    ),
+    pytest.param(
+        lambda img: img._kernel_filter(
+            Kernel([[i - j for j in range(5)] for i in range(5)])
+        ),
+        id="large_kernel",
+    ),
+    pytest.param(lambda img: img.high_boost_filter(k=2), id="high_boost_filter"),
+    pytest.param(
+        lambda img: img.high_boost_filter(k=0.7, blur="box", kernel=5),
+        id="high_boost_filter_box",
+    ),
+    pytest.param(
+        lambda img: img.high_boost_filter(k=1.5, blur="gaussian", kernel=7),
+        id="high_boost_filter_gaussian",
+    ),
+    pytest.param(lambda img: img.histogram_equalization(), id="histogram_equalization"),
+]
+
+
+@pytest.mark.parametrize("operation", OPERATIONS)
+def test_numpy_backend_matches_pure_python(random_image, operation):
+    vectorized, pure_python = run_both_backends(random_image, operation)
+    assert list(vectorized._buffer.data) == list(pure_python._buffer.data)
+
+
+@pytest.mark.parametrize("operation", OPERATIONS)
+def test_numpy_backend_matches_pure_python_on_rgb(random_rgb_image, operation):
+    vectorized, pure_python = run_both_backends(random_rgb_image, operation)
+    assert list(vectorized._buffer.data) == list(pure_python._buffer.data)
+
+
+def test_image_arithmetic_matches_pure_python(random_image):
+    other = random_image.copy_current_image().negative()
+    for name in ("add_image", "subtract_image"):
+        vectorized, pure_python = run_both_backends(
+            random_image, lambda img: getattr(img, name)(other)
+        )
+        assert list(vectorized._buffer.data) == list(pure_python._buffer.data)
+
+
+def test_ndarray_is_a_view_over_the_image_pixels(random_image):
+    array_view = random_image.ndarray
+    assert array_view.shape == (5, 7)
+    array_view[0, 3] = 17
+    assert random_image.get_pixel(4, 1).value == 17
+
+
+def test_rgb_ndarray_has_a_channel_axis(random_rgb_image):
+    assert random_rgb_image.ndarray.shape == (6, 4, 3)
+
+
+def test_pure_python_backend_can_be_selected(python_backend):
+    assert backend.numpy_enabled() is False
+
+
+def test_median_filter_in_bands_matches_pure_python(random_image, monkeypatch):
+    monkeypatch.setattr(backend, "MEDIAN_BAND_SAMPLES", 1)
+    vectorized, pure_python = run_both_backends(
+        random_image, lambda img: img.median_filter(3)
+    )
+    assert vectorized.values == pure_python.values
+
+
+@pytest.mark.parametrize("mode", ["replicate", "reflect", "wrap", "constant"])
+@pytest.mark.parametrize(
+    "operation",
+    [
+        lambda img, mode: img.average_filter(5, mode=mode),
+        lambda img, mode: img.median_filter(5, mode=mode),
+        lambda img, mode: img._kernel_filter("gaussian_blur", mode=mode),
+        lambda img, mode: img._kernel_filter("laplace", mode=mode),
+    ],
+)
+def test_border_modes_match_pure_python(random_rgb_image, operation, mode):
+    vectorized, pure_python = run_both_backends(
+        random_rgb_image, lambda img: operation(img, mode)
+    )
+    assert vectorized.values == pure_python.values
+
+
+def test_ndarray_of_a_memory_mapped_image_is_writable(random_image, tmp_path):
+    filepath = str(tmp_path / "image.pgm")
+    save_file(filepath, random_image, header="P5")
+    mapped = read_file(filepath, mmap=True)
+    array_view = mapped.ndarray
+    array_view[0, 3] = 17
+    assert mapped.get_pixel(4, 1) == GrayPixel(17)
+    assert read_file(filepath).get_pixel(4, 1) == random_image.get_pixel(4, 1)
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from simple_imaging import backend
+from simple_imaging.border import border_index
+from simple_imaging.border import BORDER_MODES
+from simple_imaging.border import pad_plane
+from simple_imaging.errors import ValidationError
+from simple_imaging.image import Image
+from simple_imaging.kernels import Kernel
+from simple_imaging.types import GrayPixel
+
+from .fixtures import window_filter
+
+
+@pytest.fixture
+def noisy_image() -> Image:
+    rng = random.Random(13)
+    pixel_values = [[GrayPixel(rng.randrange(256)) for _ in range(6)] for _ in range(5)]
+    return Image(header="P2", max_level=255, dimensions=(6, 5), contents=pixel_values)
+
+
+@pytest.fixture
+def python_backend():
+    backend.use_numpy(False)
+    yield
+    backend.use_numpy(backend.numpy_available())
+
+
+@pytest.mark.parametrize(
+    "mode, expected",
+    [
+        ("replicate", [0, 0, 0, 1, 2, 3, 4, 4, 4]),
+        ("reflect", [2, 1, 0, 1, 2, 3, 4, 3, 2]),
+        ("wrap", [3, 4, 0, 1, 2, 3, 4, 0, 1]),
+        ("constant", [-1, -1, 0, 1, 2, 3, 4, -1, -1]),
+    ],
+)
+def test_border_index_per_mode(mode, expected):
+    assert [border_index(c, 5, mode) for c in range(-2, 7)] == expected
+
+
+def test_reflect_handles_windows_larger_than_the_image():
+    assert [border_index(c, 2, "reflect") for c in range(-3, 5)] == [
+        1,
+        0,
+        1,
+        0,
+        1,
+        0,
+        1,
+        0,
+    ]
+
+
+def test_constant_padding_is_zero():
+    padded = pad_plane(
+        Image("P2", 255, (1, 1), [[GrayPixel(9)]])._buffer.data, 1, 1, 1, "constant"
+    )
+    assert list(padded) == [0, 0, 0, 0, 9, 0, 0, 0, 0]
+
+
+def window_sum(sw: list[list[int]]) -> int:
+    return sum(v for line in sw for v in line)
+
+
+@pytest.mark.parametrize("mode", BORDER_MODES)
+@pytest.mark.parametrize("kernel", [3, 5, 9])
+def test_filters_match_sliding_window_for_every_mode(
+    noisy_image, python_backend, mode, kernel
+):
+    area = kernel * kernel
+    expected = window_filter(
+        noisy_image, kernel, lambda sw: min(255, round(window_sum(sw) / area)), mode
+    )
+    assert noisy_image.average_filter(kernel, False, mode).values == expected.values
+
+    def median(sw: list[list[int]]) -> int:
+        return sorted(v for line in sw for v in line)[area // 2]
+
+    expected = window_filter(noisy_image, kernel, median, mode)
+    assert noisy_image.median_filter(kernel, False, mode).values == expected.values
+
+    box = Kernel([[1] * kernel] * kernel)
+    expected = window_filter(
+        noisy_image, kernel, lambda sw: min(255, window_sum(sw)), mode
+    )
+    assert noisy_image._kernel_filter(box, False, mode).values == expected.values
+
+
+def test_raises_validation_exception_on_unknown_mode(noisy_image):
+    with pytest.raises(ValidationError):
+        noisy_image.median_filter(3, mode="mirror")
@@ -0,0 +1,69 @@
+from array import array
+
+import pytest
+
+from simple_imaging.buffer import PixelBuffer
+from simple_imaging.buffer import PixelMatrix
+from simple_imaging.buffer import typecode_for
+from simple_imaging.errors import ValidationError
+from simple_imaging.types import GrayPixel
+from simple_imaging.types import RGBPixel
+
+
+@pytest.fixture
+def rgb_pixels():
+    return [[RGBPixel(3 * j + i, 10 + i, 20 + j) for i in range(3)] for j in range(2)]
+
+
+@pytest.mark.parametrize(
+    "max_level, typecode", [(1, "B"), (255, "B"), (256, "H"), (65535, "H")]
+)
+def test_typecode_is_picked_from_max_level(max_level, typecode):
+    assert typecode_for(max_level) == typecode
+
+
+def test_raises_validationerror_on_unknown_layout():
+    with pytest.raises(ValidationError):
+        PixelBuffer(1, 1, layout="diagonal")
+
+
+def test_raises_validationerror_on_non_matching_data():
+    with pytest.raises(ValidationError):
+        PixelBuffer(2, 2, data=array("B", [0, 0, 0]))
+
+
+def test_grayscale_pixels_are_stored_row_after_row():
+    pixels = [[GrayPixel(3 * j + i) for i in range(3)] for j in range(2)]
+    buffer = PixelBuffer.from_pixels(pixels, 3, 2)
+    assert list(buffer.data) == [0, 1, 2, 3, 4, 5]
+    assert buffer.get(1, 0) == 3
+
+
+@pytest.mark.parametrize("layout", ["interleaved", "planar"])
+def test_rgb_layouts_hold_the_same_pixels(rgb_pixels, layout):
+    buffer = PixelBuffer.from_pixels(rgb_pixels, 3, 2, channels=3, layout=layout)
+    assert buffer.layout == layout
+    assert buffer.get(1, 2) == (5, 12, 21)
+    assert list(buffer.plane(1)) == [10, 11, 12, 10, 11, 12]
+
+
+def test_planar_layout_stores_one_channel_after_the_other(rgb_pixels):
+    buffer = PixelBuffer.from_pixels(rgb_pixels, 3, 2, channels=3, layout="planar")
+    assert list(buffer.data[:6]) == [0, 1, 2, 3, 4, 5]
+
+
+def test_matrix_view_writes_through_to_the_buffer(rgb_pixels):
+    buffer = PixelBuffer.from_pixels(rgb_pixels, 3, 2, channels=3)
+    matrix = PixelMatrix(buffer)
+    matrix[0][1] = RGBPixel(7, 8, 9)
+    assert buffer.get(0, 1) == (7, 8, 9)
+    assert matrix == [
+        [RGBPixel(0, 10, 20), RGBPixel(7, 8, 9), RGBPixel(2, 12, 20)],
+        [RGBPixel(3, 10, 21), RGBPixel(4, 11, 21), RGBPixel(5, 12, 21)],
+    ]
+
+
+def test_sixteen_bit_buffer_holds_values_above_255():
+    buffer = PixelBuffer(2, 1, typecode="H")
+    buffer.set(0, 1, 4095)
+    assert list(buffer.data) == [0, 4095]
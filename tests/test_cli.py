@@ -0,0 +1,150 @@
+import os
+import random
+import subprocess
+import sys
+from array import array
+
+import pytest
+
+from simple_imaging.buffer import PixelBuffer
+from simple_imaging.cli import find_inputs
+from simple_imaging.cli import main
+from simple_imaging.cli import parse_operation
+from simple_imaging.errors import ValidationError
+from simple_imaging.image import Image
+from simple_imaging.image import read_file
+from simple_imaging.image import save_file
+
+
+def random_image(header: str, seed: int) -> Image:
+    rng = random.Random(seed)
+    channels = 3 if header in ("P3", "P6") else 1
+    data = array("B", [rng.randrange(256) for _ in range(8 * 5 * channels)])
+    buffer = PixelBuffer(8, 5, channels, data=data)
+    return Image(header=header, max_level=255, dimensions=(8, 5), buffer=buffer)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    source = tmp_path / "in"
+    (source / "nested").mkdir(parents=True)
+    save_file(str(source / "a.pgm"), random_image("P5", 1))
+    save_file(str(source / "nested" / "b.ppm"), random_image("P6", 2))
+    (source / "notes.txt").write_text("not an image")
+    return source
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("median:5", ("median_filter", (5,), {})),
+        ("gamma:0.6", ("gamma_transformation", (0.6,), {})),
+        ("negative", ("negative", (), {})),
+        ("median:5,mode=reflect", ("median_filter", (5,), {"mode": "reflect"})),
+        ("rotate_90:clockwise=false", ("rotate_90", (), {"clockwise": False})),
+    ],
+)
+def test_parse_operation(spec, expected):
+    assert parse_operation(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["blur:3", "add_image", "lazy"])
+def test_parse_operation_rejects_unknown_operations(spec):
+    with pytest.raises(ValidationError):
+        parse_operation(spec)
+
+
+def test_inputs_keep_their_relative_paths(tree):
+    found = find_inputs(
+        [str(tree), str(tree / "nested" / "*.ppm"), str(tree / "a.pgm")]
+    )
+    assert found == [
+        (str(tree / "a.pgm"), "a.pgm"),
+        (str(tree / "nested" / "b.ppm"), os.path.join("nested", "b.ppm")),
+    ]
+    pattern = str(tree / "**" / "*.p?m")
+    assert sorted(relative for _, relative in find_inputs([pattern])) == [
+        "a.pgm",
+        os.path.join("nested", "b.ppm"),
+    ]
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_batch_mirrors_the_input_tree(tree, tmp_path, capsys, workers):
+    output = tmp_path / "out"
+    status = main(
+        [
+            str(tree),
+            "--op",
+            "median:3",
+            "--op",
+            "gamma:0.6",
+            "-o",
+            str(output),
+            "-j",
+            workers,
+        ]
+    )
+    assert status == 0
+    for relative in ("a.pgm", os.path.join("nested", "b.ppm")):
+        expected = read_file(str(tree / relative))
+        expected.median_filter(3).gamma_transformation(0.6)
+        assert read_file(str(output / relative)).values == expected.values
+    printed = capsys.readouterr().out
+    assert "2 images" in printed
+    assert "MB/s" in printed and "images/s" in printed
+
+
+def test_batch_reports_failures(tree, tmp_path, capsys):
+    (tree / "broken.pgm").write_bytes(b"P5\n")
+    status = main(
+        [str(tree), "--op", "negative", "-o", str(tmp_path / "out"), "-j", "1"]
+    )
+    assert status == 1
+    captured = capsys.readouterr()
+    assert "broken.pgm: failed" in captured.err
+    assert "2 images" in captured.out and "1 failed" in captured.out
+
+
+def test_batch_converts_formats(tree, tmp_path):
+    output = tmp_path / "out"
+    main([str(tree / "a.pgm"), "--header", "P2", "-o", str(output), "-j", "1"])
+    assert read_file(str(output / "a.pgm")).header == "P2"
+
+
+@pytest.mark.parametrize(
+    "argv", [["missing/*.pgm"], ["x.pgm", "-j", "0"], ["x.pgm", "--op", "blur"]]
+)
+def test_batch_rejects_invalid_arguments(argv):
+    with pytest.raises(SystemExit):
+        main(argv)
+
+
+def test_batch_rejects_inputs_sharing_an_output(tree, tmp_path, capsys):
+    other = tmp_path / "other"
+    other.mkdir()
+    save_file(str(other / "a.pgm"), random_image("P5", 3))
+    with pytest.raises(SystemExit):
+        main([str(tree), str(other), "-o", str(tmp_path / "out")])
+    assert "same output" in capsys.readouterr().err
+    assert not (tmp_path / "out").exists()
+
+
+def test_batch_never_overwrites_its_inputs(tree, capsys):
+    original = read_file(str(tree / "a.pgm")).values
+    status = main([str(tree / "a.pgm"), "--op", "negative", "-o", str(tree)])
+    assert status == 1
+    assert "would overwrite the input" in capsys.readouterr().err
+    assert read_file(str(tree / "a.pgm")).values == original
+
+
+def test_cli_module_runs_as_a_script(tree, tmp_path):
+    output = tmp_path / "out"
+    completed = subprocess.run(
+        [sys.executable, "-m", "simple_imaging.cli", str(tree), "-o", str(output)],
+        capture_output=True,
+        # the package is importable from the repository root
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    assert completed.returncode == 0
+    assert (output / "nested" / "b.ppm").exists()
@@ -1,14 +1,28 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+from typing import Any
+
 import pytest
 
+from simple_imaging import backend
+from simple_imaging.border import pad_plane
 from simple_imaging.errors import ImcompatibleImages
 from simple_imaging.errors import ValidationError
+from simple_imaging.image import _calculate_frequencies
+from simple_imaging.image import _generate_equalized_map
 from simple_imaging.image import extract_channels
 from simple_imaging.image import Image
 from simple_imaging.image import merge_channels
+from simple_imaging.image import read_file
+from simple_imaging.image import save_file
 from simple_imaging.image import validate_image_compatibility
 from simple_imaging.types import GrayPixel
 from simple_imaging.types import RGBPixel
 
+from .fixtures import window_filter
+
 INVALID_LEVEL_TYPE_LIST = ["a", [], 0.01, {}, object]
 
 
@@ -263,8 +277,448 @@ def test_cannot_extract_histogram_from_rgb_image(p3_image):
         p3_image.get_histogram()
 
 
+def test_histogram_counts_each_channel(p3_image):
+    assert [list(h[:4]) for h in p3_image.histograms()] == [
+        [9, 0, 0, 0],
+        [0, 9, 0, 0],
+        [0, 0, 9, 0],
+    ]
+    assert len(p3_image.histogram(2)) == 256
+    assert p3_image.histogram(2).typecode == "Q"
+
+
+def test_histogram_is_cached_until_pixels_change(p2_image):
+    histogram = p2_image.histogram()
+    assert p2_image.histogram() is histogram
+    p2_image.set_pixel(1, 1, GrayPixel(5))
+    assert p2_image.histogram()[5] == 2
+    p2_image.darken(1)
+    assert p2_image.histogram()[4] == 2
+    p2_image.max_level = 8
+    assert len(p2_image.histogram()) == 9
+
+
+def test_histogram_equalization_equalizes_each_channel(noisy_image):
+    channels = [noisy_image.copy_current_image() for _ in range(3)]
+    rgb = merge_channels([channels[0], channels[1].negative(), channels[2].darken(9)])
+    result = extract_channels(rgb.histogram_equalization(inplace=False))
+    expected = extract_channels(rgb)
+    for channel, image in zip(result, expected):
+        assert channel.values == image.histogram_equalization().values
+
+
 def test_can_realize_grayscale_layering(p2_image):
     img = p2_image.copy_current_image()
     img.grayscale_slicing(level=8)
 
     assert False
+
+
+@pytest.fixture
+def wide_image() -> Image:
+    pixel_values = [[GrayPixel(3 * j + i) for i in range(3)] for j in range(2)]
+    return Image(header="P2", max_level=255, dimensions=(3, 2), contents=pixel_values)
+
+
+def test_get_pixel_uses_column_and_row_coordinates(wide_image):
+    assert wide_image.get_pixel(3, 1).value == 2
+    assert wide_image.get_pixel(1, 2).value == 3
+
+
+@pytest.mark.parametrize(
+    "operation, expected",
+    [
+        ("rotate_180", [[5, 4, 3], [2, 1, 0]]),
+        ("vertical_mirror", [[2, 1, 0], [5, 4, 3]]),
+        ("horizontal_mirror", [[3, 4, 5], [0, 1, 2]]),
+    ],
+)
+def test_geometric_operations_respect_non_square_images(
+    wide_image, operation, expected
+):
+    getattr(wide_image, operation)()
+    assert [[p.value for p in row] for row in wide_image.values] == expected
+
+
+@pytest.mark.parametrize(
+    "operation, kwargs, expected",
+    [
+        ("rotate_90", {}, [[3, 0], [4, 1], [5, 2]]),
+        ("rotate_90", {"clockwise": False}, [[2, 5], [1, 4], [0, 3]]),
+        ("rotate_270", {}, [[2, 5], [1, 4], [0, 3]]),
+    ],
+)
+def test_quarter_rotations_swap_image_dimensions(
+    wide_image, operation, kwargs, expected
+):
+    getattr(wide_image, operation)(**kwargs)
+    assert wide_image.dimensions == (2, 3)
+    assert [[p.value for p in row] for row in wide_image.values] == expected
+    assert wide_image.get_pixel(1, 1).value == expected[0][0]
+
+
+def test_can_multiply_image(p2_image):
+    p2_image.multiply_image(2)
+    assert [p.value for row in p2_image.values for p in row] == [
+        0,
+        2,
+        4,
+        6,
+        8,
+        10,
+        12,
+        14,
+        16,
+    ]
+
+
+def test_extracted_channels_keep_channel_order():
+    pixel_values = [[RGBPixel(1, 2, 3)]]
+    img = Image(header="P3", max_level=255, dimensions=(1, 1), contents=pixel_values)
+    img_r, img_g, img_b = extract_channels(img)
+    assert (img_r.values[0][0], img_g.values[0][0], img_b.values[0][0]) == (
+        GrayPixel(1),
+        GrayPixel(2),
+        GrayPixel(3),
+    )
+
+
+def test_filters_are_applied_to_each_rgb_channel():
+    pixel_values = [[RGBPixel(9 * i, 0, 255) for i in range(3)] for _ in range(3)]
+    img = Image(header="P3", max_level=255, dimensions=(3, 3), contents=pixel_values)
+    img.average_filter(kernel=3)
+    assert img.get_pixel(2, 2) == RGBPixel(9, 0, 255)
+
+
+@pytest.fixture
+def mapped_image(tmp_path: Path) -> Image:
+    pixel_values = [[GrayPixel(10 * (3 * j + i)) for i in range(3)] for j in range(2)]
+    image = Image(header="P5", max_level=255, dimensions=(3, 2), contents=pixel_values)
+    filepath = tmp_path / "image.pgm"
+    save_file(str(filepath), image)
+    return Image.from_file(str(filepath), mmap=True)
+
+
+def test_memory_mapped_image_is_backed_by_the_file(mapped_image):
+    assert mapped_image._buffer.readonly
+    assert mapped_image.get_pixel(2, 2).value == 40
+    assert mapped_image.get_histogram()["50"] == 1
+
+
+def test_memory_mapped_image_copies_on_write(mapped_image, tmp_path):
+    mapped_image.set_pixel(1, 1, GrayPixel(255))
+    assert not mapped_image._buffer.readonly
+    assert read_file(str(tmp_path / "image.pgm")).get_pixel(1, 1) == GrayPixel(0)
+    assert mapped_image.get_pixel(1, 1).value == 255
+
+
+def test_memory_mapped_image_can_be_processed(mapped_image):
+    result = mapped_image.lighten(5, inplace=False)
+    assert [p.value for row in result.values for p in row] == [5, 15, 25, 35, 45, 55]
+
+
+def test_memory_mapped_image_can_be_saved_in_another_format(mapped_image, tmp_path):
+    filepath = tmp_path / "image_ascii.pgm"
+    save_file(str(filepath), mapped_image, header="P2")
+    assert read_file(str(filepath)).values == mapped_image.values
+
+
+def test_memory_mapped_image_can_be_saved_over_its_file(mapped_image, tmp_path):
+    filepath = tmp_path / "image.pgm"
+    save_file(str(filepath), mapped_image.lighten(5, inplace=False))
+    save_file(str(filepath), mapped_image.lazy().lighten(1))
+    assert list(read_file(str(filepath))._buffer.data) == [1, 11, 21, 31, 41, 51]
+    assert mapped_image.get_pixel(3, 2).value == 50
+    assert [path.name for path in tmp_path.iterdir()] == ["image.pgm"]
+
+
+@pytest.fixture
+def noisy_image() -> Image:
+    rng = random.Random(3)
+    pixel_values = [
+        [GrayPixel(rng.randrange(256)) for _ in range(11)] for _ in range(8)
+    ]
+    return Image(header="P2", max_level=255, dimensions=(11, 8), contents=pixel_values)
+
+
+@pytest.mark.parametrize("kernel", [1, 3, 5, 7, 31])
+def test_average_filter_matches_sliding_window_average(noisy_image, kernel):
+    area = kernel * kernel
+    expected = window_filter(
+        noisy_image,
+        kernel,
+        lambda sw: min(255, round(sum(v for line in sw for v in line) / area)),
+    )
+    backend.use_numpy(False)
+    try:
+        result = noisy_image.average_filter(kernel, inplace=False)
+    finally:
+        backend.use_numpy(backend.numpy_available())
+    assert result.values == expected.values
+
+
+@pytest.mark.parametrize("numpy", [False, True])
+@pytest.mark.parametrize("kernel", [2, 4, 6])
+def test_even_average_filter_keeps_flat_images_flat(numpy, kernel):
+    if numpy and not backend.numpy_available():
+        pytest.skip("numpy is not installed")
+    contents = [[GrayPixel(100) for _ in range(9)] for _ in range(7)]
+    image = Image(header="P2", max_level=255, dimensions=(9, 7), contents=contents)
+    backend.use_numpy(numpy)
+    try:
+        result = image.average_filter(kernel, inplace=False)
+    finally:
+        backend.use_numpy(backend.numpy_available())
+    assert set(result._buffer.data) == {100}
+
+
+@pytest.mark.parametrize("blur", ["median", "box"])
+@pytest.mark.parametrize("k", [1, 2.5])
+def test_high_boost_filter_adds_the_scaled_mask(noisy_image, blur, k):
+    def boost(sw: list[list[int]]) -> int:
+        pivot = sw[1][1]
+        values = sorted(v for line in sw for v in line)
+        blurred = values[4] if blur == "median" else sum(values) / 9
+        return max(0, min(255, round(pivot + k * (pivot - blurred))))
+
+    expected = window_filter(noisy_image, 3, boost)
+    backend.use_numpy(False)
+    try:
+        result = noisy_image.high_boost_filter(k, inplace=False, blur=blur)
+    finally:
+        backend.use_numpy(backend.numpy_available())
+    assert result.values == expected.values
+
+
+def test_high_boost_filter_rejects_unknown_blurs(noisy_image):
+    with pytest.raises(ValidationError):
+        noisy_image.high_boost_filter(blur="bilateral")
+
+
+def sorted_lower_median(sw: list[list[int]]) -> int:
+    values = sorted(v for line in sw for v in line)
+    return values[len(values) // 2 - (1 - len(values) % 2)]
+
+
+@pytest.mark.parametrize("kernel", [1, 3, 4, 5, 7, 25])
+def test_median_filter_matches_sorted_window_median(noisy_image, kernel):
+    expected = window_filter(noisy_image, kernel, sorted_lower_median)
+    backend.use_numpy(False)
+    try:
+        result = noisy_image.median_filter(kernel, inplace=False)
+    finally:
+        backend.use_numpy(backend.numpy_available())
+    assert result.values == expected.values
+
+
+def test_median_filter_handles_sixteen_bit_samples():
+    rng = random.Random(5)
+    pixel_values = [
+        [GrayPixel(rng.randrange(4096)) for _ in range(6)] for _ in range(5)
+    ]
+    image = Image(header="P2", max_level=4095, dimensions=(6, 5), contents=pixel_values)
+    expected = window_filter(image, 3, sorted_lower_median)
+    backend.use_numpy(False)
+    try:
+        result = image.median_filter(3, inplace=False)
+    finally:
+        backend.use_numpy(backend.numpy_available())
+    assert result.values == expected.values
+
+
+@pytest.mark.parametrize("mode", ["extend", "replicate", "constant"])
+@pytest.mark.parametrize("kernel", [1, 3, 5, 9])
+def test_local_histogram_equalization_equalizes_each_window(noisy_image, kernel, mode):
+    def equalize(sw: list[list[int]]) -> int:
+        pivot = sw[kernel // 2][kernel // 2]
+        values = [v for line in sw for v in line]
+        hist = {str(i): values.count(i) for i in range(256)}
+        frequencies = _calculate_frequencies(hist, len(values))
+        return _generate_equalized_map(frequencies, 255)[str(pivot)]
+
+    expected = window_filter(noisy_image, kernel, equalize, mode)
+    result = noisy_image.local_histogram_equalization(kernel, False, mode)
+    assert result.values == expected.values
+
+
+def reference_transform(values: list[list[Any]], operation: str) -> list[list[Any]]:
+    transposed = [list(col) for col in zip(*values)]
+    return {
+        "rotate_90": [row[::-1] for row in transposed],
+        "rotate_270": transposed[::-1],
+        "rotate_180": [row[::-1] for row in values[::-1]],
+        "transpose": transposed,
+        "vertical_mirror": [row[::-1] for row in values],
+        "horizontal_mirror": values[::-1],
+    }[operation]
+
+
+GEOMETRIC_OPERATIONS = [
+    "rotate_90",
+    "rotate_270",
+    "rotate_180",
+    "transpose",
+    "vertical_mirror",
+    "horizontal_mirror",
+]
+
+
+@pytest.mark.parametrize("layout", ["interleaved", "planar"])
+@pytest.mark.parametrize("second", GEOMETRIC_OPERATIONS)
+@pytest.mark.parametrize("first", GEOMETRIC_OPERATIONS)
+def test_geometric_operations_compose_as_views(first, second, layout):
+    rng = random.Random(5)
+    pixel_values = [
+        [RGBPixel(*(rng.randrange(256) for _ in range(3))) for _ in range(4)]
+        for _ in range(3)
+    ]
+    image = Image("P3", 255, (4, 3), contents=pixel_values, layout=layout)
+    storage = image._storage
+    getattr(image, first)()
+    getattr(image, second)()
+    # nothing moved until the pixels are read
+    assert image._storage is storage
+    expected = reference_transform(reference_transform(pixel_values, first), second)
+    assert image.get_pixel(1, 1) == expected[0][0]
+    assert image.dimensions == (len(expected[0]), len(expected))
+    assert [list(row) for row in image.values] == expected
+
+
+def test_opposite_transforms_cancel_out(wide_image):
+    storage = wide_image._storage
+    for _ in range(4):
+        wide_image.rotate_90()
+    wide_image.transpose().transpose()
+    assert wide_image._view is None
+    assert wide_image._buffer is storage
+
+
+def test_oriented_images_are_saved_without_materializing(wide_image, tmp_path):
+    wide_image.rotate_90().vertical_mirror()
+    save_file(str(tmp_path / "image.pgm"), wide_image, header="P5")
+    assert wide_image._view is not None
+    saved = read_file(str(tmp_path / "image.pgm"))
+    assert saved.values == wide_image.values
+    assert saved.dimensions == (2, 3)
+
+
+def test_copies_share_pixels_until_written(p2_image):
+    copied = p2_image.copy_current_image()
+    assert copied._buffer.data is p2_image._buffer.data
+    copied.set_pixel(1, 1, GrayPixel(200))
+    assert p2_image.get_pixel(1, 1).value == 0
+    assert not p2_image._buffer.shared
+    p2_image.set_pixel(2, 1, GrayPixel(100))
+    assert copied.get_pixel(2, 1).value == 1
+
+
+def test_ndarray_writes_do_not_reach_copies(p3_image):
+    pytest.importorskip("numpy")
+    copied = p3_image.copy_current_image()
+    copied.ndarray[0, 0, 0] = 99
+    assert p3_image.get_pixel(1, 1) == RGBPixel(0, 1, 2)
+    assert copied.get_pixel(1, 1) == RGBPixel(99, 1, 2)
+
+
+@pytest.mark.parametrize(
+    "operation",
+    [
+        lambda img: img.negative(inplace=False),
+        lambda img: img.darken(1, inplace=False),
+        lambda img: img.lighten(1, inplace=False),
+        lambda img: img.rotate_90(inplace=False),
+        lambda img: img.vertical_mirror(inplace=False),
+    ],
+)
+def test_operations_out_of_place_leave_the_image_untouched(wide_image, operation):
+    result = operation(wide_image)
+    assert result is not wide_image
+    assert wide_image.dimensions == (3, 2)
+    assert [[p.value for p in row] for row in wide_image.values] == [
+        [0, 1, 2],
+        [3, 4, 5],
+    ]
+
+
+@pytest.fixture
+def frame() -> Image:
+    pixel_values = [[GrayPixel(10 * j + i) for i in range(6)] for j in range(5)]
+    return Image(header="P2", max_level=255, dimensions=(6, 5), contents=pixel_values)
+
+
+def test_region_operations_write_through_to_the_parent(frame, noisy_image):
+    region = frame.roi(1, 2, 3, 2)
+    assert [[p.value for p in row] for row in region.values] == [
+        [21, 22, 23],
+        [31, 32, 33],
+    ]
+    region.negative()
+    assert [p.value for p in frame.values[2]] == [20, 234, 233, 232, 24, 25]
+    assert frame.get_pixel(1, 1).value == 0
+    # changes made to the parent are seen by the region
+    frame.set_pixel(3, 3, GrayPixel(7))
+    assert region.get_pixel(2, 1).value == 7
+    region.set_pixel(3, 2, GrayPixel(9))
+    assert frame.get_pixel(4, 4).value == 9
+
+
+def test_region_filters_only_read_the_region(noisy_image):
+    expected = noisy_image.copy_current_image().crop(2, 1, 5, 4)
+    expected.median_filter(3)
+    region = noisy_image.roi(2, 1, 5, 4)
+    region.median_filter(3)
+    assert region.values == expected.values
+    assert noisy_image.roi(2, 1, 5, 4).values == expected.values
+
+
+def test_nested_regions_write_through(frame):
+    inner = frame.roi(1, 1, 4, 3).roi(1, 1, 2, 2)
+    inner.lighten(100)
+    assert [p.value for p in frame.values[2]] == [20, 21, 122, 123, 24, 25]
+
+
+def test_regions_keep_their_shape(frame):
+    region = frame.roi(0, 0, 2, 2)
+    region.rotate_180()
+    assert [p.value for p in frame.values[0]][:3] == [11, 10, 2]
+    region.roi(0, 0, 2, 1).transpose()
+    # the transposed region is detached, the parent is unchanged
+    assert [p.value for p in frame.values[0]][:3] == [11, 10, 2]
+
+
+def test_region_must_be_inside_the_image(frame):
+    with pytest.raises(ValidationError):
+        frame.roi(4, 0, 3, 1)
+
+
+def test_crop_keeps_a_rectangle(frame):
+    cropped = frame.crop(4, 3, 2, 2, inplace=False)
+    assert frame.dimensions == (6, 5)
+    assert [[p.value for p in row] for row in cropped.values] == [[34, 35], [44, 45]]
+    frame.crop(0, 4, 6, 1)
+    assert [[p.value for p in row] for row in frame.values] == [
+        [40, 41, 42, 43, 44, 45]
+    ]
+
+
+@pytest.mark.parametrize("mode", ["constant", "replicate", "reflect", "wrap"])
+def test_pad_adds_a_virtual_border(wide_image, tmp_path, mode):
+    padded = wide_image.pad(2, mode, inplace=False)
+    assert wide_image.dimensions == (3, 2)
+    assert padded.dimensions == (7, 6)
+    assert padded._view is not None
+    save_file(str(tmp_path / "padded.pgm"), padded)
+    assert padded._view is not None
+    expected = pad_plane(wide_image._buffer.data, 3, 2, 2, mode)
+    assert padded.get_pixel(2, 5).value == expected[4 * 7 + 1]
+    assert list(read_file(str(tmp_path / "padded.pgm"))._buffer.data) == list(expected)
+    assert list(padded._buffer.data) == list(expected)
+
+
+def test_histogram_counts_the_padded_border(wide_image):
+    wide_image.rotate_90()
+    assert wide_image.histogram()[:7].tolist() == [1] * 6 + [0]
+    assert wide_image._view is not None
+    wide_image.pad(2, "constant")
+    assert sum(wide_image.histogram()) == 7 * 6
+    assert wide_image.histogram()[:7].tolist() == [37] + [1] * 5 + [0]
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from simple_imaging import backend
+from simple_imaging.errors import ValidationError
+from simple_imaging.image import Image
+from simple_imaging.kernels import get_kernel
+from simple_imaging.kernels import Kernel
+from simple_imaging.kernels import register_kernel
+from simple_imaging.types import GrayPixel
+
+from .fixtures import window_filter
+
+# 5x5 integer kernel of rank 2, so not separable
+RANK_TWO = [[(i * j + i + j) % 4 - 1 for j in range(5)] for i in range(5)]
+
+
+@pytest.fixture
+def noisy_image() -> Image:
+    rng = random.Random(11)
+    pixel_values = [[GrayPixel(rng.randrange(256)) for _ in range(9)] for _ in range(7)]
+    return Image(header="P2", max_level=255, dimensions=(9, 7), contents=pixel_values)
+
+
+@pytest.fixture
+def python_backend():
+    backend.use_numpy(False)
+    yield
+    backend.use_numpy(backend.numpy_available())
+
+
+def window_convolution(image: Image, kernel: Kernel) -> Image:
+    coefficients = [v for row in kernel.coefficients for v in row]
+
+    def convolve(sw: list[list[int]]) -> int:
+        values = [v for line in sw for v in line]
+        return max(0, min(255, round(sum(c * v for c, v in zip(coefficients, values)))))
+
+    return window_filter(image, kernel.size, convolve)
+
+
+@pytest.mark.parametrize(
+    "kernel, separable",
+    [
+        ("gaussian_blur", True),
+        ("box_blur", True),
+        ("identity", True),
+        ("laplace", False),
+        ("emboss", False),
+    ],
+)
+def test_kernel_detects_separability(kernel, separable):
+    assert get_kernel(kernel).separable is separable
+
+
+def test_gaussian_blur_coefficients_add_up_to_one():
+    assert sum(v for row in get_kernel("gaussian_blur").coefficients for v in row) == 1
+
+
+def test_equal_kernels_hash_alike():
+    kernels = {Kernel([[1, 2, 1]] * 3), Kernel([[1.0, 2.0, 1.0]] * 3, name="copy")}
+    assert len(kernels) == 1
+
+
+@pytest.mark.parametrize(
+    "coefficients", [[1, 2, 3, 4], [[1, 2], [3, 4]], [1, 2, 3], [[1, 2, 3]] * 2]
+)
+def test_raises_validation_exception_on_invalid_kernel_shape(coefficients):
+    with pytest.raises(ValidationError):
+        Kernel(coefficients)
+
+
+def test_unknown_kernel_names_list_the_registered_ones():
+    with pytest.raises(ValidationError, match=r"options are \[.*'sharpen'"):
+        get_kernel("blurry")
+
+
+@pytest.mark.parametrize(
+    "kernel",
+    [
+        get_kernel("gaussian_blur"),
+        get_kernel("laplace"),
+        get_kernel("sharpen"),
+        Kernel(RANK_TWO),
+        Kernel([[1, 2, 1], [2, 4, 2], [1, 2, 1]]),
+    ],
+)
+def test_convolution_matches_sliding_window_convolution(
+    noisy_image, python_backend, kernel
+):
+    expected = window_convolution(noisy_image, kernel)
+    result = noisy_image._kernel_filter(kernel, inplace=False)
+    assert result.values == expected.values
+
+
+def test_large_gaussian_blur_keeps_flat_images_flat(python_backend):
+    image = Image(
+        header="P2",
+        max_level=255,
+        dimensions=(40, 30),
+        contents=[[GrayPixel(77) for _ in range(40)] for _ in range(30)],
+    )
+    kernel = Kernel.gaussian(radius=12)
+    assert kernel.separable
+    result = image._kernel_filter(kernel, inplace=False)
+    assert set(result._buffer.data) == {77}
+
+
+@pytest.mark.parametrize("numpy", [False, True])
+@pytest.mark.parametrize("radius", [1, 3, 10, 12])
+@pytest.mark.parametrize("build", [Kernel.box, Kernel.gaussian])
+def test_normalized_kernels_keep_flat_images_flat(numpy, radius, build):
+    if numpy and not backend.numpy_available():
+        pytest.skip("numpy is not installed")
+    kernel = build(radius)
+    assert sum(kernel.fixed_column) * sum(kernel.fixed_row) == kernel.scale
+    image = Image(
+        header="P2",
+        max_level=255,
+        dimensions=(25, 23),
+        contents=[[GrayPixel(200) for _ in range(25)] for _ in range(23)],
+    )
+    backend.use_numpy(numpy)
+    try:
+        result = image._kernel_filter(kernel, inplace=False)
+    finally:
+        backend.use_numpy(backend.numpy_available())
+    assert set(result._buffer.data) == {200}
+
+
+def test_custom_kernels_can_be_registered(noisy_image):
+    register_kernel("shift_left", [[0, 0, 0], [0, 0, 1], [0, 0, 0]])
+    result = noisy_image._kernel_filter("shift_left", inplace=False)
+    assert result.get_pixel(1, 1) == noisy_image.get_pixel(2, 1)
+    assert result.get_pixel(9, 1) == noisy_image.get_pixel(9, 1)
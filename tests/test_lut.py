@@ -0,0 +1,68 @@
+import random
+from array import array
+
+import pytest
+
+from simple_imaging import backend
+from simple_imaging.buffer import PixelBuffer
+from simple_imaging.lut import apply_table
+from simple_imaging.lut import build_table
+from simple_imaging.lut import lookup_table
+from simple_imaging.lut import POINTWISE_OPERATIONS
+
+
+def random_buffer(typecode: str, top: int) -> PixelBuffer:
+    rng = random.Random(3)
+    data = array(typecode, [rng.randrange(top + 1) for _ in range(5 * 4 * 3)])
+    return PixelBuffer(5, 4, 3, typecode, data)
+
+
+@pytest.mark.parametrize(
+    "operation, params",
+    [
+        ("negative", (255,)),
+        ("darken", (40,)),
+        ("lighten", (40, 255)),
+        ("multiply", (1.5, 255)),
+        ("binarization", (128, 255)),
+        ("highlight_band", (50, 150, 255, 10)),
+        ("gamma", (0.4, 1.1, 255)),
+    ],
+)
+def test_tables_match_the_per_sample_mapping(operation, params):
+    buffer = random_buffer("B", 255)
+    mapping = POINTWISE_OPERATIONS[operation](*params)
+    result = apply_table(buffer, lookup_table(operation, "B", *params))
+    assert list(result) == [mapping(v) for v in buffer.data]
+
+
+def test_byte_tables_are_translation_tables():
+    table = lookup_table("negative", "B", 255)
+    assert isinstance(table, bytes)
+    assert len(table) == 256
+    assert table[0] == 255 and table[255] == 0
+
+
+def test_tables_are_cached_by_operation_and_parameters():
+    lookup_table.cache_clear()
+    first = lookup_table("darken", "B", 10)
+    assert lookup_table("darken", "B", 10) is first
+    assert lookup_table("darken", "B", 11) is not first
+    info = lookup_table.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_sixteen_bit_tables(use_numpy):
+    if use_numpy and not backend.numpy_available():
+        pytest.skip("NumPy is not installed")
+    buffer = random_buffer("H", 1000)
+    table = build_table(lambda v: min(1000, 2 * v), "H")
+    assert len(table) == 65536
+    backend.use_numpy(use_numpy)
+    try:
+        result = apply_table(buffer, table)
+    finally:
+        backend.use_numpy(backend.numpy_available())
+    assert result.typecode == "H"
+    assert list(result) == [min(1000, 2 * v) for v in buffer.data]
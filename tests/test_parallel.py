@@ -0,0 +1,103 @@
+import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from simple_imaging import parallel
+from simple_imaging.buffer import PixelBuffer
+from simple_imaging.errors import ValidationError
+from simple_imaging.image import Image
+from simple_imaging.parallel import band_bounds
+
+
+def random_image(header: str, x: int = 9, y: int = 13) -> Image:
+    rng = random.Random(11)
+    channels = 3 if header in ("P3", "P6") else 1
+    data = array("B", [rng.randrange(256) for _ in range(x * y * channels)])
+    buffer = PixelBuffer(x, y, channels, data=data)
+    return Image(header=header, max_level=255, dimensions=(x, y), buffer=buffer)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+@pytest.fixture
+def executor(pool, monkeypatch):
+    # several bands whatever the CPU count, so their seams are exercised
+    monkeypatch.setattr(parallel, "EXECUTOR_PARTS", 4)
+    return pool
+
+
+@pytest.mark.parametrize("header", ["P2", "P3"])
+@pytest.mark.parametrize("mode", ["extend", "reflect", "constant", "wrap"])
+@pytest.mark.parametrize(
+    "operation, args",
+    [
+        ("average_filter", (3,)),
+        ("average_filter", (5,)),
+        ("median_filter", (5,)),
+        ("laplacian_filter", ()),
+        ("_kernel_filter", ("gaussian_blur",)),
+        ("high_boost_filter", (2,)),
+    ],
+)
+def test_band_processing_matches_serial_processing(
+    executor, header, mode, operation, args
+):
+    image = random_image(header)
+    expected = getattr(image, operation)(*args, inplace=False, mode=mode)
+    result = getattr(image, operation)(
+        *args, inplace=False, mode=mode, parallel=executor
+    )
+    assert list(result._buffer.data) == list(expected._buffer.data)
+
+
+def test_worker_count_creates_a_pool():
+    image = random_image("P2", 6, 20)
+    expected = image.median_filter(3, inplace=False)
+    assert image.median_filter(3, parallel=3).values == expected.values
+
+
+@pytest.mark.parametrize("header", ["P2", "P3"])
+def test_parallel_histogram_equalization(executor, header):
+    image = random_image(header)
+    expected = image.histogram_equalization(inplace=False)
+    result = image.histogram_equalization(inplace=False, parallel=executor)
+    assert list(result._buffer.data) == list(expected._buffer.data)
+
+
+def test_parallel_bands_apply_a_fused_table(executor):
+    image = random_image("P2")
+    expected = image.lazy().average_filter(3).darken(30).negative().compute()
+    result = (
+        image.lazy().average_filter(3, parallel=executor).darken(30).negative()
+    ).compute()
+    assert result.values == expected.values
+
+
+def test_executor_work_is_split_in_parts(executor):
+    with parallel._executor(executor) as (_, parts):
+        assert parts == 4
+
+
+def test_bands_split_rows_evenly():
+    assert band_bounds(10, 3) == [(0, 4), (4, 3), (7, 3)]
+    assert band_bounds(2, 8) == [(0, 1), (1, 1)]
+
+
+@pytest.mark.parametrize("workers", [0, -1])
+@pytest.mark.parametrize(
+    "operation",
+    [
+        lambda img, workers: img.average_filter(3, parallel=workers),
+        lambda img, workers: img.median_filter(3, mode="wrap", parallel=workers),
+        lambda img, workers: img.histogram_equalization(parallel=workers),
+    ],
+)
+def test_worker_count_must_be_positive(workers, operation):
+    with pytest.raises(ValidationError):
+        operation(random_image("P2"), workers)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import random
+from array import array
+from typing import Any
+from typing import Sequence
+
+import pytest
+
+from simple_imaging.buffer import PixelBuffer
+from simple_imaging.image import Image
+from simple_imaging.image import read_file
+from simple_imaging.image import save_file
+from simple_imaging.pipeline import Pipeline
+
+
+def random_image(header: str = "P3", max_level: int = 255) -> Image:
+    rng = random.Random(11)
+    channels = 3 if header in ("P3", "P6") else 1
+    typecode = "B" if max_level < 256 else "H"
+    data = array(
+        typecode, [rng.randrange(max_level + 1) for _ in range(8 * 6 * channels)]
+    )
+    buffer = PixelBuffer(8, 6, channels, typecode, data)
+    return Image(header=header, max_level=max_level, dimensions=(8, 6), buffer=buffer)
+
+
+RECIPES = [
+    [("darken", (10,)), ("gamma_transformation", (0.5,)), ("binarization", (128,))],
+    [
+        ("median_filter", (3,)),
+        ("lighten", (20,)),
+        ("highlight_band", ((40, 200), 255)),
+    ],
+    [
+        ("negative", ()),
+        ("average_filter", (5,), {"mode": "reflect"}),
+        ("multiply_image", (1.5,)),
+        ("rotate_90", ()),
+        ("gamma_transformation", (0.8, 1.2)),
+    ],
+    [
+        ("_kernel_filter", ("gaussian_blur",)),
+        ("negative", ()),
+        ("laplacian_filter", ()),
+    ],
+]
+
+
+def run_eagerly(image: Image, recipe: Sequence[tuple[Any, ...]]) -> Image:
+    result = image.copy_current_image()
+    for name, args, *kwargs in recipe:
+        getattr(result, name)(*args, **(kwargs[0] if kwargs else {}), inplace=True)
+    return result
+
+
+def build_pipeline(image: Image, recipe: Sequence[tuple[Any, ...]]) -> Pipeline:
+    pipeline = image.lazy()
+    for name, args, *kwargs in recipe:
+        getattr(pipeline, name)(*args, **(kwargs[0] if kwargs else {}))
+    return pipeline
+
+
+@pytest.mark.parametrize("max_level", [255, 1000])
+@pytest.mark.parametrize("recipe", RECIPES)
+def test_pipeline_matches_eager_operations(recipe, max_level):
+    image = random_image(max_level=max_level)
+    original = list(image._buffer.data)
+    result = build_pipeline(image, recipe).compute()
+    assert list(result._buffer.data) == list(run_eagerly(image, recipe)._buffer.data)
+    assert list(image._buffer.data) == original
+
+
+def test_pointwise_steps_are_fused():
+    pipeline = (
+        random_image()
+        .lazy()
+        .darken(10)
+        .gamma_transformation(0.5)
+        .median_filter(3)
+        .binarization(128)
+        .negative()
+        .rotate_180()
+        .lighten(5)
+    )
+    passes = [
+        (operation and operation[0], [name for name, _, _ in pointwise])
+        for operation, pointwise in pipeline.plan()
+    ]
+    assert passes == [
+        (None, ["darken", "gamma_transformation"]),
+        ("median_filter", ["binarization", "negative"]),
+        ("rotate_180", []),
+        (None, ["lighten"]),
+    ]
+
+
+def test_pipeline_records_without_computing():
+    image = random_image()
+    pipeline = image.lazy().negative()
+    assert pipeline.steps == [("negative", (), {})]
+    assert image.values == random_image().values
+    with pytest.raises(AttributeError):
+        pipeline.get_pixel(1, 1)
+
+
+def test_save_file_computes_pipelines(tmp_path):
+    image = random_image("P2")
+    pipeline = image.lazy().average_filter(3).darken(30)
+    save_file(str(tmp_path / "out"), pipeline)
+    expected = image.average_filter(3, inplace=False).darken(30)
+    assert read_file(str(tmp_path / "out")).values == expected.values
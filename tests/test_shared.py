@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import pickle
+import random
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from simple_imaging.buffer import PixelBuffer
+from simple_imaging.errors import InvalidFileError
+from simple_imaging.image import Image
+from simple_imaging.image import in_shared_memory
+from simple_imaging.types import GrayPixel
+from simple_imaging.utils import WIRE_HEADER
+
+
+def random_image(
+    header: str, max_level: int = 255, layout: str = "interleaved"
+) -> Image:
+    rng = random.Random(5)
+    channels = 3 if header in ("P3", "P6") else 1
+    typecode = "B" if max_level <= 255 else "H"
+    data = array(
+        typecode, [rng.randrange(max_level + 1) for _ in range(7 * 4 * channels)]
+    )
+    buffer = PixelBuffer(7, 4, channels, typecode, data, layout)
+    return Image(header=header, max_level=max_level, dimensions=(7, 4), buffer=buffer)
+
+
+def median_of(image: Image) -> list[int]:
+    return list(image.median_filter(3, inplace=False)._buffer.data)
+
+
+@pytest.mark.parametrize(
+    "image",
+    [
+        random_image("P2"),
+        random_image("P2", 1023),
+        random_image("P3"),
+        random_image("P3", layout="planar"),
+    ],
+)
+def test_shared_images_pickle_as_a_descriptor(image):
+    with in_shared_memory(image) as shared:
+        assert shared.values == image.values
+        payload = pickle.dumps(shared)
+        assert len(payload) < 300
+        received = pickle.loads(payload)
+        assert received._buffer.layout == image._buffer.layout
+        assert list(received._buffer.data) == list(image._buffer.data)
+
+
+def test_workers_read_shared_images():
+    image = random_image("P2")
+    with in_shared_memory(image) as shared:
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(median_of, [shared, shared]))
+    assert results == [median_of(image)] * 2
+
+
+def test_writes_stay_out_of_the_segment():
+    image = random_image("P2")
+    with in_shared_memory(image) as shared:
+        descriptor = shared.shared_descriptor
+        assert descriptor is not None
+        received = pickle.loads(pickle.dumps(shared))
+        received.set_pixel(1, 1, GrayPixel(0))
+        shared.negative()
+        assert shared.shared_descriptor is None
+        assert received.shared_descriptor is None
+        assert Image.from_shared_memory(descriptor).values == image.values
+
+
+def test_segments_are_unlinked_after_the_block():
+    with in_shared_memory(random_image("P2")) as shared:
+        descriptor = shared.shared_descriptor
+        assert descriptor is not None
+    assert shared.shared_descriptor is None
+    # the pixels stay readable in the owning process
+    assert shared.get_pixel(1, 1) == random_image("P2").get_pixel(1, 1)
+    with pytest.raises(FileNotFoundError):
+        Image.from_shared_memory(descriptor)
+
+
+def test_segments_are_unlinked_with_their_image():
+    shared = random_image("P2").to_shared_memory()
+    descriptor = shared.shared_descriptor
+    assert descriptor is not None
+    del shared
+    with pytest.raises(FileNotFoundError):
+        Image.from_shared_memory(descriptor)
+
+
+@pytest.mark.parametrize("protocol", [3, 4, 5])
+@pytest.mark.parametrize(
+    "image",
+    [
+        random_image("P2"),
+        random_image("P2", 1023),
+        random_image("P3", layout="planar"),
+    ],
+)
+def test_images_pickle_as_their_raw_samples(protocol, image):
+    image.histograms()
+    payload = pickle.dumps(image, protocol=protocol)
+    raster = len(image._buffer.data) * image._buffer.data.itemsize
+    assert raster <= len(payload) < raster + 200
+    received = pickle.loads(payload)
+    assert received.values == image.values
+    assert received._buffer.layout == image._buffer.layout
+    assert median_of(received) == median_of(image)
+
+
+def test_protocol_5_sends_the_samples_out_of_band():
+    image = random_image("P2", 1023)
+    buffers: list[pickle.PickleBuffer] = []
+    payload = pickle.dumps(image, protocol=5, buffer_callback=buffers.append)
+    assert len(payload) < 200
+    assert len(buffers) == 1
+    assert buffers[0].raw().nbytes == 7 * 4 * 2
+    received = pickle.loads(payload, buffers=buffers)
+    assert received.values == image.values
+    # the received image reads the buffer in place, writes copy it
+    received.negative()
+    assert pickle.loads(payload, buffers=buffers).values == image.values
+
+
+def test_oriented_images_pickle_their_result():
+    image = random_image("P3")
+    rotated = image.rotate_90(inplace=False)
+    assert pickle.loads(pickle.dumps(rotated, protocol=5)).values == rotated.values
+
+
+@pytest.mark.parametrize("header, max_level", [("P2", 255), ("P2", 1023), ("P3", 255)])
+def test_wire_format_round_trip(header, max_level):
+    image = random_image(header, max_level)
+    data = image.to_bytes()
+    assert len(data) == WIRE_HEADER.size + 7 * 4 * len(image._buffer.planes()) * (
+        1 if max_level <= 255 else 2
+    )
+    received = Image.from_bytes(data)
+    assert (received.header, received.max_level) == (header, max_level)
+    assert received.values == image.values
+
+
+def test_wire_format_swaps_foreign_byte_order():
+    image = random_image("P2", 1023)
+    data = bytearray(image.to_bytes())
+    foreign = array("H", data[WIRE_HEADER.size :])
+    foreign.byteswap()
+    data[WIRE_HEADER.size :] = foreign.tobytes()
+    data[8] = sys.byteorder != "little"
+    assert Image.from_bytes(data).values == image.values
+
+
+@pytest.mark.parametrize("data", [b"SIMG", b"NOPE" + bytes(40)])
+def test_wire_format_rejects_invalid_data(data):
+    with pytest.raises(InvalidFileError):
+        Image.from_bytes(data)
+
+
+def test_wire_format_rejects_truncated_rasters():
+    with pytest.raises(InvalidFileError):
+        Image.from_bytes(random_image("P2").to_bytes()[:-1])
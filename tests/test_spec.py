@@ -0,0 +1,199 @@
+import json
+import random
+import textwrap
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from simple_imaging import spec
+from simple_imaging.buffer import PixelBuffer
+from simple_imaging.cli import main
+from simple_imaging.errors import ValidationError
+from simple_imaging.image import extract_channels
+from simple_imaging.image import Image
+from simple_imaging.image import merge_channels
+from simple_imaging.image import read_file
+from simple_imaging.image import save_file
+from simple_imaging.spec import build_graph
+from simple_imaging.spec import parse_reference
+from simple_imaging.spec import run_spec
+
+SPEC = {
+    "inputs": {"photo": "photo.ppm", "gray": "gray.pgm"},
+    "nodes": {
+        "channels": {"function": "extract_channels", "inputs": ["photo"]},
+        "red": {"input": "channels[0]", "ops": ["median:3", "gamma:0.6"]},
+        "blue": {"input": "channels[2]", "ops": [{"op": "negative"}]},
+        "merged": {
+            "function": "merge_channels",
+            "inputs": ["red", "channels[1]", "blue"],
+        },
+        "edges": {"input": "gray", "ops": ["laplacian"]},
+        "sharp": {
+            "input": "gray",
+            "ops": [{"op": "add_image", "args": ["@edges"]}],
+        },
+    },
+    "outputs": {
+        "out/merged.ppm": "merged",
+        "out/sharp.pgm": {"node": "sharp", "header": "P5"},
+    },
+}
+
+
+def random_image(header: str, seed: int) -> Image:
+    rng = random.Random(seed)
+    channels = 3 if header in ("P3", "P6") else 1
+    data = array("B", [rng.randrange(256) for _ in range(8 * 5 * channels)])
+    buffer = PixelBuffer(8, 5, channels, data=data)
+    return Image(header=header, max_level=255, dimensions=(8, 5), buffer=buffer)
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    save_file(str(tmp_path / "photo.ppm"), random_image("P3", 1))
+    save_file(str(tmp_path / "gray.pgm"), random_image("P2", 2))
+    return tmp_path
+
+
+def check_outputs(workspace):
+    red, green, blue = extract_channels(read_file(str(workspace / "photo.ppm")))
+    red.median_filter(3).gamma_transformation(0.6)
+    blue.negative()
+    merged = merge_channels([red, green, blue])
+    assert read_file(str(workspace / "out" / "merged.ppm")).values == merged.values
+
+    gray = read_file(str(workspace / "gray.pgm"))
+    sharp = gray.add_image(gray.laplacian_filter(inplace=False), inplace=False)
+    result = read_file(str(workspace / "out" / "sharp.pgm"))
+    assert result.header == "P5"
+    assert result.values == sharp.values
+
+
+def test_spec_runs_branches_and_merges(workspace):
+    spec_path = workspace / "recipe.json"
+    spec_path.write_text(json.dumps(SPEC))
+    report = run_spec(str(spec_path), workers=2)
+    check_outputs(workspace)
+    assert set(report.durations) == set(build_graph(SPEC))
+    # every node depends on the previous one, back to an input
+    graph = build_graph(SPEC)
+    path = report.critical_path
+    assert graph[path[0]].kind == "read" and graph[path[-1]].kind == "write"
+    for previous, node in zip(path, path[1:]):
+        assert previous in {parse_reference(r)[0] for r in graph[node].references}
+    assert report.critical_seconds <= sum(report.durations.values())
+
+
+def test_intermediates_are_freed_after_their_last_reader(workspace):
+    spec = {
+        "inputs": {"gray": str(workspace / "gray.pgm")},
+        "nodes": {
+            f"step{i}": {"input": f"step{i - 1}" if i else "gray"} for i in range(6)
+        },
+        "outputs": {str(workspace / "last.pgm"): "step5"},
+    }
+    with ThreadPoolExecutor(4) as executor:
+        report = run_spec(spec, executor=executor)
+    assert report.critical_path[0] == "gray" and len(report.critical_path) == 8
+    # a chain never holds more than a result and the one it was computed from
+    assert report.peak_results <= 2
+
+
+@pytest.mark.skipif(spec.tomllib is None, reason="tomllib or tomli is needed")
+def test_spec_can_be_written_in_toml(workspace):
+    (workspace / "recipe.toml").write_text("""
+[inputs]
+photo = "photo.ppm"
+gray = "gray.pgm"
+
+[nodes.channels]
+function = "extract_channels"
+inputs = ["photo"]
+
+[nodes.red]
+input = "channels[0]"
+ops = ["median:3", "gamma:0.6"]
+
+[nodes.blue]
+input = "channels[2]"
+ops = [{op = "negative"}]
+
+[nodes.merged]
+function = "merge_channels"
+inputs = ["red", "channels[1]", "blue"]
+
+[nodes.edges]
+input = "gray"
+ops = ["laplacian"]
+
+[nodes.sharp]
+input = "gray"
+ops = [{op = "add_image", args = ["@edges"]}]
+
+[outputs]
+"out/merged.ppm" = "merged"
+"out/sharp.pgm" = {node = "sharp", header = "P5"}
+""")
+    assert main(["--spec", str(workspace / "recipe.toml"), "-j", "2"]) == 0
+    check_outputs(workspace)
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        {"nodes": {"a": {"input": "missing"}}},
+        {"nodes": {"a": {"input": "b"}, "b": {"input": "a"}}},
+        {"nodes": {"a": {"function": "blend", "inputs": []}}},
+        {"inputs": {"a": "a.pgm"}, "nodes": {"b": {"input": "a", "ops": ["blur"]}}},
+        {"inputs": {"a": "a.pgm"}, "nodes": {"b": {"input": "a[x]"}}},
+        {"inputs": {"a": "a.pgm"}, "nodes": {"a": {"input": "a"}}},
+        {"nodes": {"a": {"ops": []}}},
+        {"inputs": {"a": "a.pgm"}, "nodes": {"b": {"input": "a[0]"}}},
+    ],
+)
+def test_invalid_specs_are_rejected(spec):
+    with pytest.raises(ValidationError):
+        build_graph(spec)
+
+
+@pytest.mark.parametrize(
+    "node",
+    [
+        {"input": "channels"},
+        {"input": "a", "ops": [{"op": "add_image", "args": ["@channels"]}]},
+    ],
+)
+def test_image_lists_are_read_with_an_index(node):
+    spec = {
+        "inputs": {"a": "a.ppm"},
+        "nodes": {
+            "channels": {"function": "extract_channels", "inputs": ["a"]},
+            "b": node,
+        },
+    }
+    with pytest.raises(ValidationError, match="b reads channels"):
+        build_graph(spec)
+
+
+@pytest.mark.skipif(spec.tomllib is None, reason="tomllib or tomli is needed")
+def test_module_documentation_example_runs(workspace):
+    example = spec.__doc__.split("images:\n\n", 1)[1].split("\n\n`inputs`")[0]
+    (workspace / "recipe.toml").write_text(textwrap.dedent(example))
+    assert main(["--spec", str(workspace / "recipe.toml"), "-j", "2"]) == 0
+    assert read_file(str(workspace / "out" / "sharp.ppm")).header == "P3"
+
+
+def test_failing_specs_exit_with_an_error(workspace, capsys):
+    spec_path = workspace / "recipe.json"
+    spec_path.write_text(
+        json.dumps(
+            {
+                "inputs": {"photo": "photo.ppm"},
+                "outputs": {"out/photo.pgm": {"node": "photo", "header": "P2"}},
+            }
+        )
+    )
+    assert main(["--spec", str(spec_path), "-j", "1"]) == 1
+    assert "Cannot write a 3 channel image as P2" in capsys.readouterr().err
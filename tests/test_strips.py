@@ -0,0 +1,134 @@
+import random
+from array import array
+
+import pytest
+
+from simple_imaging.buffer import PixelBuffer
+from simple_imaging.errors import ValidationError
+from simple_imaging.image import Image
+from simple_imaging.image import read_file
+from simple_imaging.image import save_file
+from simple_imaging.strips import iter_strips
+from simple_imaging.strips import process_file
+
+
+def random_image(header: str, x: int = 9, y: int = 13) -> Image:
+    rng = random.Random(7)
+    channels = 3 if header in ("P3", "P6") else 1
+    data = array("B", [rng.randrange(256) for _ in range(x * y * channels)])
+    buffer = PixelBuffer(x, y, channels, data=data)
+    return Image(header=header, max_level=255, dimensions=(x, y), buffer=buffer)
+
+
+@pytest.mark.parametrize("header", ["P2", "P3", "P5", "P6"])
+@pytest.mark.parametrize("strip_height", [1, 2, 4, 100])
+@pytest.mark.parametrize(
+    "operation, args",
+    [
+        ("negative", ()),
+        ("gamma_transformation", (0.6,)),
+        ("average_filter", (3,)),
+        ("average_filter", (5,)),
+        ("median_filter", (5,)),
+        ("laplacian_filter", ()),
+        ("_kernel_filter", ("gaussian_blur",)),
+        ("high_boost_filter", (2,)),
+    ],
+)
+def test_strip_processing_matches_in_memory_processing(
+    tmp_path, header, strip_height, operation, args
+):
+    image = random_image(header)
+    source, destination = tmp_path / "source", tmp_path / "destination"
+    save_file(str(source), image)
+
+    written = process_file(
+        str(source), str(destination), operation, *args, strip_height=strip_height
+    )
+
+    expected = getattr(image, operation)(*args, inplace=False)
+    result = read_file(str(destination))
+    assert written == destination.stat().st_size
+    assert list(result._buffer.data) == list(expected._buffer.data)
+
+
+def test_strips_share_their_halo_rows():
+    rows = iter([[i] for i in range(5)])
+    strips = list(iter_strips(rows, 5, strip_height=2, halo=1))
+    assert strips == [
+        ([[0], [1], [2]], 0, 2),
+        ([[1], [2], [3], [4]], 1, 2),
+        ([[3], [4]], 1, 1),
+    ]
+
+
+def test_strip_output_can_use_another_format(tmp_path):
+    image = random_image("P5")
+    source, destination = tmp_path / "source", tmp_path / "destination"
+    save_file(str(source), image)
+    process_file(str(source), str(destination), "darken", 10, header="P2")
+    result = read_file(str(destination))
+    assert result.header == "P2"
+    assert list(result._buffer.data) == list(image.darken(10)._buffer.data)
+
+
+@pytest.mark.parametrize("header", ["P1", "P4"])
+def test_strip_bitmap_output_matches_save_file(tmp_path, header):
+    image = random_image("P5")
+    source, destination = tmp_path / "source", tmp_path / "destination"
+    save_file(str(source), image)
+    process_file(str(source), str(destination), "negative", header=header)
+    save_file(str(tmp_path / "expected"), image.negative(), header=header)
+    assert destination.read_bytes() == (tmp_path / "expected").read_bytes()
+
+
+def test_strip_output_can_replace_its_source(tmp_path):
+    image = random_image("P5", x=400, y=300)
+    source = tmp_path / "source"
+    save_file(str(source), image)
+    process_file(str(source), str(source), "median_filter", 3, strip_height=4)
+    expected = image.median_filter(3, inplace=False)
+    assert list(read_file(str(source))._buffer.data) == list(expected._buffer.data)
+    assert [p.name for p in tmp_path.iterdir()] == ["source"]
+
+
+def test_raises_validation_exception_on_unsupported_operation(tmp_path):
+    source = tmp_path / "source"
+    save_file(str(source), random_image("P2"))
+    with pytest.raises(ValidationError):
+        process_file(str(source), str(tmp_path / "out"), "histogram_equalization")
+
+
+def test_strip_processing_supports_border_modes(tmp_path):
+    image = random_image("P5")
+    source, destination = tmp_path / "source", tmp_path / "destination"
+    save_file(str(source), image)
+    process_file(
+        str(source),
+        str(destination),
+        "median_filter",
+        5,
+        strip_height=3,
+        mode="reflect",
+    )
+    expected = image.median_filter(5, inplace=False, mode="reflect")
+    assert read_file(str(destination)).values == expected.values
+    with pytest.raises(ValidationError):
+        process_file(str(source), str(destination), "median_filter", 5, mode="wrap")
+
+
+def test_strip_halo_follows_the_high_boost_blur_size(tmp_path):
+    image = random_image("P5")
+    source, destination = tmp_path / "source", tmp_path / "destination"
+    save_file(str(source), image)
+    process_file(
+        str(source),
+        str(destination),
+        "high_boost_filter",
+        1.5,
+        strip_height=2,
+        blur="gaussian",
+        kernel=5,
+    )
+    expected = image.high_boost_filter(1.5, inplace=False, blur="gaussian", kernel=5)
+    assert read_file(str(destination)).values == expected.values
@@ -1,16 +1,29 @@
 import io
+import os
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from typing import Dict
 from typing import List
 
 import pytest
 
+from simple_imaging import index
+from simple_imaging.buffer import PixelBuffer
+from simple_imaging.buffer import typecode_for
 from simple_imaging.errors import InvalidConfigsError
 from simple_imaging.errors import InvalidFileError
 from simple_imaging.errors import InvalidHeaderError
+from simple_imaging.image import Image
+from simple_imaging.image import probe
 from simple_imaging.image import read_file
+from simple_imaging.image import save_file
 from simple_imaging.types import GrayPixel
 from simple_imaging.utils import get_split_strings
+from simple_imaging.utils import iter_tokens
+from simple_imaging.utils import NetpbmWriter
+from simple_imaging.utils import parse_ascii_file
+from simple_imaging.utils import parse_binary_file
 from simple_imaging.utils import parse_file_contents
 
 
@@ -109,3 +122,266 @@ def test_can_split_any_formatted_content(file_contents):
     expected_output = ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0"]
     results = get_split_strings(file_contents=io.StringIO(file_contents))
     assert results == expected_output
+
+
+@pytest.mark.parametrize(
+    "header, max_level, samples",
+    [
+        ("P5", 255, [0, 17, 255, 128, 3, 9]),
+        ("P5", 4095, [0, 17, 4095, 256, 3, 1000]),
+        ("P6", 255, [1, 2, 3, 4, 5, 6] * 3),
+        ("P4", 1, [1, 0, 1, 1, 0, 1]),
+    ],
+)
+def test_binary_files_can_be_written_and_read_back(
+    tmp_path, header, max_level, samples
+):
+    channels = 3 if header == "P6" else 1
+    buffer = PixelBuffer(
+        3, 2, channels, typecode_for(max_level), array(typecode_for(max_level), samples)
+    )
+    image = Image(header=header, max_level=max_level, dimensions=(3, 2), buffer=buffer)
+    filepath = tmp_path / f"image.{header}"
+    save_file(str(filepath), image)
+
+    result = read_file(str(filepath))
+    assert (result.header, result.dimensions, result.max_level) == (
+        header,
+        (3, 2),
+        max_level,
+    )
+    assert list(result._buffer.data) == samples
+
+
+@pytest.mark.parametrize("header", ["P1", "P4"])
+@pytest.mark.parametrize("max_level", [255, 4095])
+def test_grayscale_images_are_thresholded_into_bitmaps(tmp_path, header, max_level):
+    half = (max_level + 1) // 2
+    samples = [0, half - 1, half, max_level, 30, max_level - 30]
+    typecode = typecode_for(max_level)
+    buffer = PixelBuffer(3, 2, 1, typecode, array(typecode, samples))
+    image = Image(header="P5", max_level=max_level, dimensions=(3, 2), buffer=buffer)
+    filepath = tmp_path / "image.pbm"
+    save_file(str(filepath), image, header=header)
+
+    result = read_file(str(filepath))
+    assert (result.header, result.max_level) == (header, 1)
+    # black (dark) pixels are the set bits
+    assert list(result._buffer.data) == [1, 1, 0, 0, 1, 0]
+
+
+def test_sixteen_bit_samples_are_written_big_endian(tmp_path):
+    buffer = PixelBuffer(1, 1, typecode="H", data=array("H", [0x1234]))
+    image = Image(header="P5", max_level=65535, dimensions=(1, 1), buffer=buffer)
+    filepath = tmp_path / "image.pgm"
+    save_file(str(filepath), image)
+    assert filepath.read_bytes() == b"P5\n1 1\n65535\n\x12\x34"
+
+
+def test_bitmap_rows_are_padded_to_a_full_byte():
+    stream = io.BytesIO(b"P4\n10 2\n\xff\xc0\x80\x40")
+    image_data = parse_binary_file(stream)
+    assert list(image_data["buffer"].data) == [1] * 10 + [1] + [0] * 8 + [1]
+
+
+def test_binary_header_can_contain_comments():
+    stream = io.BytesIO(b"P5 # a comment\n2 # width\n1\n# max\n255\n\x07\x08")
+    image_data = parse_binary_file(stream)
+    assert image_data["dimensions"] == (2, 1)
+    assert list(image_data["buffer"].data) == [7, 8]
+
+
+def test_raises_invalidfile_exception_on_truncated_raster():
+    with pytest.raises(InvalidFileError):
+        parse_binary_file(io.BytesIO(b"P5\n2 2\n255\n\x01\x02\x03"))
+
+
+@pytest.mark.parametrize(
+    "contents, exception",
+    [
+        (b"P7\n1 1\n255\n\x00", InvalidHeaderError),
+        (b"P5\nA 1\n255\n\x00", InvalidFileError),
+        (b"P5\n1 1\n0\n\x00", InvalidConfigsError),
+        (b"P5\n1 1\n70000\n\x00", InvalidConfigsError),
+    ],
+)
+def test_raises_exception_on_invalid_binary_header(contents, exception):
+    with pytest.raises(exception):
+        parse_binary_file(io.BytesIO(contents))
+
+
+ASCII_FILE = (
+    b"P2\n# created by hand\n3 2 # dimensions\n255\n10 20 30\n40 50# comment\n60\n"
+)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1 << 16])
+def test_tokenizer_handles_tokens_and_comments_split_between_chunks(chunk_size):
+    tokens = list(iter_tokens(io.BytesIO(ASCII_FILE), chunk_size=chunk_size))
+    assert tokens == [
+        b"P2",
+        b"3",
+        b"2",
+        b"255",
+        b"10",
+        b"20",
+        b"30",
+        b"40",
+        b"50",
+        b"60",
+    ]
+
+
+def test_can_parse_ascii_file_with_comments():
+    image_data = parse_ascii_file(io.BytesIO(ASCII_FILE), chunk_size=4)
+    assert image_data["dimensions"] == (3, 2)
+    assert list(image_data["buffer"].data) == [10, 20, 30, 40, 50, 60]
+
+
+def test_can_parse_rgb_ascii_file():
+    image_data = parse_ascii_file(io.BytesIO(b"P3 2 1 255 1 2 3 4 5 6"))
+    assert image_data["buffer"].get(0, 1) == (4, 5, 6)
+
+
+def test_bitmap_ascii_file_has_no_max_level_and_may_omit_spaces():
+    image_data = parse_ascii_file(io.BytesIO(b"P1\n4 2\n0110\n1 0 0 1\n"))
+    assert image_data["max_level"] == 1
+    assert list(image_data["buffer"].data) == [0, 1, 1, 0, 1, 0, 0, 1]
+
+
+def test_raises_invalidfile_exception_on_values_above_storage_range():
+    with pytest.raises(InvalidFileError):
+        parse_file_contents(["P2", "1", "1", "255", "300"])
+
+
+def test_can_read_ascii_file_from_disk(tmp_path):
+    filepath = tmp_path / "image.pgm"
+    filepath.write_bytes(ASCII_FILE)
+    image = read_file(str(filepath))
+    assert image.get_pixel(3, 2) == GrayPixel(60)
+
+
+@pytest.mark.parametrize(
+    "header, max_level, samples",
+    [
+        ("P1", 1, [1, 0, 1, 1, 0, 1]),
+        ("P2", 255, [0, 17, 255, 128, 3, 9]),
+        ("P2", 4095, [0, 17, 4095, 256, 3, 1000]),
+        ("P3", 255, [1, 2, 3, 4, 5, 6] * 3),
+    ],
+)
+def test_ascii_files_can_be_written_and_read_back(tmp_path, header, max_level, samples):
+    channels = 3 if header == "P3" else 1
+    buffer = PixelBuffer(
+        3, 2, channels, typecode_for(max_level), array(typecode_for(max_level), samples)
+    )
+    image = Image(header=header, max_level=max_level, dimensions=(3, 2), buffer=buffer)
+    filepath = tmp_path / f"image.{header}"
+    written = save_file(str(filepath), image)
+
+    assert written == filepath.stat().st_size
+    result = read_file(str(filepath))
+    assert (result.header, result.max_level) == (header, max_level)
+    assert list(result._buffer.data) == samples
+
+
+def test_ascii_lines_are_at_most_70_characters(tmp_path):
+    buffer = PixelBuffer(100, 2, 3, data=array("B", [255] * 600))
+    image = Image(header="P3", max_level=255, dimensions=(100, 2), buffer=buffer)
+    filepath = tmp_path / "image.ppm"
+    save_file(str(filepath), image)
+
+    lines = filepath.read_text().splitlines()
+    assert max(len(line) for line in lines) <= 70
+    assert list(read_file(str(filepath))._buffer.data) == [255] * 600
+
+
+def test_planar_images_are_written_interleaved(tmp_path):
+    buffer = PixelBuffer(2, 1, 3, data=array("B", [1, 2, 3, 4, 5, 6]))
+    image = Image(
+        header="P6",
+        max_level=255,
+        dimensions=(2, 1),
+        buffer=buffer.with_layout("planar"),
+    )
+    filepath = tmp_path / "image.ppm"
+    save_file(str(filepath), image)
+    assert filepath.read_bytes().endswith(bytes([1, 2, 3, 4, 5, 6]))
+
+
+def test_writer_flushes_in_blocks():
+    stream = io.BytesIO()
+    writer = NetpbmWriter(stream, "P5", 4, 3, 255, block_size=4)
+    writer.write_row(array("B", [1, 2, 3, 4]))
+    assert stream.getvalue() == b"P5\n4 3\n255\n\x01\x02\x03\x04"
+    writer.write_rows([[5, 6, 7, 8], [9, 10, 11, 12]])
+    assert writer.close() == len(stream.getvalue()) == 23
+
+
+def test_writer_raises_invalidfile_exception_on_missing_rows():
+    writer = NetpbmWriter(io.BytesIO(), "P2", 2, 2, 255)
+    writer.write_row([1, 2])
+    with pytest.raises(InvalidFileError):
+        writer.close()
+
+
+def test_probe_reads_header_offset_and_size(tmp_path):
+    filepath = tmp_path / "image.pgm"
+    filepath.write_bytes(b"P5\n# comment\n3 2\n255\n" + bytes(6))
+    assert probe(str(filepath)) == {
+        "header": "P5",
+        "dimensions": (3, 2),
+        "max_level": 255,
+        "raster_offset": 21,
+        "file_size": 27,
+    }
+
+
+def test_scan_directory_skips_invalid_files_and_reuses_index(tmp_path, monkeypatch):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.pgm").write_bytes(b"P5\n1 1\n255\n\x00")
+    (tmp_path / "b.ppm").write_bytes(b"P3 1 1 255 1 2 3")
+    (tmp_path / "broken.pgm").write_bytes(b"P9\n")
+    (tmp_path / "notes.txt").write_bytes(b"P2 1 1 255 0")
+    index_path = str(tmp_path / "index.json")
+
+    records = index.scan_directory(str(tmp_path), index_path)
+    assert sorted(os.path.basename(path) for path in records) == [
+        "a.pgm",
+        "b.ppm",
+        "broken.pgm",
+    ]
+    assert records[str(tmp_path / "b.ppm")]["dimensions"] == (1, 1)
+    assert "error" in records[str(tmp_path / "broken.pgm")]
+    assert index.load_index(index_path) == records
+
+    def fail(path):
+        raise AssertionError(f"{path} should not be probed again")
+
+    monkeypatch.setattr(index, "probe", fail)
+    assert index.scan_directory(str(tmp_path), index_path) == records
+
+
+def test_concurrent_index_saves_do_not_share_a_temporary_file(tmp_path):
+    index_path = str(tmp_path / "index.json")
+    records = [{str(n): {"header": "P5", "mtime": n}} for n in range(16)]
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda r: index.save_index(index_path, r), records))
+    assert index.load_index(index_path) in records
+    assert os.listdir(tmp_path) == ["index.json"]
+
+
+def test_scan_directory_leaves_out_unreadable_files(tmp_path, monkeypatch):
+    (tmp_path / "a.pgm").write_bytes(b"P5\n1 1\n255\n\x00")
+    (tmp_path / "locked.pgm").write_bytes(b"P5\n1 1\n255\n\x00")
+    (tmp_path / "dangling.pgm").symlink_to(tmp_path / "missing.pgm")
+    probe = index.probe
+
+    def locked_probe(path):
+        if path.endswith("locked.pgm"):
+            raise PermissionError(13, "Permission denied", path)
+        return probe(path)
+
+    monkeypatch.setattr(index, "probe", locked_probe)
+    records = index.scan_directory(str(tmp_path))
+    assert list(records) == [str(tmp_path / "a.pgm")]